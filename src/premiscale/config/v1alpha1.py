@@ -7,16 +7,17 @@ from __future__ import annotations
 
 import logging
 import os
+import socket
 import sys
 
 from pathlib import Path
 from attrs import define
 from attr import ib
-from cattrs import structure
+from cattrs import structure, register_structure_hook
 
 # In this particular module, cattrs requires these types during runtime to unpack,
 # so we skip the TYPE_CHECKING check wrapping these imports.
-from typing import Dict, List
+from typing import Dict, List, Tuple
 
 
 log = logging.getLogger(__name__)
@@ -81,6 +82,16 @@ class State:
     connection: Connection | None = ib(default=None)
 
 
+@define
+class Deadband:
+    """
+    Time series deadband filter configuration options.
+    """
+    absolute: float = ib(default=0)
+    relative: float = ib(default=0.01)
+    maxSilence: int = ib(default=300)
+
+
 @define
 class TimeSeries:
     """
@@ -90,6 +101,13 @@ class TimeSeries:
     retention: int
     dbfile: str | None = ib(default=None)
     connection: Connection | None = ib(default=None)
+    writeQueueSize: int = ib(default=1000)
+    writeBatchSize: int = ib(default=5000)
+    writeFlushInterval: int = ib(default=5)
+    deadband: Deadband | None = ib(default=None)
+    capacity: int | None = ib(default=None)
+    segmentDuration: int = ib(default=300)
+    segmentCompression: bool = ib(default=True)
 
     def __attrs_post_init__(self):
         """
@@ -99,6 +117,10 @@ class TimeSeries:
             log.error('Connection information must be provided when using InfluxDB as the time series database.')
             sys.exit(1)
 
+        if self.type == 'segments' and self.dbfile is None:
+            log.error('A directory must be provided as dbfile when using segments as the time series database.')
+            sys.exit(1)
+
         if self.type == 'influxdb' and self.retention < 3600:
             log.warning('Retention of time series metrics must be at least 3600 seconds, or 1 hour, when using InfluxDB. Defaulting to 3600 seconds.')
             self.retention = 3600
@@ -115,16 +137,31 @@ class Databases:
     state: State
     timeseries: TimeSeries
     hostConnectionQueueSize: int | None = ib(default=None)
+    hostConnectionExecutorThreads: int | None = ib(default=None)
+    hostConnectionKeepalive: int = ib(default=5)
+    hostConnectionIdleTimeout: int = ib(default=300)
+    collectorProcesses: int = ib(default=1)
+    hostConnectionFailureThreshold: int = ib(default=1)
+    hostConnectionBackoff: int = ib(default=30)
+    hostConnectionMaxBackoff: int = ib(default=600)
+    hostStatsCacheTTL: int | None = ib(default=None)
+    hostDomainEvents: bool = ib(default=True)
 
     def __attrs_post_init__(self):
         """
         Post-initialization method to expand environment variables.
         """
-        if self.hostConnectionQueueSize is None:
-            self.hostConnectionQueueSize = self.maxHostConnectionThreads
-        elif self.hostConnectionQueueSize < self.maxHostConnectionThreads:
-            log.warning(f'Host connection queue size must be greater than or equal to the maximum host connection threads. Defaulting to {self.maxHostConnectionThreads}.')
-            self.hostConnectionQueueSize = self.maxHostConnectionThreads
+        if self.hostConnectionQueueSize is not None:
+            log.warning('Host connection queue size is deprecated, as hosts are no longer visited in pages. Use hostConnectionExecutorThreads to size the host visit thread pool instead.')
+
+            if self.hostConnectionExecutorThreads is None:
+                self.hostConnectionExecutorThreads = self.hostConnectionQueueSize
+
+        if self.hostConnectionExecutorThreads is None:
+            self.hostConnectionExecutorThreads = self.maxHostConnectionThreads
+        elif self.hostConnectionExecutorThreads < self.maxHostConnectionThreads:
+            log.warning(f'Host connection executor threads must be greater than or equal to the maximum host connection threads. Defaulting to {self.maxHostConnectionThreads}.')
+            self.hostConnectionExecutorThreads = self.maxHostConnectionThreads
 
 
 @define
@@ -183,6 +220,46 @@ class Reconciliation:
     interval: int
 
 
+@define
+class Cluster:
+    """
+    Cluster configuration options.
+    """
+    membership: str
+    member: str | None = ib(default=None)  # Defaults to the controller's hostname.
+    leasePath: str | None = ib(default=None)  # Only relevant for membership 'file'.
+    heartbeatInterval: int = ib(default=10)
+    leaseTimeout: int = ib(default=30)
+    virtualNodes: int = ib(default=100)
+
+    def __attrs_post_init__(self):
+        """
+        Post-initialization method to expand environment variables.
+        """
+        self.expand()
+
+        if self.member is None:
+            self.member = socket.gethostname()
+
+        if self.membership == 'file' and self.leasePath is None:
+            log.error('A lease path must be provided when using file-based cluster membership.')
+            sys.exit(1)
+
+        if self.leaseTimeout <= self.heartbeatInterval:
+            log.warning(f'Cluster lease timeout must be greater than the heartbeat interval. Defaulting to {3 * self.heartbeatInterval} seconds.')
+            self.leaseTimeout = 3 * self.heartbeatInterval
+
+    def expand(self):
+        """
+        Expand environment variables in the cluster configuration.
+        """
+        if self.member is not None:
+            self.member = os.path.expandvars(self.member)
+
+        if self.leasePath is not None:
+            self.leasePath = os.path.expandvars(self.leasePath)
+
+
 @define
 class Resources:
     """
@@ -207,6 +284,7 @@ class Host:
     timeout: int = ib(default=45)
     user: str | None = ib(default=None)
     resources: Resources | None = ib(default=None)
+    collectionInterval: int | None = ib(default=None)  # Overrides the interval of any ASGs this host backs, and databases.collectionInterval.
 
     def __attrs_post_init__(self):
         """
@@ -353,9 +431,11 @@ class AutoscalingGroup:
     replacement: HostReplacementStrategy
     networking: Network
     scaling: ScaleStrategy
+    collectionInterval: int | None = ib(default=None)  # How often to visit the hosts backing this ASG.
 
 
-@define(frozen=False)
+# Without slots, so arbitrary ASG names can be set as attributes.
+@define(frozen=False, slots=False)
 class AutoscalingGroups:
     """
     Because keys are variable, we need to define a custom init method for autoscaling groups.
@@ -370,6 +450,26 @@ class AutoscalingGroups:
             # etc. But we don't know how many ASGs users will configure so we can't statically type the keys.
             setattr(self, key, value)
 
+    def items(self) -> List[Tuple[str, AutoscalingGroup]]:
+        """
+        List the configured autoscaling groups.
+
+        Returns:
+            List[Tuple[str, AutoscalingGroup]]: (name, autoscaling group) pairs.
+        """
+        return list(vars(self).items())
+
+
+# cattrs can't infer the variable keys of AutoscalingGroups, so structure each group explicitly.
+register_structure_hook(
+    AutoscalingGroups,
+    lambda groups, _: AutoscalingGroups(
+        **{
+            name: structure(group, AutoscalingGroup) for name, group in (groups or {}).items()
+        }
+    )
+)
+
 
 @define
 class Autoscale:
@@ -400,6 +500,7 @@ class Controller:
     reconciliation: Reconciliation
     autoscale: Autoscale
     healthcheck: Healthcheck
+    cluster: Cluster | None = ib(default=None)
 
 
 @define
@@ -62,7 +62,10 @@ def start(config: Config, version: str, token: str) -> int:
     for _dthread in _main_process_daemon_threads:
         _dthread.start()
 
-    with ProcessPoolExecutor() as executor, mp.Manager() as manager:
+    collector_processes = config.controller.databases.collectorProcesses
+
+    # Leave room for the platform, autoscaling and reconciliation subprocesses alongside the metrics collector shards.
+    with ProcessPoolExecutor(max_workers=3 + collector_processes) as executor, mp.Manager() as manager:
 
         autoscaling_action_queue: Queue = cast(Queue, manager.Queue())
         platform_message_queue: Queue = cast(Queue, manager.Queue())
@@ -92,14 +95,17 @@ def start(config: Config, version: str, token: str) -> int:
             case 'kubernetes':
                 from premiscale.metrics import MetricsCollector
 
-                processes.append(
+                # Hosts are partitioned between collector shards.
+                processes.extend(
                     executor.submit(
                         MetricsCollector(
                             config,
                             # No need for time-series metrics collection in Kubernetes mode.
-                            timeseries_enabled=False
+                            timeseries_enabled=False,
+                            shard=shard,
+                            shards=collector_processes
                         )
-                    )
+                    ) for shard in range(collector_processes)
                 )
 
                 from premiscale.reconciliation.kubernetes import KubernetesAutoscaler
@@ -114,16 +120,26 @@ def start(config: Config, version: str, token: str) -> int:
                     )
                 )
             case 'standalone':
-                from premiscale.metrics import MetricsCollector
+                from premiscale.metrics import MetricsCollector, single_writer
 
-                processes.append(
+                # Shards each write their own points, unless the time series database only allows a single writer
+                # process, in which case they forward their points through a shared queue to the shard that writes.
+                metrics_queue: Queue | None = cast(
+                    Queue,
+                    manager.Queue(maxsize=config.controller.databases.timeseries.writeQueueSize)
+                ) if collector_processes > 1 and single_writer(config) else None
+
+                processes.extend(
                     executor.submit(
                         MetricsCollector(
                             config,
                             # Enable time-series metrics collection in standalone mode since Reconciliation needs it.
-                            timeseries_enabled=True
-                        )
-                    )
+                            timeseries_enabled=True,
+                            shard=shard,
+                            shards=collector_processes
+                        ),
+                        metrics_queue
+                    ) for shard in range(collector_processes)
                 )
 
                 from premiscale.reconciliation.internal import Reconcile
@@ -29,6 +29,9 @@ def build_hypervisor_connection(host: Host, readonly: bool = False) -> Libvirt:
     # It's only actually needed for the SSH config, which is parsed and produced when the config is validated.
     del conf['sshKey']
 
+    # Scheduling is the metrics collector's concern, not the connection's.
+    del conf['collectionInterval']
+
     match host.hypervisor:
         case 'qemu':
             log.debug(f'Using QEMU hypervisor for host {host.name} at {host.address}')
@@ -10,23 +10,63 @@ import logging
 
 from abc import ABC, abstractmethod
 from typing import TYPE_CHECKING
+from threading import Thread, Lock
 from libvirt import libvirtError
 from functools import wraps
+from cachetools import TTLCache
+from cachetools.keys import hashkey
+from premiscale.hypervisor.qemu_data import DomainStatsBatch
 
 
 if TYPE_CHECKING:
     from ipaddress import IPv4Address
-    from premiscale.hypervisor.qemu_data import DomainStats
-    from typing import Any, Dict, List, Tuple, Callable
+    from premiscale.hypervisor.breaker import CircuitBreaker
+    from premiscale.hypervisor.qemu_data import DomainStats, HostFacts, HostStats
+    from typing import Any, Dict, FrozenSet, List, Tuple, Callable
 
 
 log = logging.getLogger(__name__)
 
 
+_event_loop_thread: Thread | None = None
+_event_loop_lock = Lock()
+
+
+def register_event_loop() -> None:
+    """
+    Register libvirt's default event loop implementation and run it in a daemon thread. Keepalive messages (and any
+    other event callbacks) are only serviced while this loop runs, so it must be registered before connections that
+    depend on it are opened. Calling this more than once in a process is a no-op.
+    """
+    global _event_loop_thread
+
+    with _event_loop_lock:
+        if _event_loop_thread is not None:
+            return None
+
+        lv.virEventRegisterDefaultImpl()
+
+        def _run() -> None:
+            while True:
+                lv.virEventRunDefaultImpl()
+
+        _event_loop_thread = Thread(
+            target=_run,
+            name='libvirt-event-loop',
+            daemon=True
+        )
+        _event_loop_thread.start()
+
+        log.debug('Started libvirt event loop thread')
+
+
 def retry_libvirt_connection(retries: int = 3) -> Callable:
     """
     Decorator to retry a connection to the Libvirt hypervisor if it fails.
 
+    If the connection has a circuit breaker, retries stop as soon as the breaker opens, and calls are skipped outright
+    while it's open, so an unreachable host costs at most one connection attempt per backoff period.
+
     Args:
         retries (int): Number of times to retry the connection. Defaults to 3.
 
@@ -40,15 +80,27 @@ def retry_libvirt_connection(retries: int = 3) -> Callable:
 
             self_ = args[0]
             assert isinstance(self_, Libvirt)
+            breaker = self_.breaker
             tries = 0
 
             while tries < retries:
+                if breaker is not None and not breaker.allow():
+                    log.debug(f'Host at "{self_.connection_string}" is backing off for another {round(breaker.retry_in(), 2)}s, skipping call')
+                    return None
+
                 try:
                     if self_.is_connected():
                         return func(*args, **kwargs)
                     else:
                         log.warning(f'Connection to host at "{self_.connection_string}" is not open, attempting to reconnect')
-                        self_.open()
+
+                        opened = self_.open() is not None
+
+                        if breaker is not None and opened:
+                            breaker.success()
+                        elif breaker is not None:
+                            breaker.failure()
+
                         tries += 1
                         continue
 
@@ -56,6 +108,11 @@ def retry_libvirt_connection(retries: int = 3) -> Callable:
                     log.error(f'Failed to connect to host at "{self_.connection_string}" on try {tries + 1} / {retries}: {e}')
                     tries += 1
 
+                    # Only count errors that cost us the connection; others (e.g. a domain vanishing mid-call) say
+                    # nothing about whether the host is reachable.
+                    if breaker is not None and not self_.is_alive():
+                        breaker.failure()
+
             log.error(f'Failed to connect to host at "{self_.connection_string}" after {retries} tries')
 
             return None
@@ -63,6 +120,45 @@ def retry_libvirt_connection(retries: int = 3) -> Callable:
     return decorator
 
 
+def cached_stats() -> Callable:
+    """
+    Decorator to cache the result of a Libvirt method in the connection's own stats cache (see set_stats_cache()), so
+    repeated calls with the same arguments within the cache's TTL share one round trip to the host. Results are
+    cached per connection, so hosts never evict each other's entries, and concurrent calls on the same host wait for
+    the first one rather than each making the call. Failed calls (None) aren't cached.
+
+    Returns:
+        Callable: The decorated function.
+    """
+    def decorator(func: Callable) -> Callable:
+        @wraps(func)
+        def wrapper(*args: Any, **kwargs: Any) -> Any:
+            self_ = args[0]
+            assert isinstance(self_, Libvirt)
+
+            if self_._stats_cache is None:
+                return func(*args, **kwargs)
+
+            key = hashkey(func.__name__, *args[1:], **kwargs)
+
+            with self_._stats_lock:
+                cache = self_._stats_cache
+
+                if cache is not None and (value := cache.get(key)) is not None:
+                    self_.stats_cache_hits += 1
+                    return value
+
+                self_.stats_cache_misses += 1
+                value = func(*args, **kwargs)
+
+                if cache is not None and value is not None:
+                    cache[key] = value
+
+                return value
+        return wrapper
+    return decorator
+
+
 class Libvirt(ABC):
     """
     Connect to hosts and provide an interface for interacting with VMs on them.
@@ -105,6 +201,29 @@ class Libvirt(ABC):
         self.readonly = readonly
         self.resources = resources
         self._connection: lv.virConnect | None = None
+
+        # Static facts about the host, cached for the lifetime of a connection.
+        self._facts: HostFacts | None = None
+
+        # Busy and total CPU time of the host at the previous visit, to derive its CPU utilization from.
+        self._host_cpu: Tuple[int, int] | None = None
+
+        # Keepalive is disabled until set_keepalive() is called (e.g., by a ConnectionPool).
+        self._keepalive_interval: int = 0
+        self._keepalive_count: int = 0
+
+        # The host's circuit breaker, if connections to it are managed (e.g., by a ConnectionPool).
+        self.breaker: CircuitBreaker | None = None
+
+        # Stats are only cached once set_stats_cache() is called (e.g., by the metrics collector).
+        self._stats_cache: TTLCache | None = None
+        self._stats_lock = Lock()
+        self.stats_cache_hits = 0
+        self.stats_cache_misses = 0
+
+        # ID of the domain lifecycle callback registered on the current connection, if any (see watch_domain_events()).
+        self._event_callback_id: int | None = None
+
         if protocol.lower() == 'ssh':
             # SSH
             self.connection_string = f'{hypervisor}+ssh://{user}@{address}:{port}/system'
@@ -130,6 +249,18 @@ class Libvirt(ABC):
             else:
                 self._connection = lv.open(self.connection_string)
                 log.info(f'Connected to host at {self.connection_string}')
+
+            # The host may have been upgraded or resized while we were disconnected.
+            self._facts = None
+
+            # Callbacks don't carry over to a new connection.
+            self._event_callback_id = None
+
+            if self._keepalive_interval > 0:
+                self._connection.setKeepAlive(
+                    self._keepalive_interval,
+                    self._keepalive_count
+                )
         except libvirtError as e:
             log.error(f'Failed to connect to host at {self.connection_string}: {e}')
             return None
@@ -141,7 +272,20 @@ class Libvirt(ABC):
         Close the connection with the Libvirt hypervisor.
         """
         if self._connection:
-            self._connection.close()
+            if self._event_callback_id is not None:
+                try:
+                    self._connection.domainEventDeregisterAny(self._event_callback_id)
+                except libvirtError as e:
+                    log.debug(f'Failed to deregister domain events on connection to host at {self.connection_string}: {e}')
+
+                self._event_callback_id = None
+
+            try:
+                self._connection.close()
+            except libvirtError as e:
+                log.warning(f'Error closing connection to host at {self.connection_string}: {e}')
+
+            self._connection = None
             log.debug(f'Closed connection to host at {self.connection_string}')
         else:
             log.error(f'No host connection to close, probably due to an error on connection open')
@@ -155,24 +299,196 @@ class Libvirt(ABC):
         """
         return self._connection is not None
 
+    def is_alive(self) -> bool:
+        """
+        Check that the connection is open and that libvirt still considers it alive. With keepalive enabled, a host
+        that stops answering keepalive messages is reported as dead here.
+
+        Returns:
+            bool: True if the connection is open and alive.
+        """
+        if self._connection is None:
+            return False
+
+        try:
+            return self._connection.isAlive() == 1
+        except libvirtError as e:
+            log.warning(f'Liveness check of connection to host at {self.connection_string} failed: {e}')
+            return False
+
+    def set_keepalive(self, interval: int, count: int = 3) -> None:
+        """
+        Configure libvirt keepalive messages on this connection. Settings are applied immediately if the connection is
+        open, and again on every subsequent (re)open. Requires the libvirt event loop, see register_event_loop().
+
+        Args:
+            interval (int): Seconds between keepalive messages. 0 disables keepalive.
+            count (int): Number of unanswered keepalive messages before the connection is closed. Defaults to 3.
+        """
+        self._keepalive_interval = interval
+        self._keepalive_count = count
+
+        if self._connection is not None and interval > 0:
+            try:
+                self._connection.setKeepAlive(interval, count)
+            except libvirtError as e:
+                log.warning(f'Failed to set keepalive on connection to host at {self.connection_string}: {e}')
+
+    def watch_domain_events(self, callback: Callable, opaque: Any = None) -> bool:
+        """
+        Register a callback for lifecycle events (defined, started, stopped, crashed, ...) of every domain on the host,
+        unless one is already registered on the current connection. Callbacks are lost when the connection is
+        reopened, so this should be called on every visit. Requires the libvirt event loop, see register_event_loop().
+
+        Args:
+            callback (Callable): Called from the event loop thread as callback(connection, domain, event, detail, opaque).
+            opaque (Any): Passed through to the callback. Defaults to None.
+
+        Returns:
+            bool: True if the callback was newly registered, in which case events may have been missed since the last
+                one was registered, and the caller should resynchronize its view of the host's domains.
+        """
+        if self._connection is None or self._event_callback_id is not None:
+            return False
+
+        try:
+            self._event_callback_id = self._connection.domainEventRegisterAny(
+                None,
+                lv.VIR_DOMAIN_EVENT_ID_LIFECYCLE,
+                callback,
+                opaque
+            )
+        except libvirtError as e:
+            log.warning(f'Failed to register domain events on connection to host at {self.connection_string}: {e}')
+            return False
+
+        log.debug(f'Watching domain lifecycle events on host at {self.connection_string}')
+
+        return True
+
+    @retry_libvirt_connection()
+    def list_domains(self) -> List[Tuple[str, str, int, int, int]] | None:
+        """
+        List every domain defined on the host, running or not.
+
+        Returns:
+            List[Tuple[str, str, int, int, int]] | None: Each domain's name, UUID, state, number of vCPUs and maximum
+                memory in KiB.
+        """
+        if self._connection is None:
+            return None
+
+        _domains = []
+
+        for domain in self._connection.listAllDomains(0):
+            # [state, maximum memory (KiB), memory (KiB), vCPUs, CPU time]
+            state, memory, _, vcpus, _ = domain.info()
+            _domains.append((domain.name(), domain.UUIDString(), state, vcpus, memory))
+
+        return _domains
+
+    def set_stats_cache(self, ttl: float, maxsize: int = 8) -> None:
+        """
+        Configure caching of this connection's stats (see cached_stats()). Calling it again with the same TTL keeps
+        the cached entries, so it can be called on every visit.
+
+        Args:
+            ttl (float): Seconds a result is reused for. Should be shorter than the host's collection interval, so
+                every visit collects fresh stats. 0 disables caching.
+            maxsize (int): Maximum number of cached results, i.e. distinct calls. Defaults to 8.
+        """
+        with self._stats_lock:
+            if ttl <= 0:
+                self._stats_cache = None
+            elif self._stats_cache is None or self._stats_cache.ttl != ttl or self._stats_cache.maxsize != maxsize:
+                self._stats_cache = TTLCache(maxsize=maxsize, ttl=ttl)
+
     @abstractmethod
-    def _getHostStats(self) -> Dict:
+    def _getHostFacts(self) -> HostFacts | None:
+        """
+        Get the static facts of the host, i.e. its capabilities, topology and versions.
+
+        Returns:
+            HostFacts | None: The host's facts.
+
+        Raises:
+            NotImplementedError: If the method is not implemented by the subclass.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def _getHostStats(self) -> HostStats | None:
         """
         Get a report of schedulable resource utilization on the host.
 
         Returns:
-            Dict: The resources available on the host.
+            HostStats | None: The resources available on the host.
 
         Raises:
             NotImplementedError: If the method is not implemented by the subclass.
         """
         raise NotImplementedError
 
+    def host_facts(self) -> HostFacts | None:
+        """
+        Get the static facts of the host. They're only retrieved once per connection, since they don't change while
+        it's open, unless libvirt on the host reports a different version than when they were retrieved (e.g. it was
+        upgraded in place and the connection survived the restart). Checking costs a single, small RPC.
+
+        Returns:
+            HostFacts | None: The host's facts, or None if they couldn't be retrieved.
+        """
+        if self._facts is not None and self._connection is not None:
+            try:
+                if (version := self._connection.getLibVersion()) != self._facts.libvirt_version:
+                    log.info(f'Libvirt version of host {self.name} changed from {self._facts.libvirt_version} to {version}, refreshing its facts')
+                    self._facts = None
+            except libvirtError as e:
+                log.warning(f'Failed to check the libvirt version of host {self.name}, keeping its cached facts: {e}')
+
+        if self._facts is None:
+            self._facts = self._getHostFacts()
+
+        return self._facts
+
+    def host_stats(self) -> HostStats | None:
+        """
+        Get the host's capacity and utilization. Only the host's counters are retrieved on every call; its capacity
+        comes from its cached facts.
+
+        Returns:
+            HostStats | None: The host's stats, or None if they couldn't be retrieved.
+        """
+        return self._getHostStats()
+
+    def _hostCpuUtilization(self, busy: int, total: int) -> float | None:
+        """
+        Derive the host's CPU utilization since the previous visit from its cumulative CPU times.
+
+        Args:
+            busy (int): CPU time the host's CPUs spent busy, in nanoseconds.
+            total (int): CPU time of the host's CPUs in any mode, in nanoseconds.
+
+        Returns:
+            float | None: The percentage of CPU time spent busy, or None on the first visit or after the host's
+                counters were reset (e.g. by a reboot).
+        """
+        previous, self._host_cpu = self._host_cpu, (busy, total)
+
+        if previous is None or total <= previous[1] or busy < previous[0]:
+            return None
+
+        return round(min(100.0, (busy - previous[0]) / (total - previous[1]) * 100), 2)
+
     @abstractmethod
-    def _getVMStats(self) -> List[DomainStats]:
+    def _getVMStats(self, metrics: FrozenSet[str] | None = None) -> List[DomainStats]:
         """
         Get a report of resource utilization for a VM.
 
+        Args:
+            metrics (FrozenSet[str] | None): Metrics to collect stats for, e.g. 'cpu' or 'memory'. Hypervisors may skip
+                collecting stats that none of these metrics need. Defaults to None, i.e. every metric.
+
         Returns:
             List[DomainStats]: Stats of all VMs on this particular host connection.
 
@@ -181,6 +497,46 @@ class Libvirt(ABC):
         """
         raise NotImplementedError
 
+    def domain_stats(self, metrics: FrozenSet[str] | None = None) -> List[DomainStats]:
+        """
+        Get the stats of every VM on the host as DomainStats, leaving conversion to a time series format to the caller.
+
+        Args:
+            metrics (FrozenSet[str] | None): Metrics to collect stats for. Defaults to None, i.e. every metric.
+
+        Returns:
+            List[DomainStats]: Stats of all VMs on this particular host connection, or an empty list if they couldn't be retrieved.
+        """
+        return self._getVMStats(metrics) or []
+
+    def _getVMStatsBatch(self, metrics: FrozenSet[str] | None = None) -> DomainStatsBatch | None:
+        """
+        Get a report of resource utilization for every VM on the host as a columnar batch. By default, this converts
+        the result of _getVMStats; subclasses that can should override it to fill the batch without building
+        DomainStats first.
+
+        Args:
+            metrics (FrozenSet[str] | None): Metrics to collect stats for. Defaults to None, i.e. every metric.
+
+        Returns:
+            DomainStatsBatch | None: Stats of all VMs on this particular host connection.
+        """
+        return DomainStatsBatch.from_domains(self._getVMStats(metrics) or [])
+
+    def domain_stats_batch(self, metrics: FrozenSet[str] | None = None) -> DomainStatsBatch:
+        """
+        Get the stats of every VM on the host as a DomainStatsBatch, leaving conversion to a time series format to the caller.
+
+        Args:
+            metrics (FrozenSet[str] | None): Metrics to collect stats for. Defaults to None, i.e. every metric.
+
+        Returns:
+            DomainStatsBatch: Stats of all VMs on this particular host connection, or an empty batch if they couldn't be retrieved.
+        """
+        batch = self._getVMStatsBatch(metrics)
+
+        return batch if batch is not None else DomainStatsBatch()
+
     @abstractmethod
     def state(self, backend: str) -> List[Tuple]:
         """
@@ -0,0 +1,169 @@
+"""
+Stop spending collection time on hosts that can't be reached. A host whose connection attempts keep failing is only
+probed again after an exponentially growing backoff, instead of on every visit.
+"""
+
+
+from __future__ import annotations
+
+import logging
+import random
+
+from typing import TYPE_CHECKING
+from threading import Lock
+from time import monotonic
+
+
+if TYPE_CHECKING:
+    from typing import Callable
+
+
+log = logging.getLogger(__name__)
+
+
+class CircuitBreaker:
+    """
+    A per-host circuit breaker.
+
+    While closed, connection attempts go ahead. Once failure_threshold consecutive attempts have failed, the breaker
+    opens and attempts are refused until its backoff has elapsed. Then it's half-open: exactly one attempt (the probe)
+    is let through, and its outcome either closes the breaker again or reopens it with double the previous backoff, up
+    to max_backoff. Backoffs are jittered so that hosts that went down together aren't all probed at once.
+
+    Args:
+        name (str): Name of the host the breaker guards, for logging.
+        failure_threshold (int): Consecutive failures after which the breaker opens. Defaults to 1.
+        backoff (float): Seconds the breaker stays open the first time it opens. Defaults to 30.
+        max_backoff (float): Upper bound on the backoff in seconds. Defaults to 600.
+        jitter (float): Fraction by which backoffs are randomly lengthened. Defaults to 0.1.
+        clock (Callable[[], float]): Monotonic clock. Defaults to time.monotonic.
+    """
+
+    # Breaker states.
+    CLOSED = 'closed'
+    OPEN = 'open'
+    HALF_OPEN = 'half_open'
+
+    def __init__(self,
+                 name: str,
+                 failure_threshold: int = 1,
+                 backoff: float = 30,
+                 max_backoff: float = 600,
+                 jitter: float = 0.1,
+                 clock: Callable[[], float] = monotonic) -> None:
+        self.name = name
+        self.failure_threshold = max(1, failure_threshold)
+        self.backoff = backoff
+        self.max_backoff = max(backoff, max_backoff)
+        self.jitter = jitter
+        self._clock = clock
+
+        self._lock = Lock()
+        self._state = self.CLOSED
+        self._failures = 0
+
+        # Number of times the breaker has opened since it was last closed, which determines the next backoff.
+        self._trips = 0
+        self._retry_at = 0.0
+        self._probe_at = 0.0
+
+    @property
+    def state(self) -> str:
+        """
+        The breaker's current state. An open breaker whose backoff has elapsed is reported as half-open.
+
+        Returns:
+            str: One of CLOSED, OPEN or HALF_OPEN.
+        """
+        with self._lock:
+            if self._state == self.OPEN and self._clock() >= self._retry_at:
+                return self.HALF_OPEN
+
+            return self._state
+
+    def ready(self) -> bool:
+        """
+        Check, without changing the breaker's state, whether an attempt would currently be let through.
+
+        Returns:
+            bool: True if the breaker is closed, or open with its backoff elapsed.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            return self._state == self.OPEN and self._clock() >= self._retry_at
+
+    def allow(self) -> bool:
+        """
+        Ask to make an attempt. If the breaker is open and its backoff has elapsed, the caller is let through as the
+        half-open probe, and must report the outcome with success() or failure().
+
+        Returns:
+            bool: True if the attempt may go ahead.
+        """
+        with self._lock:
+            if self._state == self.CLOSED:
+                return True
+
+            if self._state == self.OPEN and self._clock() >= self._retry_at:
+                self._state = self.HALF_OPEN
+                self._probe_at = self._clock()
+                log.info(f'Probing unreachable host {self.name} after backing off')
+                return True
+
+            # Don't stay half-open forever if a probe never reported back.
+            if self._state == self.HALF_OPEN and self._clock() - self._probe_at >= self.max_backoff:
+                self._probe_at = self._clock()
+                return True
+
+            # Open and backing off, or half-open with the probe still in flight.
+            return False
+
+    def success(self) -> None:
+        """
+        Record a successful attempt, closing the breaker.
+        """
+        with self._lock:
+            if self._state != self.CLOSED:
+                log.info(f'Host {self.name} is reachable again, resuming visits')
+
+            self._state = self.CLOSED
+            self._failures = 0
+            self._trips = 0
+
+    def failure(self) -> None:
+        """
+        Record a failed attempt, opening the breaker if the failure threshold was reached or the probe failed.
+        """
+        with self._lock:
+            self._failures += 1
+
+            if self._state == self.CLOSED and self._failures < self.failure_threshold:
+                return None
+
+            # A straggling failure from before the breaker opened shouldn't extend its backoff.
+            if self._state == self.OPEN:
+                return None
+
+            backoff = min(self.max_backoff, self.backoff * 2 ** self._trips)
+            backoff *= 1 + random.uniform(0, self.jitter)
+
+            self._trips += 1
+            self._state = self.OPEN
+            self._retry_at = self._clock() + backoff
+
+            log.warning(f'Host {self.name} is unreachable after {self._failures} failed attempts, backing off for {round(backoff, 2)}s')
+
+    def retry_in(self) -> float:
+        """
+        Seconds until the breaker lets a probe through.
+
+        Returns:
+            float: Seconds until the next attempt is allowed, 0 if attempts are allowed now.
+        """
+        with self._lock:
+            if self._state != self.OPEN:
+                return 0.0
+
+            return max(0.0, self._retry_at - self._clock())
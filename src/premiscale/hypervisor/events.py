@@ -0,0 +1,335 @@
+"""
+Keep an inventory of the domains on every host up to date from libvirt lifecycle events, so VMs created, stopped or
+crashed between two visits to their host are known about right away instead of on the next visit.
+"""
+
+
+from __future__ import annotations
+
+import libvirt as lv
+import logging
+
+from typing import TYPE_CHECKING
+from attrs import define
+from threading import Lock
+from time import time
+from libvirt import libvirtError
+from premiscale.hypervisor._base import register_event_loop
+
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterable, List, Tuple
+    from premiscale.hypervisor._base import Libvirt
+    from premiscale.metrics.state._base import State
+
+
+log = logging.getLogger(__name__)
+
+
+@define
+class DomainEntry:
+    """
+    A dataclass for storing a domain's entry in a DomainIndex.
+    """
+    name: str
+    uuid: str
+    state: int  # virDomainState, e.g. VIR_DOMAIN_RUNNING
+    vcpus: int
+    memory: int  # Maximum memory, in KiB
+
+    # When the entry was last updated, as a POSIX timestamp.
+    updated: float
+
+
+class DomainIndex:
+    """
+    A thread-safe, in-memory index of the domains defined on each host, by host name and domain name.
+    """
+    def __init__(self) -> None:
+        self._domains: Dict[str, Dict[str, DomainEntry]] = {}
+        self._lock = Lock()
+
+    def __len__(self) -> int:
+        """
+        Return the number of indexed domains.
+
+        Returns:
+            int: The number of domains across all hosts.
+        """
+        with self._lock:
+            return sum(len(domains) for domains in self._domains.values())
+
+    def get(self, host: str, name: str) -> DomainEntry | None:
+        """
+        Look up a domain.
+
+        Args:
+            host (str): Name of the host the domain is defined on.
+            name (str): The domain's name.
+
+        Returns:
+            DomainEntry | None: The domain's entry, or None if it isn't indexed.
+        """
+        with self._lock:
+            return self._domains.get(host, {}).get(name)
+
+    def domains(self, host: str) -> List[DomainEntry]:
+        """
+        List the domains of a host.
+
+        Args:
+            host (str): The host's name.
+
+        Returns:
+            List[DomainEntry]: The host's domains.
+        """
+        with self._lock:
+            return list(self._domains.get(host, {}).values())
+
+    def upsert(self, host: str, entry: DomainEntry) -> bool:
+        """
+        Add or update a domain.
+
+        Args:
+            host (str): Name of the host the domain is defined on.
+            entry (DomainEntry): The domain's entry.
+
+        Returns:
+            bool: True if the domain wasn't indexed before.
+        """
+        with self._lock:
+            domains = self._domains.setdefault(host, {})
+            new = entry.name not in domains
+            domains[entry.name] = entry
+
+        return new
+
+    def remove(self, host: str, name: str) -> DomainEntry | None:
+        """
+        Remove a domain.
+
+        Args:
+            host (str): Name of the host the domain was defined on.
+            name (str): The domain's name.
+
+        Returns:
+            DomainEntry | None: The domain's entry, or None if it wasn't indexed.
+        """
+        with self._lock:
+            return self._domains.get(host, {}).pop(name, None)
+
+    def replace(self, host: str, entries: Iterable[DomainEntry]) -> Tuple[List[DomainEntry], List[DomainEntry]]:
+        """
+        Replace every domain of a host, e.g. after listing them from scratch.
+
+        Args:
+            host (str): The host's name.
+            entries (Iterable[DomainEntry]): The host's domains.
+
+        Returns:
+            Tuple[List[DomainEntry], List[DomainEntry]]: The domains that weren't indexed before, and the indexed
+                domains that are gone.
+        """
+        domains = {entry.name: entry for entry in entries}
+
+        with self._lock:
+            previous = self._domains.get(host, {})
+            self._domains[host] = domains
+
+        return (
+            [entry for name, entry in domains.items() if name not in previous],
+            [entry for name, entry in previous.items() if name not in domains]
+        )
+
+    def forget(self, host: str) -> int:
+        """
+        Remove every domain of a host, e.g. once it's no longer watched.
+
+        Args:
+            host (str): The host's name.
+
+        Returns:
+            int: The number of removed domains.
+        """
+        with self._lock:
+            return len(self._domains.pop(host, {}))
+
+
+class DomainEvents:
+    """
+    Watch lifecycle events of the domains on hosts over their persistent connections, keep a DomainIndex of them up to
+    date incrementally, and record domains appearing and disappearing in the state database as the events arrive.
+
+    When a host is first watched, or watched again after its connection was reopened (callbacks don't survive
+    reconnects, so events may have been missed), its domains are listed once and reconciled with the index and the
+    state database. From then on, only events update them.
+
+    Callbacks run on libvirt's event loop thread, which also services keepalive messages, so they only do a dictionary
+    update and, for domains appearing or disappearing, a single state database write.
+
+    Args:
+        state (State | None): State database to record domains in. Defaults to None, i.e. only keep the index.
+        index (DomainIndex | None): Index to keep up to date. Defaults to a new DomainIndex.
+    """
+
+    # Events after which a domain no longer exists on its host. Transient domains also disappear once stopped.
+    REMOVED = frozenset({lv.VIR_DOMAIN_EVENT_UNDEFINED})
+    STOPPED = frozenset({lv.VIR_DOMAIN_EVENT_STOPPED, lv.VIR_DOMAIN_EVENT_CRASHED})
+
+    def __init__(self, state: State | None = None, index: DomainIndex | None = None) -> None:
+        self.state = state
+        self.index = index if index is not None else DomainIndex()
+
+        # Callbacks are only delivered while libvirt's event loop runs.
+        register_event_loop()
+
+        # Counters.
+        self.events = 0
+        self.resyncs = 0
+
+    def watch(self, host_connection: Libvirt) -> bool:
+        """
+        Watch the domains on a host, unless they're already watched over its current connection.
+
+        Args:
+            host_connection (Libvirt): An open connection to the host.
+
+        Returns:
+            bool: True if the host's domains were (re)synchronized.
+        """
+        if not host_connection.watch_domain_events(self._lifecycle, host_connection.name):
+            return False
+
+        return self.resync(host_connection)
+
+    def resync(self, host_connection: Libvirt) -> bool:
+        """
+        List a host's domains from scratch, and reconcile the index and the state database with them.
+
+        Args:
+            host_connection (Libvirt): An open connection to the host.
+
+        Returns:
+            bool: True if the host's domains could be listed.
+        """
+        host = host_connection.name
+
+        if (domains := host_connection.list_domains()) is None:
+            log.warning(f'Failed to list the domains on host {host}, relying on events until its next resync')
+            return False
+
+        _time = time()
+        added, removed = self.index.replace(
+            host,
+            (DomainEntry(name, uuid, state, vcpus, memory, _time) for name, uuid, state, vcpus, memory in domains)
+        )
+
+        self.resyncs += 1
+        log.debug(f'Resynchronized {len(domains)} domains on host {host}: {len(added)} new, {len(removed)} gone')
+
+        if self.state is None:
+            return True
+
+        # The state database may have been written by an earlier run or another controller replica, so reconcile it
+        # with the host rather than with the index.
+        try:
+            recorded = {row[1] for row in self.state.vm_report(host)}
+        except Exception as e:
+            log.error(f'Failed to read the domains of host {host} from the state database: {e}')
+            return True
+
+        for entry in self.index.domains(host):
+            if entry.name not in recorded:
+                self._created(host, entry)
+
+        for name in recorded - {entry.name for entry in self.index.domains(host)}:
+            self._deleted(host, name)
+
+        return True
+
+    def forget(self, host: str) -> int:
+        """
+        Drop a host's domains from the index, e.g. after it was handed off to another controller replica.
+
+        Args:
+            host (str): The host's name.
+
+        Returns:
+            int: The number of forgotten domains.
+        """
+        return self.index.forget(host)
+
+    def _lifecycle(self, connection: Any, domain: Any, event: int, detail: int, host: str) -> None:
+        """
+        Handle a domain lifecycle event. Called from libvirt's event loop thread.
+
+        Args:
+            connection (Any): The virConnect the event was received on.
+            domain (Any): The virDomain the event is about.
+            event (int): The event, e.g. VIR_DOMAIN_EVENT_STARTED.
+            detail (int): The event's detail, e.g. VIR_DOMAIN_EVENT_STARTED_BOOTED.
+            host (str): Name of the host the event was received from.
+        """
+        self.events += 1
+        name = domain.name()
+
+        log.debug(f'Domain {name} on host {host}: lifecycle event {event}, detail {detail}')
+
+        try:
+            if event in self.REMOVED or (event in self.STOPPED and not domain.isPersistent()):
+                if self.index.remove(host, name) is not None:
+                    self._deleted(host, name)
+
+                return None
+
+            # [state, maximum memory (KiB), memory (KiB), vCPUs, CPU time]
+            state, memory, _, vcpus, _ = domain.info()
+            entry = DomainEntry(name, domain.UUIDString(), state, vcpus, memory, time())
+        except libvirtError as e:
+            # The domain vanished before we could look at it, e.g. a transient domain that was stopped.
+            log.debug(f'Domain {name} on host {host} is gone: {e}')
+
+            if self.index.remove(host, name) is not None:
+                self._deleted(host, name)
+
+            return None
+
+        if self.index.upsert(host, entry):
+            self._created(host, entry)
+
+    def _created(self, host: str, entry: DomainEntry) -> None:
+        """
+        Record a new domain in the state database.
+
+        Args:
+            host (str): Name of the host the domain is defined on.
+            entry (DomainEntry): The domain's entry.
+        """
+        if self.state is None:
+            return None
+
+        log.info(f'Domain {entry.name} appeared on host {host}, recording it in the state database')
+
+        try:
+            # Memory is recorded in MiB. Storage isn't known from lifecycle events.
+            self.state.vm_create(host, entry.name, entry.vcpus, entry.memory // 1024, 0)
+        except Exception as e:
+            log.error(f'Failed to record domain {entry.name} on host {host} in the state database: {e}')
+
+    def _deleted(self, host: str, name: str) -> None:
+        """
+        Remove a domain that's gone from the state database.
+
+        Args:
+            host (str): Name of the host the domain was defined on.
+            name (str): The domain's name.
+        """
+        if self.state is None:
+            return None
+
+        log.info(f'Domain {name} disappeared from host {host}, removing it from the state database')
+
+        try:
+            self.state.vm_delete(host, name)
+        except Exception as e:
+            log.error(f'Failed to remove domain {name} on host {host} from the state database: {e}')
@@ -0,0 +1,323 @@
+"""
+Maintain long-lived Libvirt connections to hosts, so collection runs can reuse warm connections instead of paying for
+an SSH handshake and libvirt authentication on every visit.
+"""
+
+
+from __future__ import annotations
+
+import logging
+
+from typing import TYPE_CHECKING
+from contextlib import contextmanager
+from threading import Lock
+from time import monotonic
+from premiscale.hypervisor import build_hypervisor_connection
+from premiscale.hypervisor._base import register_event_loop
+from premiscale.hypervisor.breaker import CircuitBreaker
+
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterator, Tuple
+    from premiscale.hypervisor._base import Libvirt
+    from premiscale.config.v1alpha1 import Host
+
+
+log = logging.getLogger(__name__)
+
+
+class ConnectionPool:
+    """
+    A pool of persistent Libvirt connections, keyed by host. Connections are opened on first use, checked for liveness
+    before being handed out, transparently reopened if they've died, and closed once they've sat idle for too long.
+
+    Every host has a CircuitBreaker guarding (re)connection attempts, so hosts that can't be reached are only probed
+    on an exponential backoff rather than on every visit. Pooled connections share their host's breaker.
+
+    Libvirt connection objects are thread-safe, so a single connection per host may be shared between threads.
+
+    Args:
+        readonly (bool): Whether to open connections in read-only mode. Defaults to True.
+        keepalive (int): Seconds between libvirt keepalive messages. 0 disables keepalive. Defaults to 5.
+        keepalive_count (int): Number of unanswered keepalive messages before libvirt drops a connection. Defaults to 3.
+        idle_timeout (int): Seconds a connection may go unused before it is closed. 0 disables idle eviction. Defaults to 300.
+        failure_threshold (int): Consecutive failed connection attempts after which a host is backed off. Defaults to 1.
+        backoff (int): Seconds a host is first backed off for. Doubles every time a probe fails. Defaults to 30.
+        max_backoff (int): Upper bound on a host's backoff in seconds. Defaults to 600.
+    """
+    def __init__(self,
+                 readonly: bool = True,
+                 keepalive: int = 5,
+                 keepalive_count: int = 3,
+                 idle_timeout: int = 300,
+                 failure_threshold: int = 1,
+                 backoff: int = 30,
+                 max_backoff: int = 600) -> None:
+        self.readonly = readonly
+        self.keepalive = keepalive
+        self.keepalive_count = keepalive_count
+        self.idle_timeout = idle_timeout
+        self.failure_threshold = failure_threshold
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+
+        self._connections: Dict[Tuple[str, str], Libvirt] = {}
+        self._last_used: Dict[Tuple[str, str], float] = {}
+
+        # Number of threads currently holding each host's connection through connection(), which idle eviction skips.
+        self._checked_out: Dict[Tuple[str, str], int] = {}
+
+        # Breakers outlive connections, so a host's backoff survives its connection being discarded.
+        self._breakers: Dict[Tuple[str, str], CircuitBreaker] = {}
+
+        # One lock guards the pool's dictionaries; per-host locks serialize (re)connecting to any one host, so threads
+        # visiting different hosts never wait on each other's SSH handshakes.
+        self._lock = Lock()
+        self._host_locks: Dict[Tuple[str, str], Lock] = {}
+
+        if self.keepalive > 0:
+            register_event_loop()
+
+    def __len__(self) -> int:
+        """
+        Return the number of connections currently held by the pool.
+
+        Returns:
+            int: The number of pooled connections.
+        """
+        return len(self._connections)
+
+    @staticmethod
+    def _key(host: Host) -> Tuple[str, str]:
+        """
+        Key pooled connections on a host's name and address.
+
+        Args:
+            host (Host): The host to build a key for.
+
+        Returns:
+            Tuple[str, str]: The host's pool key.
+        """
+        return (host.name, str(host.address))
+
+    def _host_lock(self, key: Tuple[str, str]) -> Lock:
+        """
+        Get (or create) the lock serializing connection setup for a single host.
+
+        Args:
+            key (Tuple[str, str]): The host's pool key.
+
+        Returns:
+            Lock: The host's lock.
+        """
+        with self._lock:
+            if key not in self._host_locks:
+                self._host_locks[key] = Lock()
+
+            return self._host_locks[key]
+
+    def breaker(self, host: Host) -> CircuitBreaker:
+        """
+        Get (or create) the circuit breaker guarding connection attempts to a host.
+
+        Args:
+            host (Host): The host to get the breaker of.
+
+        Returns:
+            CircuitBreaker: The host's breaker.
+        """
+        key = self._key(host)
+
+        with self._lock:
+            if key not in self._breakers:
+                self._breakers[key] = CircuitBreaker(
+                    host.name,
+                    failure_threshold=self.failure_threshold,
+                    backoff=self.backoff,
+                    max_backoff=self.max_backoff
+                )
+
+            return self._breakers[key]
+
+    def available(self, host: Host) -> bool:
+        """
+        Check whether a host is worth visiting, i.e. it isn't backing off after failed connection attempts. Unlike
+        acquire(), this never blocks on the host or changes its breaker's state.
+
+        Args:
+            host (Host): The host to check.
+
+        Returns:
+            bool: True if the host's breaker would let a connection attempt through.
+        """
+        return self.breaker(host).ready()
+
+    def acquire(self, host: Host) -> Libvirt | None:
+        """
+        Get a live connection to a host, opening one (or reopening a dead one) if necessary. Connections handed out by
+        this method remain owned by the pool and should not be closed by the caller.
+
+        Args:
+            host (Host): The host to connect to.
+
+        Returns:
+            Libvirt | None: A live connection to the host, or None if the host could not be reached or is backing off.
+        """
+        key = self._key(host)
+        breaker = self.breaker(host)
+
+        with self._host_lock(key):
+            host_connection = self._connections.get(key)
+
+            if host_connection is not None and not host_connection.is_alive():
+                log.warning(f'Pooled connection to host {host.name} is no longer alive, reconnecting')
+                self._discard(key)
+                host_connection = None
+
+            if host_connection is None:
+                if not breaker.allow():
+                    log.debug(f'Host {host.name} is backing off for another {round(breaker.retry_in(), 2)}s, not connecting')
+                    return None
+
+                host_connection = build_hypervisor_connection(host, readonly=self.readonly)
+                host_connection.set_keepalive(self.keepalive, self.keepalive_count)
+                host_connection.breaker = breaker
+
+                # Failure has already been logged; the breaker decides when we try again.
+                if host_connection.open() is None:
+                    breaker.failure()
+                    return None
+
+                breaker.success()
+
+                with self._lock:
+                    self._connections[key] = host_connection
+
+                log.debug(f'Added connection to host {host.name} to the pool ({len(self)} pooled connections)')
+
+            with self._lock:
+                self._last_used[key] = monotonic()
+
+            return host_connection
+
+    @contextmanager
+    def connection(self, host: Host) -> Iterator[Libvirt | None]:
+        """
+        Context manager counterpart to acquire(). Unlike using a Libvirt object directly as a context manager, the
+        connection is returned to the pool (left open) on exit. The connection is checked out until then, so idle
+        eviction never closes it while it's in use.
+
+        Args:
+            host (Host): The host to connect to.
+
+        Yields:
+            Libvirt | None: A live connection to the host, or None if the host could not be reached.
+        """
+        key = self._key(host)
+
+        with self._lock:
+            self._checked_out[key] = self._checked_out.get(key, 0) + 1
+
+        try:
+            yield self.acquire(host)
+        finally:
+            with self._lock:
+                if (count := self._checked_out[key] - 1) > 0:
+                    self._checked_out[key] = count
+                else:
+                    del self._checked_out[key]
+
+    def invalidate(self, host: Host) -> None:
+        """
+        Close and drop a host's pooled connection, e.g. after an RPC on it hung. The next acquire() reconnects.
+
+        Args:
+            host (Host): The host whose connection should be dropped.
+        """
+        self._discard(self._key(host))
+
+    def _discard(self, key: Tuple[str, str]) -> None:
+        """
+        Remove a connection from the pool and close it.
+
+        Args:
+            key (Tuple[str, str]): The host's pool key.
+        """
+        with self._lock:
+            host_connection = self._connections.pop(key, None)
+            self._last_used.pop(key, None)
+
+        if host_connection is not None and host_connection.is_connected():
+            host_connection.close()
+
+    def _idle(self, key: Tuple[str, str], cutoff: float) -> bool:
+        """
+        Check whether a host's connection is idle, i.e. it isn't checked out and wasn't used since a cutoff. Must be
+        called holding the pool's lock.
+
+        Args:
+            key (Tuple[str, str]): The host's pool key.
+            cutoff (float): Monotonic time the connection must not have been used since.
+
+        Returns:
+            bool: True if the connection is idle.
+        """
+        return key not in self._checked_out and self._last_used.get(key, cutoff) < cutoff
+
+    def evict_idle(self) -> int:
+        """
+        Close connections that haven't been used within the idle timeout. Connections that are checked out are kept,
+        however long ago they were acquired.
+
+        Returns:
+            int: The number of connections evicted.
+        """
+        if self.idle_timeout <= 0:
+            return 0
+
+        cutoff = monotonic() - self.idle_timeout
+        evicted = 0
+
+        with self._lock:
+            idle = [key for key in self._last_used if self._idle(key, cutoff)]
+
+        for key in idle:
+            # Holding the host's lock keeps acquire() from handing the connection out while it's closed, and the
+            # connection may have been checked out since it was found idle.
+            with self._host_lock(key):
+                with self._lock:
+                    if not self._idle(key, cutoff):
+                        continue
+
+                log.debug(f'Evicting idle connection to host {key[0]} from the pool')
+                self._discard(key)
+                evicted += 1
+
+        return evicted
+
+    def stats_cache_info(self) -> Tuple[int, int]:
+        """
+        Sum the stats cache counters of every pooled connection.
+
+        Returns:
+            Tuple[int, int]: The number of stats cache hits and misses since the pooled connections were opened.
+        """
+        with self._lock:
+            connections = list(self._connections.values())
+
+        return (
+            sum(host_connection.stats_cache_hits for host_connection in connections),
+            sum(host_connection.stats_cache_misses for host_connection in connections)
+        )
+
+    def close(self) -> None:
+        """
+        Close every pooled connection.
+        """
+        with self._lock:
+            keys = list(self._connections.keys())
+
+        for key in keys:
+            self._discard(key)
+
+        log.debug('Closed all pooled host connections')
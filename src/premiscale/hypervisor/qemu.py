@@ -8,32 +8,85 @@ https://www.qemu.org/
 from __future__ import annotations
 
 import logging
-import re
 
 from typing import TYPE_CHECKING, List, Tuple
 from libvirt import (
-    VIR_DOMAIN_NOSTATE,      # 0
     VIR_DOMAIN_RUNNING,      # 1
+    VIR_DOMAIN_STATS_STATE,
+    VIR_DOMAIN_STATS_CPU_TOTAL,
+    VIR_DOMAIN_STATS_BALLOON,
+    VIR_DOMAIN_STATS_VCPU,
+    VIR_DOMAIN_STATS_INTERFACE,
+    VIR_DOMAIN_STATS_BLOCK,
+    VIR_NODE_CPU_STATS_ALL_CPUS,
+    VIR_NODE_MEMORY_STATS_ALL_CELLS,
 )
-from xmltodict import parse as xmlparse
-from cachetools import cached, TTLCache
-from cattrs import structure
-from premiscale.hypervisor._base import Libvirt, retry_libvirt_connection
-from premiscale.hypervisor.qemu_data import DomainStats
+from functools import lru_cache
+from time import time
+from premiscale.hypervisor._base import Libvirt, cached_stats, retry_libvirt_connection
+from premiscale.hypervisor.qemu_data import DomainStats, DomainStatsBatch, HostFacts, HostStats
+from premiscale.hypervisor.qemu_parser import DomainStatsParser
 
 if TYPE_CHECKING:
-    from typing import Dict
+    from typing import Any, Dict, FrozenSet
     from ipaddress import IPv4Address
 
 
 log = logging.getLogger(__name__)
 
 
+# Libvirt stats groups each metric an autoscaling group can target is computed from. The state group is always
+# requested on top of these, since every time series point is tagged with its domain's state.
+STATS_GROUPS = {
+    'cpu': VIR_DOMAIN_STATS_CPU_TOTAL | VIR_DOMAIN_STATS_VCPU,
+    'memory': VIR_DOMAIN_STATS_BALLOON,
+    'net': VIR_DOMAIN_STATS_INTERFACE,
+    'network': VIR_DOMAIN_STATS_INTERFACE,
+    'block': VIR_DOMAIN_STATS_BLOCK,
+    'storage': VIR_DOMAIN_STATS_BLOCK,
+    'disk': VIR_DOMAIN_STATS_BLOCK,
+}
+
+# Every group DomainStats' time series conversions use; requested when there's nothing narrower to go by.
+ALL_STATS_GROUPS = VIR_DOMAIN_STATS_STATE | VIR_DOMAIN_STATS_CPU_TOTAL | VIR_DOMAIN_STATS_BALLOON | VIR_DOMAIN_STATS_VCPU | VIR_DOMAIN_STATS_INTERFACE | VIR_DOMAIN_STATS_BLOCK
+
+
+@lru_cache(maxsize=None)
+def stats_groups(metrics: FrozenSet[str] | None = None) -> int:
+    """
+    Compute the bitmask of libvirt stats groups to request in order to compute the given metrics. Memoized, since
+    every visit to a host asks for the same metrics.
+
+    Args:
+        metrics (FrozenSet[str] | None): Metrics to collect, i.e. keys of autoscaling groups' targetUtilization.
+            Defaults to None, which requests every group the time series conversions use.
+
+    Returns:
+        int: A bitmask of VIR_DOMAIN_STATS_* flags.
+    """
+    if metrics is None:
+        return ALL_STATS_GROUPS
+
+    groups = VIR_DOMAIN_STATS_STATE
+
+    for metric in metrics:
+        if metric.lower() not in STATS_GROUPS:
+            log.warning(f'Unknown target utilization metric "{metric}", collecting all stats groups')
+            return ALL_STATS_GROUPS
+
+        groups |= STATS_GROUPS[metric.lower()]
+
+    return groups
+
+
 class Qemu(Libvirt):
     """
     A subclass for interacting with a Qemu-based hypervisor/host.
     """
 
+    # Shared between connections, since hosts report the same stats keys.
+    _parser = DomainStatsParser()
+
     def __init__(self,
                  name: str,
                  address: IPv4Address,
@@ -56,158 +109,156 @@ class Qemu(Libvirt):
             resources=resources
         )
 
-    @cached(cache=TTLCache(maxsize=1, ttl=5))
     @retry_libvirt_connection()
-    def _getHostStats(self) -> Dict:
+    def _getHostFacts(self) -> HostFacts | None:
         """
-        Get a report of schedulable resource utilization on the host.
+        Get the static facts of the host. These take several RPCs, and the capabilities XML can be large, so they're
+        cached for the lifetime of the connection (see Libvirt.host_facts()), and the XML is only parsed if it's used.
 
         Returns:
-            Dict: The resources available on the host.
+            HostFacts | None: The host's facts.
         """
         if self._connection is None:
-            return {}
-
-        _stats = {
-            'host': {
-                'name': self._connection.getHostname(),
-                'type': self._connection.getType(),
-                'uri': self._connection.getURI(),
-                'version': self._connection.getVersion(),
-                'libvirt_version': self._connection.getLibVersion(),
-                'capabilities': xmlparse(self._connection.getCapabilities()),
-                'node_info': self._connection.getInfo(),
-                'max_vcpus': self._connection.getMaxVcpus(None),
-                'free_memory': self._connection.getFreeMemory(),
-                'node_memory': self._connection.getMemoryStats(-1, 0),
-                'node_cpu_stats': self._connection.getCPUStats(True),
-                'stats': {
-                    'cpu': self._connection.getCPUStats(
-                        cpuNum=-1,
-                        flags=VIR_DOMAIN_NOSTATE
-                    ),
-                    'memory': self._connection.getMemoryStats(
-                        cellNum=-1,
-                        flags=VIR_DOMAIN_NOSTATE
-                    )
-                }
-            },
-            # Get a picture of the state of the host.
-            'vms': [
-                {
-                    'name': vm.name(),
-                    'state': vm.info()
-                } for vm in self._connection.listAllDomains(flags=VIR_DOMAIN_NOSTATE)
-            ]
-        }
-
-        return _stats
+            return None
+
+        # [model, memory (MiB), cpus, mhz, nodes, sockets, cores, threads]
+        arch, memory, cpus, mhz, nodes, sockets, cores, threads = self._connection.getInfo()[:8]
+
+        return HostFacts(
+            hostname=self._connection.getHostname(),
+            type=self._connection.getType(),
+            version=self._connection.getVersion(),
+            libvirt_version=self._connection.getLibVersion(),
+            arch=arch,
+            memory=memory * 1024 ** 2,
+            cpus=cpus,
+            mhz=mhz,
+            nodes=nodes,
+            sockets=sockets,
+            cores=cores,
+            threads=threads,
+            max_vcpus=self._connection.getMaxVcpus(None),
+            uri=self._connection.getURI(),
+            capabilities_xml=self._connection.getCapabilities()
+        )
 
-    # TODO: This should return a list of dictionaries, not a list of
-    @cached(cache=TTLCache(maxsize=1, ttl=5))
+    @cached_stats()
     @retry_libvirt_connection()
-    def _getVMStats(self) -> List[DomainStats]:
+    def _getHostStats(self) -> HostStats | None:
         """
-        Get a report of resource utilization for a running virtual machine. A typical report includes all the following fields ~
+        Get a report of schedulable resource utilization on the host. Only the host's CPU and memory counters are
+        retrieved, in two RPCs; its capacity comes from its cached facts.
 
-            https://github.com/premiscale/premiscale/pull/196#issuecomment-2168388982
+        Returns:
+            HostStats | None: The resources available on the host.
+        """
+        if self._connection is None or (facts := self.host_facts()) is None:
+            return None
+
+        # Cumulative nanoseconds per mode, summed over all CPUs.
+        cpu = self._connection.getCPUStats(VIR_NODE_CPU_STATS_ALL_CPUS, 0)
+
+        # KiB, summed over all NUMA cells.
+        memory = self._connection.getMemoryStats(VIR_NODE_MEMORY_STATS_ALL_CELLS, 0)
+
+        stats = HostStats(
+            name=self.name,
+            address=self._address_str,
+            cpus=facts.cpus,
+            mhz=facts.mhz,
+            max_vcpus=facts.max_vcpus,
+            memory_total=memory['total'] * 1024 if 'total' in memory else facts.memory,
+            cpu_kernel=cpu.get('kernel'),
+            cpu_user=cpu.get('user'),
+            cpu_idle=cpu.get('idle'),
+            cpu_iowait=cpu.get('iowait'),
+            memory_free=memory['free'] * 1024 if 'free' in memory else None,
+            memory_buffers=memory['buffers'] * 1024 if 'buffers' in memory else None,
+            memory_cached=memory['cached'] * 1024 if 'cached' in memory else None
+        )
 
-        And these fields are parsed into a DomainStats object.
+        if stats.cpu_idle is not None:
+            idle = stats.cpu_idle + (stats.cpu_iowait or 0)
+            busy = (stats.cpu_kernel or 0) + (stats.cpu_user or 0)
+            stats.cpu_utilization = self._hostCpuUtilization(busy, busy + idle)
 
-        Returns:
-            List[DomainStats]: Stats of all VMs on this particular host connection.
+        return stats
+
+    @cached_stats()
+    @retry_libvirt_connection()
+    def _getAllDomainStats(self, metrics: FrozenSet[str] | None = None) -> Tuple[float, Tuple[Tuple[str, Dict[str, Any]], ...]]:
         """
+        Get the raw getAllDomainStats records of every running virtual machine on the host. _getVMStats and
+        _getVMStatsBatch both parse these, so caching this one round trip serves either of them. The records are
+        cached rather than their parsed forms, since batches are extended with host stats after they're returned.
+        They're cached along with the time they were collected, which their parsed forms are stamped with, so stats
+        served from the cache aren't passed off as newer than they are.
 
-        MIDDLE_NUMBER_REGEX = re.compile(r'^(vcpu|block|net)_[0-9]+_')
+        Only the stats groups needed to compute the given metrics are requested, which keeps both the RPC payload and
+        parsing small on hosts with many domains.
 
+        Args:
+            metrics (FrozenSet[str] | None): Metrics to collect stats for. Defaults to None, i.e. every metric.
+
+        Returns:
+            Tuple[float, Tuple[Tuple[str, Dict[str, Any]], ...]]: The time the records were collected, as a POSIX
+                timestamp, and each running domain's name and getAllDomainStats record.
+        """
         if self._connection is None:
-            return []
+            return time(), ()
 
+        timestamp = time()
         _all_domain_stats = self._connection.getAllDomainStats(
             # https://vscode.dev/github/premiscale/premiscale/blob/store-vm-dataremiscale/lib/python3.10/site-packages/libvirt.py#L6424-L6425
-            # Using 0 for @stats returns all stats groups supported by the given hypervisor. See the link
-            # above for an example of all the retrieved stats.
-            stats=0,
+            # Using 0 for @stats would return every stats group supported by the hypervisor (perf, dirtyrate, iothread,
+            # ...), most of which we never use.
+            stats=stats_groups(metrics),
             flags=VIR_DOMAIN_RUNNING
         )
 
-        # Normalize domains' stat fields into a list of DomainStats objects.
-        domain_stats_filtered_list: List[DomainStats] = []
-
-        for (domain, stat) in _all_domain_stats:
-            stat['name'] = domain.name()
-
-            domain_keys = list(stat.keys())
-
-            # Set up a bunch of empty iterables to store bins of parsed stats from this domain.
-            # These will be unpacked into the DomainStats object.
-            domain_stats_filtered = {}
-            vcpus: List[Dict[str, int]] = []
-            blocks: List[Dict[str, int]] = []
-            nets: List[Dict[str, int]] = []
+        return timestamp, tuple((domain.name(), stat) for (domain, stat) in _all_domain_stats)
 
-            # Normalize all the returned stats fields and parse them into a DomainStats object.
-            for key in domain_keys:
-                # Replace '-' and '.' with '_' in the keys for consistency.
-                oldValue = stat.pop(key)
-                key = key.replace('-', '_')
-                key = key.replace('.', '_')
-                stat[key] = oldValue
-
-                # Bin parsed vCPU, Block, and Net stats to form the proper hierarchy.
-                if key.startswith('vcpu_') and key != 'vcpu_current' and key != 'vcpu_maximum':
-                    try:
-                        index = int(key.split('_')[1])
-                    except IndexError as e:
-                        log.error(f'IndexError: {e}')
-                        return []
-
-                    vcpus.extend([{}] * (index - len(vcpus) + 1))
+    # TODO: This should return a list of dictionaries, not a list of
+    def _getVMStats(self, metrics: FrozenSet[str] | None = None) -> List[DomainStats]:
+        """
+        Get a report of resource utilization for a running virtual machine. A typical report includes all the following fields ~
 
-                    # Remove the number from the key and strip 'vcpu_' from the beginning.
-                    _new_key = re.sub(MIDDLE_NUMBER_REGEX, '', key)
+            https://github.com/premiscale/premiscale/pull/196#issuecomment-2168388982
 
-                    vcpus[index][_new_key] = stat[key]
-                #
-                elif key.startswith('block_') and key != 'block_count':
-                    try:
-                        index = int(key.split('_')[1])
-                    except IndexError as e:
-                        log.error(f'IndexError: {e}')
-                        return []
+        And these fields are parsed into DomainStats objects by a DomainStatsParser.
 
-                    blocks.extend([{}] * (index - len(blocks) + 1))
+        Args:
+            metrics (FrozenSet[str] | None): Metrics to collect stats for. Defaults to None, i.e. every metric.
 
-                    _new_key = re.sub(MIDDLE_NUMBER_REGEX, '', key)
+        Returns:
+            List[DomainStats]: Stats of all VMs on this particular host connection.
+        """
+        if (_all_domain_stats := self._getAllDomainStats(metrics)) is None:
+            return []
 
-                    blocks[index][_new_key] = stat[key]
-                #
-                elif key.startswith('net_') and key != 'net_count':
-                    try:
-                        index = int(key.split('_')[1])
-                    except IndexError as e:
-                        log.error(f'IndexError: {e}')
-                        return []
+        timestamp, records = _all_domain_stats
 
-                    nets.extend([{}] * (index - len(nets) + 1))
+        return [
+            self._parser.parse(name, self.name, self._address_str, stat, timestamp) for (name, stat) in records
+        ]
 
-                    _new_key = re.sub(MIDDLE_NUMBER_REGEX, '', key)
+    def _getVMStatsBatch(self, metrics: FrozenSet[str] | None = None) -> DomainStatsBatch | None:
+        """
+        Get a report of resource utilization for every running virtual machine on the host, parsed straight into a
+        columnar DomainStatsBatch. Shares its getAllDomainStats round trip with _getVMStats.
 
-                    nets[index][_new_key] = stat[key]
-                else:
-                    domain_stats_filtered[key] = stat[key]
+        Args:
+            metrics (FrozenSet[str] | None): Metrics to collect stats for. Defaults to None, i.e. every metric.
 
-            domain_stats_filtered['vcpu'] = vcpus
-            domain_stats_filtered['block'] = blocks
-            domain_stats_filtered['net'] = nets
-            domain_stats_filtered['host'] = self.name
-            domain_stats_filtered['address'] = self.address
+        Returns:
+            DomainStatsBatch | None: Stats of all VMs on this particular host connection, or None if they couldn't be retrieved.
+        """
+        if (_all_domain_stats := self._getAllDomainStats(metrics)) is None:
+            return None
 
-            domain_stats_filtered_list.append(
-                structure(domain_stats_filtered, DomainStats)
-            )
+        timestamp, records = _all_domain_stats
 
-        return domain_stats_filtered_list
+        return self._parser.parse_batch(self.name, records, timestamp=timestamp)
 
     def state(self, backend: str = 'local') -> List[Tuple]:
         """
@@ -239,20 +290,24 @@ class Qemu(Libvirt):
             ValueError: if the specified backend could not be handled.
         """
 
-        # TODO: Implement a method to convert the host stats into a metrics database entry.
-        # host_stats: Dict = self._getHostStats()
-
         ts = []
+        host_stats = self.host_stats()
 
         match backend:
             case 'influxdb':
                 ts = [
                     vm.to_influx() for vm in self._getVMStats()
                 ]
+
+                if host_stats is not None:
+                    ts.append((host_stats.to_influx(),))
             case 'local':
                 ts = [
                     vm.to_tinyflux() for vm in self._getVMStats()
                 ]
+
+                if host_stats is not None:
+                    ts.append((host_stats.to_tinyflux(),))
             case _:
                 raise ValueError(f'Could not convert collected time series data to type "{backend}"')
 
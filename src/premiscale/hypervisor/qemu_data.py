@@ -10,16 +10,40 @@ import os
 
 from attrs import define
 from attr import ib
-from typing import TYPE_CHECKING, List
+from typing import TYPE_CHECKING, List, cast
+from array import array
 from datetime import datetime, timezone
+from time import time as now
+from functools import lru_cache
+from xmltodict import parse as xmlparse
 
 if TYPE_CHECKING:
-    from typing import Dict, Tuple
+    from typing import Any, Dict, FrozenSet, Iterable, Iterator, Tuple
 
 
 log = logging.getLogger(__name__)
 
 
+# Characters to escape in InfluxDB line protocol tag keys, tag values and field keys.
+# https://docs.influxdata.com/influxdb/v2/reference/syntax/line-protocol/#special-characters
+_LINE_PROTOCOL_ESCAPES = str.maketrans({',': r'\,', '=': r'\=', ' ': r'\ '})
+
+
+@lru_cache(maxsize=4096)
+def mountpoint(path: str) -> str:
+    """
+    Get the mount point a block device's backing file is grouped under, i.e. its directory. Memoized, since the same
+    disks are seen on every visit.
+
+    Args:
+        path (str): Path of the block device's backing file.
+
+    Returns:
+        str: The mount point.
+    """
+    return os.path.dirname(path)
+
+
 # Schemas for parsing retrieved hypervisor objects.
 
 @define
@@ -75,6 +99,9 @@ class DomainStats:
     """
     A dataclass for storing domain statistics. This is a normalized version of the stats returned by the libvirt API.
 
+    Only the stats groups that were requested from libvirt are populated, so every group's fields are optional. Fields
+    of a group that wasn't collected are None (or empty, for per-device lists).
+
     This class also provides methods for converting the domain statistics into a compatible format for TinyFlux and InfluxDB.
     """
 
@@ -84,33 +111,33 @@ class DomainStats:
     address: str
 
     # State
-    state_state: int
-    state_reason: int
+    state_state: int | None = ib(default=None)
+    state_reason: int | None = ib(default=None)
 
     # CPU
-    cpu_time: int
-    cpu_user: int
-    cpu_system: int
-    cpu_cache_monitor_count: int
-    cpu_haltpoll_success_time: int
-    cpu_haltpoll_fail_time: int
+    cpu_time: int | None = ib(default=None)
+    cpu_user: int | None = ib(default=None)
+    cpu_system: int | None = ib(default=None)
+    cpu_cache_monitor_count: int | None = ib(default=None)
+    cpu_haltpoll_success_time: int | None = ib(default=None)
+    cpu_haltpoll_fail_time: int | None = ib(default=None)
 
-    balloon_rss: int
+    balloon_rss: int | None = ib(default=None)
 
     # vCPU
-    vcpu_current: int
-    vcpu_maximum: int
+    vcpu_current: int | None = ib(default=None)
+    vcpu_maximum: int | None = ib(default=None)
     # TODO: https://github.com/python-attrs/attrs/issues/1298
-    vcpu: List[vCPU]
+    vcpu: List[vCPU] = ib(factory=list)
 
     # net
-    net: List[Net]
+    net: List[Net] = ib(factory=list)
 
     # Block devices
-    block: List[Block]
-    dirtyrate_calc_status: int
-    dirtyrate_calc_start_time: int
-    dirtyrate_calc_period: int
+    block: List[Block] = ib(factory=list)
+    dirtyrate_calc_status: int | None = ib(default=None)
+    dirtyrate_calc_start_time: int | None = ib(default=None)
+    dirtyrate_calc_period: int | None = ib(default=None)
 
     # Ballon fields with defaults (it doesn't seem every hypervisor will have these fields)
     balloon_current: int | None = ib(default=None)
@@ -135,24 +162,111 @@ class DomainStats:
     time: datetime | None = ib(default=None)
 
     def __attrs_post_init__(self) -> None:
-        if self.block_count is None:
+        # Leave the counts unset if their group wasn't collected, so conversions can tell it apart from a domain
+        # without any devices.
+        if self.block_count is None and self.block:
             self.block_count = len(self.block)
 
-        if self.net_count is None:
+        if self.net_count is None and self.net:
             self.net_count = len(self.net)
 
-        if self.vcpu_current != self.vcpu_maximum:
+        if self.vcpu_current is not None and self.vcpu_current != self.vcpu_maximum:
             log.warning(f'vCPU count disparity for {self.name}: {self.vcpu_current} current != {self.vcpu_maximum} max. ')
 
         if self.time is None:
             self.time = datetime.now(tz=timezone.utc)
             log.debug(f'*** Debugging time: {self.time}')
 
-    def to_tinyflux(self) -> Tuple[Dict, Dict, Dict, Dict]:
+    def _net_fields(self) -> Dict[str, int]:
+        """
+        Compute the fields of the domain's network point in a single pass over its interfaces.
+
+        Returns:
+            Dict[str, int]: The interface count, utilization, errors and drops summed across all interfaces, and the
+                utilization of each interface.
+        """
+        _bytes = errors = drops = 0
+        interfaces: Dict[str, int] = {}
+
+        for net in self.net:
+            # To autoscale on network interface utilization, we can use the sum of the rx_bytes and tx_bytes fields.
+            # This said, we don't know the % utilization of the physical NICs on the host from this metric. Virtual
+            # NICs are likely never going to be bottleneck intra-host, but physical NICs are.
+            interfaces[f'{net.name}_utilization'] = net.rx_bytes + net.tx_bytes
+            _bytes += net.rx_bytes + net.tx_bytes
+            errors += net.rx_errs + net.tx_errs
+            drops += net.rx_drop + net.tx_drop
+
+        return {
+            'net_count': cast(int, self.net_count),
+            # Sum utilization, errors and drops across all network interfaces. We can use this to autoscale on network and
+            # set thresholds for network errors and drops to either trigger a scale verb or affect scheduling of workloads.
+            'total_net_utilization': _bytes,
+            'total_net_errors': errors,
+            'total_net_drops': drops,
+            **interfaces
+        }
+
+    def _block_fields(self) -> Dict[str, int]:
+        """
+        Compute the fields of the domain's block point in a single pass over its block devices.
+
+        Returns:
+            Dict[str, int]: The device count, the capacity utilization of each device, and the physical allocation of
+                the devices summed by mount point.
+        """
+        devices: Dict[str, int] = {}
+        mountpoints: Dict[str, int] = {}
+
+        for block in self.block:
+            devices[f'{block.name}_capacity_utilization'] = round(block.allocation / block.capacity * 100, ) if block.capacity else 0
+
+            key = f'{mountpoint(block.path)}_utilization'
+            mountpoints[key] = mountpoints.get(key, 0) + block.physical
+
+        return {
+            'block_count': cast(int, self.block_count),
+            **devices,
+            **mountpoints
+        }
+
+    def to_record(self) -> DomainRecord:
+        """
+        Reduce the domain statistics to the compact DomainRecord that time series databases are written from.
+
+        Returns:
+            DomainRecord: The domain's record.
+        """
+        return DomainRecord(
+            name=self.name,
+            host=self.host,
+            time=self.time.timestamp() if self.time is not None else now(),
+            state=self.state_state,
+            reason=self.state_reason,
+            cpu_time=self.cpu_time,
+            cpu_user=self.cpu_user,
+            cpu_system=self.cpu_system,
+            vcpu_current=self.vcpu_current,
+            vcpu_maximum=self.vcpu_maximum,
+            balloon_current=self.balloon_current,
+            balloon_maximum=self.balloon_maximum,
+            balloon_rss=self.balloon_rss,
+            net_count=self.net_count,
+            block_count=self.block_count,
+            net=tuple(
+                (net.name, net.rx_bytes + net.tx_bytes, net.rx_errs + net.tx_errs, net.rx_drop + net.tx_drop) for net in self.net
+            ),
+            block=tuple(
+                (block.name, block.path, block.allocation, block.capacity, block.physical, block.rd_bytes, block.wr_bytes) for block in self.block
+            )
+        )
+
+    def to_tinyflux(self) -> Tuple[Dict, ...]:
         """
         Convert the domain statistics into a compatible format for TinyFlux Point objects.
 
-        In the process, 4 different points are created for the CPU, memory, network, and block device statistics.
+        In the process, up to 4 different points are created for the CPU, memory, network, and block device statistics,
+        one for each of these stats groups that was collected.
 
         Block devices are a bit more complex than the other stats, so we'll break down the schema for them here.
 
@@ -173,7 +287,7 @@ class DomainStats:
             so scheduling can take this into account when placing VMs.
 
         Returns:
-            Tuple[Dict, Dict, Dict, Dict]: all of the concatenated domain statistics on which we can scale on with some
+            Tuple[Dict, ...]: all of the concatenated domain statistics on which we can scale on with some
                 additional fields. This object takes the following schema
 
             (
@@ -190,26 +304,330 @@ class DomainStats:
                     # Actual data
                     'fields': Dict[str, int | float]
                 },
-                ... 4 times
+                ... up to 4 times
             )
         """
 
         # Put together a record of the domain statistics that's palatable for TinyFlux.
 
-        _cpu_datum: Dict = {
-            'measurement': 'cpu',
-            'time': self.time,
-            'tags': {
-                'name': self.name,
-                'host': self.host,
-                'state': str(self.state_state),
-                'reason': str(self.state_reason)
-            },
-            'fields': {
-                # Roughly speaking, these are the four main categories of stats we're interested in autoscaling virtual machines on.
-                # Actual CPU utilization percentage is the difference between two consecutive differences between the total CPU time
-                # and the sum of user and system time over some interval.
-                # $\max(\frac{1}{I}\left(\frac{\text{cpu_time}_1 - (\text{cpu_user}_1 - \text{cpu_system}_1)}{\text{vcpu_current}_1}-\frac{\text{cpu_time}_2 - (\text{cpu_user}_2 - \text{cpu_system}_2)}{\text{vcpu_current}_2}\right), 0)
+        _data: List[Dict] = []
+
+        # Each measurement is only produced if the stats groups it's computed from were collected.
+        if self.cpu_time is not None and self.cpu_user is not None and self.cpu_system is not None:
+            _cpu_datum: Dict = {
+                'measurement': 'cpu',
+                'time': self.time,
+                'tags': {
+                    'name': self.name,
+                    'host': self.host,
+                    'state': str(self.state_state),
+                    'reason': str(self.state_reason)
+                },
+                'fields': {
+                    # Roughly speaking, these are the four main categories of stats we're interested in autoscaling virtual machines on.
+                    # Actual CPU utilization percentage is the difference between two consecutive differences between the total CPU time
+                    # and the sum of user and system time over some interval.
+                    # $\max(\frac{1}{I}\left(\frac{\text{cpu_time}_1 - (\text{cpu_user}_1 - \text{cpu_system}_1)}{\text{vcpu_current}_1}-\frac{\text{cpu_time}_2 - (\text{cpu_user}_2 - \text{cpu_system}_2)}{\text{vcpu_current}_2}\right), 0)
+                    # The collector's RateCache derives this from consecutive samples as 'cpu_utilization_percent'.
+                    'total_cpu_utilization': self.cpu_time - (self.cpu_user + self.cpu_system),
+                    'cpu_time': self.cpu_time,
+                    'cpu_user': self.cpu_user,
+                    'cpu_system': self.cpu_system,
+                    'vcpu_current': self.vcpu_current,
+                    'vcpu_maximum': self.vcpu_maximum,
+                }
+            }
+
+            _data.append(_cpu_datum)
+
+        if self.balloon_current is not None or self.balloon_rss is not None:
+            _memory_datum: Dict = {
+                'measurement': 'memory',
+                'time': self.time,
+                'tags': {
+                    'name': self.name,
+                    'host': self.host,
+                    'state': str(self.state_state),
+                    'reason': str(self.state_reason)
+                },
+                'fields': {
+                    # Memory utilization is the difference between the current and maximum balloon values.
+                    'total_memory_utilization': round(self.balloon_current / self.balloon_maximum * 100, 2) if self.balloon_current is not None and self.balloon_maximum is not None else -1
+                }
+            }
+
+            _data.append(_memory_datum)
+
+        if self.net_count is not None:
+            _net_datum: Dict = {
+                'measurement': 'net',
+                'time': self.time,
+                'tags': {
+                    'name': self.name,
+                    'host': self.host,
+                    'state': str(self.state_state),
+                    'reason': str(self.state_reason)
+                },
+                'fields': self._net_fields()
+            }
+
+            _data.append(_net_datum)
+
+        if self.block_count is not None:
+            _block_datum: Dict = {
+                'measurement': 'block',
+                'time': self.time,
+                'tags': {
+                    'name': self.name,
+                    'host': self.host,
+                    'state': str(self.state_state),
+                    'reason': str(self.state_reason)
+                },
+                'fields': self._block_fields()
+            }
+
+            _data.append(_block_datum)
+
+        return tuple(_data)
+
+    def to_influx(self) -> Tuple[Dict, ...]:
+        """
+        Convert the domain statistics into a compatible format for InfluxDB.
+
+        Returns:
+            Tuple[Dict, ...]: A tuple of dictionaries representing the (up to) 4 scalable metrics by which we can autoscale at this
+                time. Metrics whose stats groups weren't collected are left out.
+        """
+        _data: List[Dict] = []
+
+        # Each measurement is only produced if the stats groups it's computed from were collected.
+        if self.cpu_time is not None and self.cpu_user is not None and self.cpu_system is not None:
+            _cpu_datum: Dict = {
+                'measurement': 'cpu',
+                'time': int(
+                    self.time.timestamp()
+                    if self.time is not None
+                    else datetime.now().timestamp()
+                ),
+                'tags': {
+                    'name': self.name,
+                    'host': self.host,
+                    'state': str(self.state_state),
+                    'reason': str(self.state_reason)
+                },
+                'fields': {
+                    'total_cpu_utilization': self.cpu_time - (self.cpu_user + self.cpu_system),
+                    'cpu_time': self.cpu_time,
+                    'cpu_user': self.cpu_user,
+                    'cpu_system': self.cpu_system,
+                    'vcpu_current': self.vcpu_current,
+                    'vcpu_maximum': self.vcpu_maximum,
+                }
+            }
+
+            _data.append(_cpu_datum)
+
+        if self.balloon_current is not None or self.balloon_rss is not None:
+            _memory_datum: Dict = {
+                'measurement': 'memory',
+                'time': int(
+                    self.time.timestamp()
+                    if self.time is not None
+                    else datetime.now().timestamp()
+                ),
+                'tags': {
+                    'name': self.name,
+                    'host': self.host,
+                    'state': str(self.state_state),
+                    'reason': str(self.state_reason)
+                },
+                'fields': {
+                    # Memory utilization is the difference between the current and maximum balloon values.
+                    'total_memory_utilization': round(self.balloon_current / self.balloon_maximum * 100, 2) if self.balloon_current is not None and self.balloon_maximum is not None else -1
+                }
+            }
+
+            _data.append(_memory_datum)
+
+        if self.net_count is not None:
+            _net_datum: Dict = {
+                'measurement': 'net',
+                'time': int(
+                    self.time.timestamp()
+                    if self.time is not None
+                    else datetime.now().timestamp()
+                ),
+                'tags': {
+                    'name': self.name,
+                    'host': self.host,
+                    'state': str(self.state_state),
+                    'reason': str(self.state_reason)
+                },
+                'fields': self._net_fields()
+            }
+
+            _data.append(_net_datum)
+
+        if self.block_count is not None:
+            _block_datum: Dict = {
+                'measurement': 'block',
+                'time': int(
+                    self.time.timestamp()
+                    if self.time is not None
+                    else datetime.now().timestamp()
+                ),
+                'tags': {
+                    'name': self.name,
+                    'host': self.host,
+                    'state': str(self.state_state),
+                    'reason': str(self.state_reason)
+                },
+                'fields': self._block_fields()
+            }
+
+            _data.append(_block_datum)
+
+        return tuple(_data)
+
+
+def _int_column() -> array:
+    return array('q')
+
+
+def _float_column() -> array:
+    return array('d')
+
+
+@define
+class DomainRecord:
+    """
+    A compact record of the domain statistics that time series databases are written from.
+
+    DomainStats keeps everything libvirt reports about a domain, with an object per device. A DomainRecord only keeps
+    the stats that points are computed from, with per-device stats pre-summed into plain tuples, and is written out
+    directly: to_line_protocol() formats InfluxDB line protocol without building the intermediate point dictionaries
+    of DomainStats.to_influx(), and measurements() yields TinyFlux fields with a single tags dictionary per domain.
+
+    As with DomainStats, stats that weren't collected are None, and a measurement is only written if the stats groups
+    it's computed from were collected.
+    """
+    name: str
+    host: str
+
+    # Time of the collection, as a POSIX timestamp.
+    time: float
+
+    state: int | None = None
+    reason: int | None = None
+    cpu_time: int | None = None
+    cpu_user: int | None = None
+    cpu_system: int | None = None
+    vcpu_current: int | None = None
+    vcpu_maximum: int | None = None
+    balloon_current: int | None = None
+    balloon_maximum: int | None = None
+    balloon_rss: int | None = None
+    net_count: int | None = None
+    block_count: int | None = None
+
+    # (name, rx + tx bytes, rx + tx errors, rx + tx drops) of each network interface.
+    net: Tuple[Tuple[str, int, int, int], ...] = ()
+
+    # (name, path, allocation, capacity, physical, read bytes, written bytes) of each block device.
+    block: Tuple[Tuple[str, str, int, int, int, int, int], ...] = ()
+
+    # Per-second rates of the counters above, derived from the domain's previous record by a RateCache. Unset until
+    # the domain has been seen twice (or after its counters reset).
+
+    # Percentage of the domain's vCPUs' time spent running.
+    cpu_utilization: float | None = None
+
+    # (name, bytes/s, errors/s, drops/s) of each network interface.
+    net_rates: Tuple[Tuple[str, float, float, float], ...] = ()
+
+    # (name, read bytes/s, written bytes/s) of each block device.
+    block_rates: Tuple[Tuple[str, float, float], ...] = ()
+
+    # Measurements that aren't written, e.g. because a DeadbandFilter found they hadn't changed.
+    suppressed: FrozenSet[str] = frozenset()
+
+    def tags(self) -> Dict[str, str]:
+        """
+        Get the tags every point of the domain is written with.
+
+        Returns:
+            Dict[str, str]: The domain's tags.
+        """
+        return {
+            'name': self.name,
+            'host': self.host,
+            'state': str(self.state),
+            'reason': str(self.reason)
+        }
+
+    def _mountpoints(self) -> Dict[str, int]:
+        """
+        Sum the physical allocation of the domain's block devices by mount point.
+
+        Returns:
+            Dict[str, int]: Physical allocation by mount point.
+        """
+        mountpoints: Dict[str, int] = {}
+
+        for _, path, _, _, physical, _, _ in self.block:
+            _mountpoint = mountpoint(path)
+            mountpoints[_mountpoint] = mountpoints.get(_mountpoint, 0) + physical
+
+        return mountpoints
+
+    def memory_utilization(self) -> float | int:
+        """
+        Compute the domain's memory utilization, i.e. its current balloon size as a percentage of its maximum.
+
+        Returns:
+            float | int: The utilization, or -1 if the balloon's size wasn't collected.
+        """
+        if self.balloon_current is not None and self.balloon_maximum is not None:
+            return round(self.balloon_current / self.balloon_maximum * 100, 2)
+
+        return -1
+
+    def levels(self) -> Iterator[Tuple[str, Tuple[int | float | None, ...]]]:
+        """
+        Get the values of each collected measurement that tell whether it changed: utilizations, counts and rates.
+        Raw counters are left out, since they grow on every collection whether or not the domain is busy.
+
+        Yields:
+            Tuple[str, Tuple[int | float | None, ...]]: Each collected measurement's name and values.
+        """
+        if self.cpu_time is not None and self.cpu_user is not None and self.cpu_system is not None:
+            yield 'cpu', (self.cpu_utilization, self.vcpu_current, self.vcpu_maximum)
+
+        if self.balloon_current is not None or self.balloon_rss is not None:
+            yield 'memory', (self.memory_utilization(),)
+
+        if self.net_count is not None:
+            yield 'net', (self.net_count, *(rate for rates in self.net_rates for rate in rates[1:]))
+
+        if self.block_count is not None:
+            yield 'block', (
+                self.block_count,
+                *(round(allocation / capacity * 100, ) if capacity else 0 for _, _, allocation, capacity, _, _, _ in self.block),
+                *self._mountpoints().values(),
+                *(rate for rates in self.block_rates for rate in rates[1:])
+            )
+
+    def measurements(self) -> Iterator[Tuple[str, Dict[str, int | float | None]]]:
+        """
+        Compute the domain's points, in the schema documented on DomainStats.to_tinyflux.
+
+        Yields:
+            Tuple[str, Dict[str, int | float | None]]: Each collected measurement's name and fields, except suppressed ones.
+        """
+        suppressed = self.suppressed
+
+        if self.cpu_time is not None and self.cpu_user is not None and self.cpu_system is not None and 'cpu' not in suppressed:
+            _fields: Dict[str, int | float | None] = {
                 'total_cpu_utilization': self.cpu_time - (self.cpu_user + self.cpu_system),
                 'cpu_time': self.cpu_time,
                 'cpu_user': self.cpu_user,
@@ -217,191 +635,776 @@ class DomainStats:
                 'vcpu_current': self.vcpu_current,
                 'vcpu_maximum': self.vcpu_maximum,
             }
-        }
 
-        _memory_datum: Dict = {
-            'measurement': 'memory',
-            'time': self.time,
-            'tags': {
-                'name': self.name,
-                'host': self.host,
-                'state': str(self.state_state),
-                'reason': str(self.state_reason)
-            },
-            'fields': {
-                # Memory utilization is the difference between the current and maximum balloon values.
-                'total_memory_utilization': round(self.balloon_current / self.balloon_maximum * 100, 2) if self.balloon_current is not None and self.balloon_maximum is not None else -1
+            if self.cpu_utilization is not None:
+                _fields['cpu_utilization_percent'] = self.cpu_utilization
+
+            yield 'cpu', _fields
+
+        if (self.balloon_current is not None or self.balloon_rss is not None) and 'memory' not in suppressed:
+            yield 'memory', {
+                'total_memory_utilization': self.memory_utilization()
             }
-        }
 
-        _net_datum: Dict = {
-            'measurement': 'net',
-            'time': self.time,
-            'tags': {
-                'name': self.name,
-                'host': self.host,
-                'state': str(self.state_state),
-                'reason': str(self.state_reason)
-            },
-            'fields': {
+        if self.net_count is not None and 'net' not in suppressed:
+            _fields = {
                 'net_count': self.net_count,
-                # Sum utilization, errors and drops across all network interfaces. We can use this to autoscale on network and
-                # set thresholds for network errors and drops to either trigger a scale verb or affect scheduling of workloads.
-                'total_net_utilization': sum(net.rx_bytes + net.tx_bytes for net in self.net),
-                'total_net_errors': sum(net.rx_errs + net.tx_errs for net in self.net),
-                'total_net_drops': sum(net.rx_drop + net.tx_drop for net in self.net)
+                'total_net_utilization': sum(net[1] for net in self.net),
+                'total_net_errors': sum(net[2] for net in self.net),
+                'total_net_drops': sum(net[3] for net in self.net)
             }
-        }
 
-        # Calculate the utilization of each network interface.
-        for net in self.net:
-            # To autoscale on network interface utilization, we can use the sum of the rx_bytes and tx_bytes fields.
-            # This said, we don't know the % utilization of the physical NICs on the host from this metric. Virtual
-            # NICs are likely never going to be bottleneck intra-host, but physical NICs are.
-            _net_datum['fields'][f'{net.name}_utilization'] = net.rx_bytes + net.tx_bytes
+            for name, utilization, _, _ in self.net:
+                _fields[f'{name}_utilization'] = utilization
 
-        _block_datum: Dict = {
-            'measurement': 'block',
-            'time': self.time,
-            'tags': {
-                'name': self.name,
-                'host': self.host,
-                'state': str(self.state_state),
-                'reason': str(self.state_reason)
-            },
-            'fields': {
+            if self.net_rates:
+                _fields['net_bytes_per_second'] = round(sum(rates[1] for rates in self.net_rates), 2)
+                _fields['net_errors_per_second'] = round(sum(rates[2] for rates in self.net_rates), 2)
+                _fields['net_drops_per_second'] = round(sum(rates[3] for rates in self.net_rates), 2)
+
+                for name, _bytes, _, _ in self.net_rates:
+                    _fields[f'{name}_bytes_per_second'] = _bytes
+
+            yield 'net', _fields
+
+        if self.block_count is not None and 'block' not in suppressed:
+            _fields = {
                 'block_count': self.block_count
             }
-        }
 
-        # Calculate the capacity utilization of each block device.
-        for block in self.block:
-            _block_datum['fields'][f'{block.name}_capacity_utilization'] = round(block.allocation / block.capacity * 100, )
+            for name, _, allocation, capacity, _, _, _ in self.block:
+                _fields[f'{name}_capacity_utilization'] = round(allocation / capacity * 100, ) if capacity else 0
+
+            for _mountpoint, physical in self._mountpoints().items():
+                _fields[f'{_mountpoint}_utilization'] = physical
+
+            if self.block_rates:
+                _fields['block_read_bytes_per_second'] = round(sum(rates[1] for rates in self.block_rates), 2)
+                _fields['block_write_bytes_per_second'] = round(sum(rates[2] for rates in self.block_rates), 2)
+
+                for name, read, write in self.block_rates:
+                    _fields[f'{name}_read_bytes_per_second'] = read
+                    _fields[f'{name}_write_bytes_per_second'] = write
+
+            yield 'block', _fields
+
+    def to_line_protocol(self) -> str:
+        """
+        Format the domain's points as InfluxDB line protocol, with second precision timestamps. Fields are written
+        as they would be by influxdb_client's Point: integers with an 'i' suffix, and None fields left out.
+
+        Returns:
+            str: One line per collected measurement that isn't suppressed, or an empty string if there are none.
+        """
+        escape = _LINE_PROTOCOL_ESCAPES
+        suppressed = self.suppressed
+        timestamp = int(self.time)
+        tags = f'host={self.host.translate(escape)},name={self.name.translate(escape)},reason={str(self.reason).translate(escape)},state={str(self.state).translate(escape)}'
+        lines: List[str] = []
+
+        if self.cpu_time is not None and self.cpu_user is not None and self.cpu_system is not None and 'cpu' not in suppressed:
+            vcpu = ''
+
+            if self.vcpu_current is not None:
+                vcpu += f',vcpu_current={self.vcpu_current}i'
+
+            if self.vcpu_maximum is not None:
+                vcpu += f',vcpu_maximum={self.vcpu_maximum}i'
+
+            if self.cpu_utilization is not None:
+                vcpu += f',cpu_utilization_percent={self.cpu_utilization!r}'
+
+            lines.append(
+                f'cpu,{tags} total_cpu_utilization={self.cpu_time - (self.cpu_user + self.cpu_system)}i,'
+                f'cpu_time={self.cpu_time}i,cpu_user={self.cpu_user}i,cpu_system={self.cpu_system}i{vcpu} {timestamp}'
+            )
+
+        if (self.balloon_current is not None or self.balloon_rss is not None) and 'memory' not in suppressed:
+            memory = self.memory_utilization()
+            utilization = f'{memory!r}' if isinstance(memory, float) else f'{memory}i'
+
+            lines.append(f'memory,{tags} total_memory_utilization={utilization} {timestamp}')
+
+        if self.net_count is not None and 'net' not in suppressed:
+            _bytes = errors = drops = 0
+            interfaces = ''
+
+            for name, _utilization, _errors, _drops in self.net:
+                _bytes += _utilization
+                errors += _errors
+                drops += _drops
+                interfaces += f',{name.translate(escape)}_utilization={_utilization}i'
+
+            if self.net_rates:
+                _rates = [0.0, 0.0, 0.0]
+
+                for name, _bytes_rate, _errors_rate, _drops_rate in self.net_rates:
+                    _rates[0] += _bytes_rate
+                    _rates[1] += _errors_rate
+                    _rates[2] += _drops_rate
+                    interfaces += f',{name.translate(escape)}_bytes_per_second={_bytes_rate!r}'
+
+                interfaces += (
+                    f',net_bytes_per_second={round(_rates[0], 2)!r},net_errors_per_second={round(_rates[1], 2)!r},'
+                    f'net_drops_per_second={round(_rates[2], 2)!r}'
+                )
+
+            lines.append(
+                f'net,{tags} net_count={self.net_count}i,total_net_utilization={_bytes}i,'
+                f'total_net_errors={errors}i,total_net_drops={drops}i{interfaces} {timestamp}'
+            )
+
+        if self.block_count is not None and 'block' not in suppressed:
+            devices = ''
+
+            for name, _, allocation, capacity, _, _, _ in self.block:
+                devices += f',{name.translate(escape)}_capacity_utilization={round(allocation / capacity * 100, ) if capacity else 0}i'
+
+            for _mountpoint, physical in self._mountpoints().items():
+                devices += f',{_mountpoint.translate(escape)}_utilization={physical}i'
+
+            if self.block_rates:
+                read = write = 0.0
 
-        for mountpoint in set(os.path.dirname(block.path) for block in self.block):
-            _block_datum['fields'][f'{mountpoint}_utlization'] = sum(block.physical for _block in self.block if os.path.dirname(_block.path) == mountpoint)
+                for name, _read, _write in self.block_rates:
+                    read += _read
+                    write += _write
+                    devices += f',{name.translate(escape)}_read_bytes_per_second={_read!r},{name.translate(escape)}_write_bytes_per_second={_write!r}'
 
-        return (
-            _cpu_datum,
-            _memory_datum,
-            _net_datum,
-            _block_datum
+                devices += f',block_read_bytes_per_second={round(read, 2)!r},block_write_bytes_per_second={round(write, 2)!r}'
+
+            lines.append(f'block,{tags} block_count={self.block_count}i{devices} {timestamp}')
+
+        return '\n'.join(lines)
+
+
+@define
+class DomainStatsBatch:
+    """
+    A columnar batch of domain statistics, e.g. of every domain on a host or of a whole collection cycle.
+
+    Instead of one DomainStats (plus per-device records) per domain, each stat is stored as one typed array across all
+    of the batch's domains, and per-device stats as arrays across all of the batch's devices, each row pointing back at
+    its domain. Appending a domain only appends numbers to existing arrays, so a host with hundreds of domains costs a
+    handful of objects rather than thousands. Batches are picklable, so they can be put on a queue shared between
+    processes.
+
+    The columns only keep batches small while they're queued and pickled; nothing is derived column by column. Batches
+    are written as the DomainRecords records() yields, one per domain, which derive their utilization fields.
+
+    Integer stats that weren't collected are stored as MISSING and come out of records() as None, exactly like None
+    fields of DomainStats: a measurement is only produced if the stats groups it's computed from were collected.
+    """
+
+    # Placeholder for stats that weren't collected. Every stat libvirt reports is non-negative.
+    MISSING = -1
+
+    # Integer stats stored per domain.
+    DOMAIN_COLUMNS = (
+        'state_state',
+        'state_reason',
+        'cpu_time',
+        'cpu_user',
+        'cpu_system',
+        'vcpu_current',
+        'vcpu_maximum',
+        'balloon_current',
+        'balloon_maximum',
+        'balloon_rss',
+        'net_count',
+        'block_count',
+    )
+
+    # Integer stats stored per device, besides their names.
+    NET_COLUMNS = ('rx_bytes', 'rx_errs', 'rx_drop', 'tx_bytes', 'tx_errs', 'tx_drop')
+    BLOCK_COLUMNS = ('allocation', 'capacity', 'physical', 'rd_bytes', 'wr_bytes')
+
+    # Domains
+    name: List[str] = ib(factory=list)
+    host: List[str] = ib(factory=list)
+    time: array = ib(factory=_float_column)
+    state_state: array = ib(factory=_int_column)
+    state_reason: array = ib(factory=_int_column)
+    cpu_time: array = ib(factory=_int_column)
+    cpu_user: array = ib(factory=_int_column)
+    cpu_system: array = ib(factory=_int_column)
+    vcpu_current: array = ib(factory=_int_column)
+    vcpu_maximum: array = ib(factory=_int_column)
+    balloon_current: array = ib(factory=_int_column)
+    balloon_maximum: array = ib(factory=_int_column)
+    balloon_rss: array = ib(factory=_int_column)
+    net_count: array = ib(factory=_int_column)
+    block_count: array = ib(factory=_int_column)
+
+    # Network interfaces, by the index of their domain in the batch.
+    net_domain: array = ib(factory=_int_column)
+    net_name: List[str] = ib(factory=list)
+    net_rx_bytes: array = ib(factory=_int_column)
+    net_rx_errs: array = ib(factory=_int_column)
+    net_rx_drop: array = ib(factory=_int_column)
+    net_tx_bytes: array = ib(factory=_int_column)
+    net_tx_errs: array = ib(factory=_int_column)
+    net_tx_drop: array = ib(factory=_int_column)
+
+    # Block devices, by the index of their domain in the batch.
+    block_domain: array = ib(factory=_int_column)
+    block_name: List[str] = ib(factory=list)
+    block_path: List[str] = ib(factory=list)
+    block_allocation: array = ib(factory=_int_column)
+    block_capacity: array = ib(factory=_int_column)
+    block_physical: array = ib(factory=_int_column)
+    block_rd_bytes: array = ib(factory=_int_column)
+    block_wr_bytes: array = ib(factory=_int_column)
+
+    # Number of points the batch is written as, maintained as domains are added.
+    points: int = ib(default=0)
+
+    # Stats of the hosts the domains were collected from, written alongside them.
+    hosts: List[HostStats] = ib(factory=list)
+
+    # Storage allocation of the hosts' mount points, written alongside them.
+    mountpoints: List[MountpointStats] = ib(factory=list)
+
+    def __len__(self) -> int:
+        """
+        Return the number of domains in the batch.
+
+        Returns:
+            int: The number of domains.
+        """
+        return len(self.name)
+
+    def __bool__(self) -> bool:
+        """
+        Check whether the batch has anything to write. A host without running domains still has its own stats.
+
+        Returns:
+            bool: True if the batch holds any domains or hosts.
+        """
+        return bool(self.name) or bool(self.hosts)
+
+    @classmethod
+    def from_domains(cls, domains: Iterable[DomainStats]) -> DomainStatsBatch:
+        """
+        Build a batch from DomainStats.
+
+        Args:
+            domains (Iterable[DomainStats]): The domains' stats.
+
+        Returns:
+            DomainStatsBatch: A batch of the domains' stats.
+        """
+        batch = cls()
+
+        for domain in domains:
+            batch.append(
+                domain.name,
+                domain.host,
+                domain.time.timestamp() if domain.time is not None else now(),
+                {column: getattr(domain, column) for column in cls.DOMAIN_COLUMNS},
+                [{'name': net.name, **{column: getattr(net, column) for column in cls.NET_COLUMNS}} for net in domain.net],
+                [{'name': block.name, 'path': block.path, **{column: getattr(block, column) for column in cls.BLOCK_COLUMNS}} for block in domain.block]
+            )
+
+        return batch
+
+    def append(self,
+               name: str,
+               host: str,
+               time: float,
+               stats: Dict[str, Any],
+               net: List[Dict[str, Any]],
+               block: List[Dict[str, Any]]) -> None:
+        """
+        Append a domain's stats to the batch.
+
+        Args:
+            name (str): The domain's name.
+            host (str): The name of the host the domain runs on.
+            time (float): Time of the collection, as a POSIX timestamp.
+            stats (Dict[str, Any]): The domain's stats by column name. Stats that weren't collected can be left out or None.
+            net (List[Dict[str, Any]]): The domain's network interfaces' stats. Incomplete interfaces are skipped.
+            block (List[Dict[str, Any]]): The domain's block devices' stats. Incomplete devices are skipped.
+        """
+        missing = self.MISSING
+        index = len(self.name)
+        nets = blocks = 0
+
+        for interface in net:
+            try:
+                values = (interface['name'], *(interface[column] for column in self.NET_COLUMNS))
+            except KeyError as e:
+                log.debug(f'Skipping incomplete net device of domain {name}: missing {e}')
+                continue
+
+            self.net_domain.append(index)
+            self.net_name.append(values[0])
+            self.net_rx_bytes.append(values[1])
+            self.net_rx_errs.append(values[2])
+            self.net_rx_drop.append(values[3])
+            self.net_tx_bytes.append(values[4])
+            self.net_tx_errs.append(values[5])
+            self.net_tx_drop.append(values[6])
+            nets += 1
+
+        for device in block:
+            try:
+                values = (device['name'], device['path'], *(device[column] for column in self.BLOCK_COLUMNS))
+            except KeyError as e:
+                log.debug(f'Skipping incomplete block device of domain {name}: missing {e}')
+                continue
+
+            self.block_domain.append(index)
+            self.block_name.append(values[0])
+            self.block_path.append(values[1])
+            self.block_allocation.append(values[2])
+            self.block_capacity.append(values[3])
+            self.block_physical.append(values[4])
+            self.block_rd_bytes.append(values[5])
+            self.block_wr_bytes.append(values[6])
+            blocks += 1
+
+        # As with DomainStats, leave the counts unset if their group wasn't collected, so records can tell it apart
+        # from a domain without any devices.
+        if stats.get('net_count') is None and nets:
+            stats = {**stats, 'net_count': nets}
+
+        if stats.get('block_count') is None and blocks:
+            stats = {**stats, 'block_count': blocks}
+
+        self.name.append(name)
+        self.host.append(host)
+        self.time.append(time)
+
+        for column in self.DOMAIN_COLUMNS:
+            value = stats.get(column)
+            getattr(self, column).append(missing if value is None else value)
+
+        if stats.get('vcpu_current') is not None and stats.get('vcpu_current') != stats.get('vcpu_maximum'):
+            log.warning(f'vCPU count disparity for {name}: {stats.get("vcpu_current")} current != {stats.get("vcpu_maximum")} max. ')
+
+        self.points += (
+            (self.cpu_time[index] != missing and self.cpu_user[index] != missing and self.cpu_system[index] != missing)
+            + (self.balloon_current[index] != missing or self.balloon_rss[index] != missing)
+            + (self.net_count[index] != missing)
+            + (self.block_count[index] != missing)
         )
 
-    def to_influx(self) -> Tuple[Dict, Dict, Dict, Dict]:
+    def extend(self, other: DomainStatsBatch) -> None:
         """
-        Convert the domain statistics into a compatible format for InfluxDB.
+        Append every domain of another batch to this one.
+
+        Args:
+            other (DomainStatsBatch): The batch to append.
+        """
+        offset = len(self.name)
+
+        self.name.extend(other.name)
+        self.host.extend(other.host)
+        self.time.extend(other.time)
+
+        for column in self.DOMAIN_COLUMNS:
+            getattr(self, column).extend(getattr(other, column))
+
+        self.net_domain.extend(index + offset for index in other.net_domain)
+        self.net_name.extend(other.net_name)
+
+        for column in self.NET_COLUMNS:
+            getattr(self, f'net_{column}').extend(getattr(other, f'net_{column}'))
+
+        self.block_domain.extend(index + offset for index in other.block_domain)
+        self.block_name.extend(other.block_name)
+        self.block_path.extend(other.block_path)
+
+        for column in self.BLOCK_COLUMNS:
+            getattr(self, f'block_{column}').extend(getattr(other, f'block_{column}'))
+
+        self.points += other.points
+        self.hosts.extend(other.hosts)
+        self.mountpoints.extend(other.mountpoints)
+
+    def add_host(self, stats: HostStats) -> None:
+        """
+        Attach the stats of the host the batch's domains were collected from, filling in its allocation, along with
+        the storage allocation of its mount points.
+
+        Args:
+            stats (HostStats): The host's stats.
+        """
+        stats.allocate(self)
+        self.hosts.append(stats)
+
+        mountpoints = self.mountpoint_stats(stats.name, stats.address, stats.time)
+        self.mountpoints.extend(mountpoints)
+
+        self.points += 1 + len(mountpoints)
+
+    def mountpoint_stats(self, host: str, address: str, time: datetime | None = None) -> List[MountpointStats]:
+        """
+        Sum the allocation, capacity and physical size of the batch's block devices by mount point, in a single pass.
+
+        Args:
+            host (str): Name of the host the batch's domains run on.
+            address (str): Address of the host the batch's domains run on.
+            time (datetime | None): Time of the collection. Defaults to now.
 
         Returns:
-            Tuple[Dict, Dict, Dict, Dict]: A tuple of dictionaries representing the 4 scalable metrics by which we can autoscale at this time.
+            List[MountpointStats]: Stats of each mount point the batch's block devices are backed by.
         """
-        _cpu_datum: Dict = {
-            'measurement': 'cpu',
-            'time': int(
-                self.time.timestamp()
-                if self.time is not None
-                else datetime.now().timestamp()
-            ),
+        # [disks, domains, allocation, capacity, physical, index of the last domain counted]
+        totals: Dict[str, List[int]] = {}
+
+        for index, path, allocation, capacity, physical in zip(
+            self.block_domain, self.block_path, self.block_allocation, self.block_capacity, self.block_physical
+        ):
+            _mountpoint = mountpoint(path)
+
+            if (total := totals.get(_mountpoint)) is None:
+                total = totals[_mountpoint] = [0, 0, 0, 0, 0, -1]
+
+            total[0] += 1
+            total[2] += allocation
+            total[3] += capacity
+            total[4] += physical
+
+            # A domain's devices are contiguous, so it's only counted once per mount point.
+            if total[5] != index:
+                total[1] += 1
+                total[5] = index
+
+        return [
+            MountpointStats(
+                name=host,
+                address=address,
+                mountpoint=_mountpoint,
+                disks=disks,
+                domains=domains,
+                allocation=allocation,
+                capacity=capacity,
+                physical=physical,
+                time=time
+            ) for _mountpoint, (disks, domains, allocation, capacity, physical, _) in totals.items()
+        ]
+
+    def records(self) -> Iterator[DomainRecord]:
+        """
+        Yield a DomainRecord per domain in the batch, in order.
+
+        Yields:
+            DomainRecord: Each domain's record.
+        """
+        missing = self.MISSING
+        net = block = 0
+
+        def value(column: array, index: int) -> int | None:
+            return None if column[index] == missing else column[index]
+
+        # Device rows are appended in the order of their domains, so each domain's devices are a contiguous run.
+        for index, name in enumerate(self.name):
+            _net = net
+
+            while net < len(self.net_domain) and self.net_domain[net] == index:
+                net += 1
+
+            _block = block
+
+            while block < len(self.block_domain) and self.block_domain[block] == index:
+                block += 1
+
+            yield DomainRecord(
+                name=name,
+                host=self.host[index],
+                time=self.time[index],
+                state=value(self.state_state, index),
+                reason=value(self.state_reason, index),
+                cpu_time=value(self.cpu_time, index),
+                cpu_user=value(self.cpu_user, index),
+                cpu_system=value(self.cpu_system, index),
+                vcpu_current=value(self.vcpu_current, index),
+                vcpu_maximum=value(self.vcpu_maximum, index),
+                balloon_current=value(self.balloon_current, index),
+                balloon_maximum=value(self.balloon_maximum, index),
+                balloon_rss=value(self.balloon_rss, index),
+                net_count=value(self.net_count, index),
+                block_count=value(self.block_count, index),
+                net=tuple(zip(
+                    self.net_name[_net:net],
+                    map(int.__add__, self.net_rx_bytes[_net:net], self.net_tx_bytes[_net:net]),
+                    map(int.__add__, self.net_rx_errs[_net:net], self.net_tx_errs[_net:net]),
+                    map(int.__add__, self.net_rx_drop[_net:net], self.net_tx_drop[_net:net])
+                )),
+                block=tuple(zip(
+                    self.block_name[_block:block],
+                    self.block_path[_block:block],
+                    self.block_allocation[_block:block],
+                    self.block_capacity[_block:block],
+                    self.block_physical[_block:block],
+                    self.block_rd_bytes[_block:block],
+                    self.block_wr_bytes[_block:block]
+                ))
+            )
+
+
+@define
+class HostFacts:
+    """
+    A dataclass for storing the static facts of a host, which don't change for as long as a connection to it is open
+    and libvirt isn't upgraded.
+    """
+    hostname: str
+    type: str
+    version: int
+    libvirt_version: int
+
+    # From node_info.
+    arch: str
+    memory: int  # Bytes
+    cpus: int
+    mhz: int
+    nodes: int
+    sockets: int
+    cores: int
+    threads: int
+
+    max_vcpus: int
+
+    uri: str | None = ib(default=None)
+
+    # The raw capabilities XML, parsed on first use. On NUMA hosts it runs to hundreds of KiB, and most visits never
+    # need it.
+    capabilities_xml: str = ib(default='', repr=False)
+    _capabilities: Dict | None = ib(default=None, init=False, repr=False, eq=False)
+
+    @property
+    def capabilities(self) -> Dict:
+        """
+        The host's capabilities, parsed from their XML once.
+
+        Returns:
+            Dict: The parsed capabilities, or an empty dictionary if there are none.
+        """
+        if self._capabilities is None:
+            self._capabilities = xmlparse(self.capabilities_xml) if self.capabilities_xml else {}
+
+        return self._capabilities
+
+
+@define
+class HostStats:
+    """
+    A dataclass for storing host time series metrics: the host's capacity, its utilization, and how much of it is
+    allocated to domains.
+
+    Counters that weren't collected are None, and are left out of the host's point.
+    """
+    name: str
+    address: str
+
+    # Capacity, from the host's facts.
+    cpus: int
+    mhz: int
+    max_vcpus: int
+    memory_total: int  # Bytes
+
+    # Cumulative CPU time of all of the host's CPUs by mode, in nanoseconds.
+    cpu_kernel: int | None = ib(default=None)
+    cpu_user: int | None = ib(default=None)
+    cpu_idle: int | None = ib(default=None)
+    cpu_iowait: int | None = ib(default=None)
+
+    # Percentage of CPU time spent busy since the host was last visited.
+    cpu_utilization: float | None = ib(default=None)
+
+    # Bytes
+    memory_free: int | None = ib(default=None)
+    memory_buffers: int | None = ib(default=None)
+    memory_cached: int | None = ib(default=None)
+
+    # Allocation to running domains. Unset if the stats groups they're computed from weren't collected.
+    domains: int | None = ib(default=None)
+    vcpus_allocated: int | None = ib(default=None)
+    memory_allocated: int | None = ib(default=None)  # Bytes
+
+    # Time of the collection. This is important for time series databases.
+    time: datetime | None = ib(default=None)
+
+    def __attrs_post_init__(self) -> None:
+        if self.time is None:
+            self.time = datetime.now(tz=timezone.utc)
+
+    def allocate(self, domains: DomainStatsBatch) -> None:
+        """
+        Record how much of the host is allocated to its running domains.
+
+        Args:
+            domains (DomainStatsBatch): Stats of every running domain on the host.
+        """
+        missing = DomainStatsBatch.MISSING
+
+        self.domains = len(domains)
+
+        if any(vcpus != missing for vcpus in domains.vcpu_current) or not domains:
+            self.vcpus_allocated = sum(vcpus for vcpus in domains.vcpu_current if vcpus != missing)
+
+        # Balloon sizes are in KiB.
+        if any(memory != missing for memory in domains.balloon_maximum) or not domains:
+            self.memory_allocated = sum(memory for memory in domains.balloon_maximum if memory != missing) * 1024
+
+    def _fields(self) -> Dict[str, int | float]:
+        """
+        Compute the fields of the host's point.
+
+        Returns:
+            Dict[str, int | float]: The host's fields, without any that weren't collected.
+        """
+        _fields: Dict[str, int | float | None] = {
+            'cpus': self.cpus,
+            'cpu_mhz': self.mhz,
+            'max_vcpus': self.max_vcpus,
+            'memory_total': self.memory_total,
+            'cpu_kernel': self.cpu_kernel,
+            'cpu_user': self.cpu_user,
+            'cpu_idle': self.cpu_idle,
+            'cpu_iowait': self.cpu_iowait,
+            'cpu_utilization': self.cpu_utilization,
+            'memory_free': self.memory_free,
+            'domains': self.domains,
+            'vcpus_allocated': self.vcpus_allocated,
+            'memory_allocated': self.memory_allocated,
+        }
+
+        # Memory used for buffers and caches can be reclaimed, so it counts as available.
+        if self.memory_free is not None:
+            available = self.memory_free + (self.memory_buffers or 0) + (self.memory_cached or 0)
+            _fields['memory_available'] = available
+            _fields['memory_utilization'] = round((self.memory_total - available) / self.memory_total * 100, 2) if self.memory_total else None
+
+        # Headroom is what placement and scale-up decisions need: capacity left after what's allocated to domains.
+        # It goes negative on overcommitted hosts.
+        if self.vcpus_allocated is not None:
+            _fields['vcpu_headroom'] = self.cpus - self.vcpus_allocated
+
+        if self.memory_allocated is not None:
+            _fields['memory_headroom'] = self.memory_total - self.memory_allocated
+
+        return {field: value for field, value in _fields.items() if value is not None}
+
+    def to_tinyflux(self) -> Dict:
+        """
+        Convert the host statistics into a compatible format for TinyFlux Point objects.
+
+        Returns:
+            Dict: The host's point, in the schema documented on DomainStats.to_tinyflux.
+        """
+        return {
+            'measurement': 'host',
+            'time': self.time,
             'tags': {
-                'name': self.name,
-                'host': self.host,
-                'state': str(self.state_state),
-                'reason': str(self.state_reason)
+                'host': self.name,
+                'address': self.address
             },
-            'fields': {
-                'total_cpu_utilization': self.cpu_time - (self.cpu_user + self.cpu_system),
-                'cpu_time': self.cpu_time,
-                'cpu_user': self.cpu_user,
-                'cpu_system': self.cpu_system,
-                'vcpu_current': self.vcpu_current,
-                'vcpu_maximum': self.vcpu_maximum,
-            }
+            'fields': self._fields()
         }
 
-        _memory_datum: Dict = {
-            'measurement': 'memory',
+    def to_influx(self) -> Dict:
+        """
+        Convert the host statistics into a compatible format for InfluxDB.
+
+        Returns:
+            Dict: The host's point.
+        """
+        return {
+            'measurement': 'host',
             'time': int(
                 self.time.timestamp()
                 if self.time is not None
                 else datetime.now().timestamp()
             ),
             'tags': {
-                'name': self.name,
-                'host': self.host,
-                'state': str(self.state_state),
-                'reason': str(self.state_reason)
+                'host': self.name,
+                'address': self.address
             },
-            'fields': {
-                # Memory utilization is the difference between the current and maximum balloon values.
-                'total_memory_utilization': round(self.balloon_current / self.balloon_maximum * 100, 2) if self.balloon_current is not None and self.balloon_maximum is not None else -1
-            }
+            'fields': self._fields()
         }
 
-        _net_datum: Dict = {
-            'measurement': 'net',
-            'time': int(
-                self.time.timestamp()
-                if self.time is not None
-                else datetime.now().timestamp()
-            ),
+
+@define
+class MountpointStats:
+    """
+    A dataclass for storing how much of a mount point on a host is allocated to the block devices of its running
+    domains, so storage-aware placement can read one point per mount point instead of one per disk.
+    """
+    name: str
+    address: str
+    mountpoint: str
+
+    disks: int
+    domains: int
+
+    # Bytes, summed over the mount point's block devices.
+    allocation: int
+    capacity: int
+    physical: int
+
+    # Time of the collection. This is important for time series databases.
+    time: datetime | None = ib(default=None)
+
+    def __attrs_post_init__(self) -> None:
+        if self.time is None:
+            self.time = datetime.now(tz=timezone.utc)
+
+    def _fields(self) -> Dict[str, int | float]:
+        """
+        Compute the fields of the mount point's point.
+
+        Returns:
+            Dict[str, int | float]: The mount point's fields.
+        """
+        return {
+            'disks': self.disks,
+            'domains': self.domains,
+            'allocation': self.allocation,
+            'capacity': self.capacity,
+            'physical': self.physical,
+            'capacity_utilization': round(self.allocation / self.capacity * 100, 2) if self.capacity else 0
+        }
+
+    def to_tinyflux(self) -> Dict:
+        """
+        Convert the mount point statistics into a compatible format for TinyFlux Point objects.
+
+        Returns:
+            Dict: The mount point's point, in the schema documented on DomainStats.to_tinyflux.
+        """
+        return {
+            'measurement': 'mountpoint',
+            'time': self.time,
             'tags': {
-                'name': self.name,
-                'host': self.host,
-                'state': str(self.state_state),
-                'reason': str(self.state_reason)
+                'host': self.name,
+                'address': self.address,
+                'mountpoint': self.mountpoint
             },
-            'fields': {
-                'net_count': self.net_count,
-                # Sum utilization, errors and drops across all network interfaces. We can use this to autoscale on network and
-                # set thresholds for network errors and drops to either trigger a scale verb or affect scheduling of workloads.
-                'total_net_utilization': sum(net.rx_bytes + net.tx_bytes for net in self.net),
-                'total_net_errors': sum(net.rx_errs + net.tx_errs for net in self.net),
-                'total_net_drops': sum(net.rx_drop + net.tx_drop for net in self.net)
-            }
+            'fields': self._fields()
         }
 
-        # Calculate the utilization of each network interface.
-        for net in self.net:
-            # To autoscale on network interface utilization, we can use the sum of the rx_bytes and tx_bytes fields.
-            # This said, we don't know the % utilization of the physical NICs on the host from this metric. Virtual
-            # NICs are likely never going to be bottleneck intra-host, but physical NICs are.
-            _net_datum['fields'][f'{net.name}_utilization'] = net.rx_bytes + net.tx_bytes
+    def to_influx(self) -> Dict:
+        """
+        Convert the mount point statistics into a compatible format for InfluxDB.
 
-        _block_datum: Dict = {
-            'measurement': 'block',
+        Returns:
+            Dict: The mount point's point.
+        """
+        return {
+            'measurement': 'mountpoint',
             'time': int(
                 self.time.timestamp()
                 if self.time is not None
                 else datetime.now().timestamp()
             ),
             'tags': {
-                'name': self.name,
-                'host': self.host,
-                'state': str(self.state_state),
-                'reason': str(self.state_reason)
+                'host': self.name,
+                'address': self.address,
+                'mountpoint': self.mountpoint
             },
-            'fields': {
-                'block_count': self.block_count
-            }
+            'fields': self._fields()
         }
-
-        # Calculate the capacity utilization of each block device.
-        for block in self.block:
-            _block_datum['fields'][f'{block.name}_capacity_utilization'] = round(block.allocation / block.capacity * 100, )
-
-        for mountpoint in set(os.path.dirname(block.path) for block in self.block):
-            _block_datum['fields'][f'{mountpoint}_utlization'] = sum(block.physical for _block in self.block if os.path.dirname(_block.path) == mountpoint)
-
-        return (
-            _cpu_datum,
-            _memory_datum,
-            _net_datum,
-            _block_datum
-        )
-
-
-@define
-class HostStats:
-    """
-    A dataclass for storing host time series metrics.
-    """
\ No newline at end of file
@@ -0,0 +1,218 @@
+"""
+Parse the flat records returned by libvirt's getAllDomainStats into DomainStats objects or DomainStatsBatches.
+"""
+
+
+from __future__ import annotations
+
+import logging
+
+from typing import TYPE_CHECKING
+from attrs import fields
+from time import time
+from datetime import datetime, timezone
+from premiscale.hypervisor.qemu_data import DomainStats, DomainStatsBatch, vCPU, Net, Block
+
+
+if TYPE_CHECKING:
+    from typing import Any, Dict, Iterable, List, Tuple
+
+
+log = logging.getLogger(__name__)
+
+
+class DomainStatsParser:
+    """
+    A table-driven parser for getAllDomainStats records.
+
+    Records are flat dictionaries with keys like 'cpu.time', 'balloon.last-update' or 'block.2.rd.bytes'. The first
+    time the parser sees a key, it compiles it into a (group, index, field) entry, where group is None for fields of
+    the domain itself and 'vcpu', 'net' or 'block' for fields of one of the domain's devices. Keys that don't map to a
+    field (e.g. stats we don't store) compile to None and are skipped. Since every domain on every host reports
+    (nearly) the same keys, the table is shared and almost every lookup after the first record is a single dict hit.
+
+    Args:
+        max_keys (int): Number of compiled keys after which the table is reset, bounding its memory use. Defaults to 10000.
+    """
+
+    # Per-device groups and the records their fields are parsed into.
+    DEVICES = {
+        'vcpu': vCPU,
+        'net': Net,
+        'block': Block,
+    }
+
+    def __init__(self, max_keys: int = 10_000) -> None:
+        self.max_keys = max_keys
+
+        self._table: Dict[str, Tuple[str | None, int, str] | None] = {}
+
+        # Fields the records accept. Other keys libvirt returns (e.g. 'vcpu.0.halted') are dropped, as before.
+        self._domain_fields = frozenset(field.name for field in fields(DomainStats)) - {'name', 'host', 'address', *self.DEVICES}
+        self._device_fields = {
+            group: frozenset(field.name for field in fields(record)) for group, record in self.DEVICES.items()
+        }
+
+    def __len__(self) -> int:
+        """
+        Return the number of compiled keys.
+
+        Returns:
+            int: The size of the dispatch table.
+        """
+        return len(self._table)
+
+    def _compile(self, key: str) -> Tuple[str | None, int, str] | None:
+        """
+        Compile a record key into its dispatch table entry.
+
+        Args:
+            key (str): A getAllDomainStats record key, e.g. 'net.0.rx.bytes'.
+
+        Returns:
+            Tuple[str | None, int, str] | None: The key's group (None for domain fields), device index and field name,
+                or None if the key isn't stored.
+        """
+        group, _, rest = key.partition('.')
+
+        # Per-device keys are '<group>.<index>.<field>'; others, like 'vcpu.current' or 'net.count', belong to the domain.
+        if group in self.DEVICES:
+            index, _, field = rest.partition('.')
+
+            if index.isdigit() and field:
+                field = field.replace('.', '_').replace('-', '_')
+
+                if field not in self._device_fields[group]:
+                    return None
+
+                return (group, int(index), field)
+
+        field = key.replace('.', '_').replace('-', '_')
+
+        if field not in self._domain_fields:
+            return None
+
+        return (None, 0, field)
+
+    def _devices(self, group: str, records: List[Dict[str, Any]], name: str) -> List:
+        """
+        Build a domain's device records of one group.
+
+        Args:
+            group (str): The device group.
+            records (List[Dict[str, Any]]): Parsed fields of each device, by index.
+            name (str): The domain's name, for logging.
+
+        Returns:
+            List: The group's records.
+        """
+        record = self.DEVICES[group]
+        devices = []
+
+        for index, _fields in enumerate(records):
+            try:
+                devices.append(record(**_fields))
+            except TypeError as e:
+                log.debug(f'Skipping incomplete {group} device {index} of domain {name}: {e}')
+
+        return devices
+
+    def _split(self, stats: Dict[str, Any]) -> Tuple[Dict[str, Any], Dict[str, List[Dict[str, Any]]]]:
+        """
+        Split one domain's record into the domain's own fields and its devices' fields.
+
+        Args:
+            stats (Dict[str, Any]): The domain's getAllDomainStats record.
+
+        Returns:
+            Tuple[Dict[str, Any], Dict[str, List[Dict[str, Any]]]]: The domain's fields, and each device group's fields
+                by device index.
+        """
+        table = self._table
+        domain: Dict[str, Any] = {}
+        devices: Dict[str, List[Dict[str, Any]]] = {group: [] for group in self.DEVICES}
+
+        for key, value in stats.items():
+            try:
+                entry = table[key]
+            except KeyError:
+                if len(table) >= self.max_keys:
+                    log.debug(f'Domain stats dispatch table reached {self.max_keys} keys, resetting it')
+                    table.clear()
+
+                entry = table[key] = self._compile(key)
+
+            if entry is None:
+                continue
+
+            group, index, field = entry
+
+            if group is None:
+                domain[field] = value
+                continue
+
+            records = devices[group]
+
+            while len(records) <= index:
+                records.append({})
+
+            records[index][field] = value
+
+        return domain, devices
+
+    def parse(self, name: str, host: str, address: str, stats: Dict[str, Any], timestamp: float | None = None) -> DomainStats:
+        """
+        Parse one domain's record.
+
+        Args:
+            name (str): The domain's name.
+            host (str): The name of the host the domain runs on.
+            address (str): The address of the host the domain runs on.
+            stats (Dict[str, Any]): The domain's getAllDomainStats record.
+            timestamp (float | None): When the record was collected, as a POSIX timestamp. Defaults to now.
+
+        Returns:
+            DomainStats: The domain's stats.
+        """
+        domain, devices = self._split(stats)
+
+        return DomainStats(
+            name=name,
+            host=host,
+            address=address,
+            vcpu=self._devices('vcpu', devices['vcpu'], name),
+            net=self._devices('net', devices['net'], name),
+            block=self._devices('block', devices['block'], name),
+            time=datetime.fromtimestamp(timestamp, tz=timezone.utc) if timestamp is not None else None,
+            **domain
+        )
+
+    def parse_batch(self,
+                    host: str,
+                    records: Iterable[Tuple[str, Dict[str, Any]]],
+                    batch: DomainStatsBatch | None = None,
+                    timestamp: float | None = None) -> DomainStatsBatch:
+        """
+        Parse the records of a host's domains straight into a columnar batch, without building DomainStats.
+
+        Args:
+            host (str): The name of the host the domains run on.
+            records (Iterable[Tuple[str, Dict[str, Any]]]): Each domain's name and getAllDomainStats record.
+            batch (DomainStatsBatch | None): A batch to append the domains to. Defaults to a new batch.
+            timestamp (float | None): When the records were collected, as a POSIX timestamp. Defaults to now.
+
+        Returns:
+            DomainStatsBatch: The batch the domains were appended to.
+        """
+        if batch is None:
+            batch = DomainStatsBatch()
+
+        # Records come from a single getAllDomainStats call, so they share a collection time.
+        if timestamp is None:
+            timestamp = time()
+
+        for name, stats in records:
+            domain, devices = self._split(stats)
+            batch.append(name, host, timestamp, domain, devices['net'], devices['block'])
+
+        return batch
@@ -8,23 +8,37 @@ The other portion is dedicated to factory methods for building connections to th
 
 from __future__ import annotations
 
+import asyncio
 import logging
+import socket
 
-from typing import TYPE_CHECKING
-from concurrent.futures import ThreadPoolExecutor
+from typing import TYPE_CHECKING, cast
+from zlib import crc32
 from setproctitle import setproctitle
 from cattrs import unstructure
-from time import sleep
-from datetime import datetime, timedelta
-from premiscale.hypervisor import build_hypervisor_connection
+from datetime import datetime, timedelta, timezone
+from functools import partial
+from premiscale.hypervisor.events import DomainEvents
+from premiscale.hypervisor.pool import ConnectionPool
+from premiscale.metrics.cluster import Cluster, FileMembership, StateMembership
+from premiscale.metrics.deadband import DeadbandFilter
+from premiscale.metrics.engine import CollectionEngine
+from premiscale.metrics.rates import RateCache
+from premiscale.metrics.rollup import Rollups
+from premiscale.metrics.scheduler import Scheduler
+from premiscale.metrics.sink import Sink, Writer
+from premiscale.metrics.timeseries._base import Query
 
 
 if TYPE_CHECKING:
-    from typing import Iterator, List, Tuple
+    from typing import Dict, FrozenSet, Iterator, List
     # TODO: Update this to 'from premiscale.config._config import ConfigVersion as Config' once an ABC for Host is implemented.
     from premiscale.config.v1alpha1 import Config, Host
+    from premiscale.metrics.cluster import Membership
+    from premiscale.metrics.engine import Deadline
     from premiscale.metrics.state._base import State
     from premiscale.metrics.timeseries._base import TimeSeries
+    from multiprocessing.queues import Queue
 
 
 log = logging.getLogger(__name__)
@@ -54,6 +68,33 @@ def build_timeseries_connection(config: Config) -> TimeSeries:
                 retention=timedelta(seconds=config.controller.databases.timeseries.retention),
                 file=config.controller.databases.timeseries.dbfile
             )
+        case 'ringbuffer':
+            log.debug(f'Using in-memory ring buffers for time series database')
+            from premiscale.metrics.timeseries.ringbuffer import RingBuffer
+
+            if (capacity := config.controller.databases.timeseries.capacity) is None:
+                # Enough points per series to cover retention at the shortest collection interval, plus one.
+                interval = min([
+                    config.controller.databases.collectionInterval,
+                    *(host.collectionInterval for host in config.controller.autoscale.hosts if host.collectionInterval is not None),
+                    *(asg.collectionInterval for _, asg in config.controller.autoscale.groups.items() if asg.collectionInterval is not None)
+                ])
+                capacity = -(-config.controller.databases.timeseries.retention // interval) + 1
+
+            return RingBuffer(
+                retention=timedelta(seconds=config.controller.databases.timeseries.retention),
+                capacity=capacity
+            )
+        case 'segments':
+            log.debug(f'Using segment files in {config.controller.databases.timeseries.dbfile} for time series database')
+            from premiscale.metrics.timeseries.segments import Segments
+
+            return Segments(
+                retention=timedelta(seconds=config.controller.databases.timeseries.retention),
+                path=cast(str, config.controller.databases.timeseries.dbfile),
+                duration=config.controller.databases.timeseries.segmentDuration,
+                compression=config.controller.databases.timeseries.segmentCompression
+            )
         case 'influxdb':
             log.debug(f'Using InfluxDB for time series database')
             from premiscale.metrics.timeseries.influxdb import InfluxDB
@@ -65,6 +106,26 @@ def build_timeseries_connection(config: Config) -> TimeSeries:
             raise ValueError(f'Unknown timeseries database type: {config.controller.databases.timeseries.type}')
 
 
+def single_writer(config: Config) -> bool:
+    """
+    Determine whether the time series database only allows a single writer process, i.e. it's stored in a local file.
+    Collector processes then forward their points to one of them to write, rather than each writing their own.
+
+    Args:
+        config (Config): The configuration object.
+
+    Returns:
+        bool: True if only a single process may write to the time series database.
+    """
+    match config.controller.databases.timeseries.type:
+        case 'memory':
+            return config.controller.databases.timeseries.dbfile is not None
+        case 'segments':
+            return True
+        case _:
+            return False
+
+
 def build_state_connection(config: Config) -> State:
     """
     Build a state collection class.
@@ -97,27 +158,188 @@ def build_state_connection(config: Config) -> State:
             raise ValueError(f'Unknown state database type: {config.controller.databases.state.type}')
 
 
+def build_cluster(config: Config, state: State, lease: bool = True) -> Cluster | None:
+    """
+    Build a cluster membership tracker, if the controller is configured to run as one of several replicas.
+
+    Args:
+        config (Config): The configuration object.
+        state (State): An open state database connection, used for 'state' membership.
+        lease (bool): Whether this process holds the replica's lease (see Cluster). Defaults to True.
+
+    Returns:
+        Cluster | None: A cluster membership tracker, or None if cluster mode isn't configured.
+
+    Raises:
+        ValueError: If the cluster membership type is unknown.
+    """
+    if (cluster := config.controller.cluster) is None:
+        return None
+
+    membership: Membership
+
+    match cluster.membership:
+        case 'state':
+            log.debug(f'Using the state database for cluster membership')
+            membership = StateMembership(
+                state,
+                member=cast(str, cluster.member),
+                lease_timeout=cluster.leaseTimeout
+            )
+        case 'file':
+            log.debug(f'Using lease files in "{cluster.leasePath}" for cluster membership')
+            membership = FileMembership(
+                cast(str, cluster.leasePath),
+                member=cast(str, cluster.member),
+                lease_timeout=cluster.leaseTimeout
+            )
+        case _:
+            raise ValueError(f'Unknown cluster membership type: {cluster.membership}')
+
+    return Cluster(membership, replicas=cluster.virtualNodes, lease=lease)
+
+
 class MetricsCollector:
     """
     Oversee visiting every host and collecting metrics and storing them in the appropriate backend database.
 
+    Collection can be sharded over several collector subprocesses, each of which owns a stable hash-partition of the
+    hosts in the configuration file. Every shard converts its own hosts' stats to points and writes them with a
+    connection of its own, unless the time series database only allows a single writer process; then every shard
+    forwards its points through a shared queue to shard 0, which writes them.
+
+    In cluster mode, hosts are additionally split between controller replicas with a consistent-hash ring, and a
+    collector only visits hosts owned by its own replica. Ownership is rebalanced as replicas join and leave.
+
     Args:
         config (Config): The configuration object.
         timeseries_enabled (bool): Whether to enable time-series data collection. Defaults to False.
+        shard (int): The index of the host partition this collector owns. Defaults to 0.
+        shards (int): The total number of collector shards. Defaults to 1.
     """
-    def __init__(self, config: Config, timeseries_enabled: bool = False) -> None:
+    def __init__(self, config: Config, timeseries_enabled: bool = False, shard: int = 0, shards: int = 1) -> None:
         self.timeseries_enabled = timeseries_enabled
         self.config = config
+        self.shard = shard
+        self.shards = shards
+
+        # In cluster mode, which hosts this controller replica owns is only known once it has joined the cluster.
+        self._cluster: Cluster | None = None
+        self.hosts: List[Host] = self._owned_hosts()
+
+        # Host connections are pooled across collection runs, and every host thread shares a single connection to each
+        # database. These are all opened in the subprocess (see __call__).
+        self._pool: ConnectionPool
+        self._state: State
+        self._timeseries: TimeSeries | None = None
 
-    def __call__(self) -> None:
+        # Host threads hand time series data off to the sink, which batches writes from a thread of its own.
+        self._sink: Sink | None = None
+
+        # Writes the points other shards forward, in shard 0, if the time series database only allows a single writer.
+        self._writer: Writer | None = None
+
+        # Domain lifecycle events keep the state database's inventory of VMs current between visits.
+        self._events: DomainEvents | None = None
+
+    def __call__(self, metrics_queue: Queue | None = None) -> None:
         """
         Start the metrics collection subprocess.
+
+        Args:
+            metrics_queue (Queue | None): A queue shared between collector shards, through which points are forwarded
+                to shard 0 for writing. Only required when running more than one shard and the time series database
+                only allows a single writer (see single_writer). Defaults to None.
         """
-        setproctitle('metrics-collector')
-        log.debug('Starting metrics collection subprocess')
+        setproctitle('metrics-collector' if self.shards == 1 else f'metrics-collector-{self.shard}')
+        log.debug(f'Starting metrics collection subprocess for shard {self.shard + 1} / {self.shards} ({len(self)} hosts)')
+
+        self._pool = ConnectionPool(
+            readonly=True,
+            keepalive=self.config.controller.databases.hostConnectionKeepalive,
+            idle_timeout=self.config.controller.databases.hostConnectionIdleTimeout,
+            failure_threshold=self.config.controller.databases.hostConnectionFailureThreshold,
+            backoff=self.config.controller.databases.hostConnectionBackoff,
+            max_backoff=self.config.controller.databases.hostConnectionMaxBackoff
+        )
 
-        self._initialize_host()
-        self._collectMetrics()
+        self._state = build_state_connection(self.config)
+        self._state.open()
+        self._state.initialize()
+
+        if self.config.controller.databases.hostDomainEvents:
+            self._events = DomainEvents(self._state)
+
+        # Shards of a replica share its lease, so only shard 0 renews it and gives it up.
+        if (cluster := build_cluster(self.config, self._state, lease=self.shard == 0)) is not None:
+            self._cluster = cluster
+            self._cluster.refresh()
+            self.hosts = self._owned_hosts()
+
+        if self.timeseries_enabled:
+            # Shards forward their points to shard 0 if only it may write; otherwise every shard writes its own.
+            forward = metrics_queue if self.shards > 1 and single_writer(self.config) else None
+
+            if forward is None or self.shard == 0:
+                self._timeseries = build_timeseries_connection(self.config)
+                self._timeseries.open()
+
+            if forward is not None and self._timeseries is not None:
+                self._writer = Writer(self._timeseries, forward)
+                self._writer.start()
+
+            # Each shard computes rollups of its own hosts only, so its rollups are those of a collector of its own.
+            collector = self._cluster.member if self._cluster is not None else socket.gethostname()
+
+            self._sink = Sink(
+                # Shard 0 writes its own points directly, next to the ones the Writer inserts.
+                self._timeseries,
+                backend=self.config.controller.databases.timeseries.type,
+                queue_size=self.config.controller.databases.timeseries.writeQueueSize,
+                batch_size=self.config.controller.databases.timeseries.writeBatchSize,
+                flush_interval=self.config.controller.databases.timeseries.writeFlushInterval,
+                forward=forward if self._timeseries is None else None,
+                # Ownership of hosts changes as replicas come and go, so a domain is only considered gone once it has
+                # missed a few visits of the least frequently visited host in the configuration.
+                rates=RateCache(
+                    max_age=3 * max(
+                        (self._collectionInterval(host) for host in self.config.controller.autoscale.hosts),
+                        default=self.config.controller.databases.collectionInterval
+                    )
+                ),
+                rollups=Rollups(
+                    groups=self._hostGroups(),
+                    windows=(self.config.controller.reconciliation.interval,),
+                    collector=collector if self.shards == 1 else f'{collector}-{self.shard}'
+                ),
+                deadband=DeadbandFilter(
+                    absolute=deadband.absolute,
+                    relative=deadband.relative,
+                    max_silence=deadband.maxSilence
+                ) if (deadband := self.config.controller.databases.timeseries.deadband) is not None else None
+            )
+
+            self._sink.start()
+
+        try:
+            self._initialize_host()
+            self._collectMetrics()
+        finally:
+            self._pool.close()
+
+            if self._cluster is not None:
+                self._cluster.leave()
+
+            if self._sink is not None:
+                self._sink.stop()
+
+            if self._writer is not None:
+                self._writer.stop()
+
+            self._state.close()
+
+            if self._timeseries is not None:
+                self._timeseries.close()
 
     def _initialize_host(self, host: Host | None = None) -> None:
         """
@@ -131,15 +353,11 @@ class MetricsCollector:
 
         _start_time = datetime.now()
 
-        stateConnection = build_state_connection(self.config)
-        stateConnection.open()
-        stateConnection.initialize()
-
         if host is not None:
             _host_dict = host.state()
 
-            if not stateConnection.host_exists(host.name, host.address):
-                stateConnection.host_create(**_host_dict)
+            if not self._state.host_exists(host.name, host.address):
+                self._state.host_create(**_host_dict)
 
             _end_time = datetime.now()
 
@@ -148,8 +366,8 @@ class MetricsCollector:
             return None
 
         for _h in self:
-            if not stateConnection.host_exists(_h.name, _h.address):
-                stateConnection.host_create(
+            if not self._state.host_exists(_h.name, _h.address):
+                self._state.host_create(
                     **_h.state()
                 )
 
@@ -158,23 +376,78 @@ class MetricsCollector:
 
         log.debug(f'All hosts initialized in state database in {_total_time}s')
 
+    @staticmethod
+    def shard_of(name: str, shards: int) -> int:
+        """
+        Determine which collector shard owns a host. The partition is stable across restarts and processes.
+
+        Args:
+            name (str): The host's name.
+            shards (int): The total number of collector shards.
+
+        Returns:
+            int: The index of the shard owning the host.
+        """
+        return crc32(name.encode('utf-8')) % shards
+
+    def _owned_hosts(self) -> List[Host]:
+        """
+        Determine the hosts in the configuration file owned by this shard and, in cluster mode, this controller replica.
+
+        Returns:
+            List[Host]: The hosts this collector should visit.
+        """
+        return [
+            host for host in self.config.controller.autoscale.hosts
+            if self.shard_of(host.name, self.shards) == self.shard and (self._cluster is None or self._cluster.owns(host.name))
+        ]
+
+    def _rebalance(self, scheduler: Scheduler) -> None:
+        """
+        Recompute host ownership after cluster membership changed, and start or stop visiting hosts accordingly. Hosts
+        that didn't change hands keep their place in the schedule.
+
+        Args:
+            scheduler (Scheduler): The scheduler to update.
+        """
+        _previous = {host.name for host in self}
+        _handed_off = {host.name: host for host in self}
+        self.hosts = self._owned_hosts()
+        _current = {host.name for host in self}
+
+        # Stop watching hosts another replica now owns, so only their owner records their domains.
+        for name in _previous - _current:
+            self._pool.invalidate(_handed_off[name])
+
+            if self._events is not None:
+                self._events.forget(name)
+
+        # Make sure hosts we've taken over are tracked in the state database.
+        self._initialize_host()
+
+        scheduler.update(
+            (host, self._collectionInterval(host)) for host in self
+        )
+
+        log.info(f'Rebalanced hosts between controller replicas: now visiting {len(self)} hosts, took over {len(_current - _previous)}, handed off {len(_previous - _current)}')
+
     def __iter__(self) -> Iterator:
         """
-        Create an iterator that visits every host specified in the configuration file.
+        Create an iterator that visits every host specified in the configuration file and owned by this collector.
 
         Returns:
             Iterator: An iterator that visits every host.
         """
-        return iter(self.config.controller.autoscale.hosts)
+        return iter(self.hosts)
 
     def __len__(self) -> int:
         """
-        Return the number of hosts specified in the configuration file.
+        Return the number of hosts specified in the configuration file and owned by this collector.
 
         Returns:
             int: The number of hosts.
         """
-        return len(self.config.controller.autoscale.hosts)
+        return len(self.hosts)
 
     def __getitem__(self, subscript: int | slice) -> List[Host]:
         """
@@ -187,122 +460,295 @@ class MetricsCollector:
             List[Host]: List of hosts at the specified index or within the range of the slice.
         """
         if isinstance(subscript, slice):
-            return self.config.controller.autoscale.hosts[subscript.start:subscript.stop:subscript.step]
+            return self.hosts[subscript.start:subscript.stop:subscript.step]
         else:
-            return [self.config.controller.autoscale.hosts[subscript]]
+            return [self.hosts[subscript]]
 
     def _collectMetrics(self) -> None:
         """
         Collect metrics from all hosts and store them in the appropriate backend database.
         """
-        # Paginate through hosts to avoid queuing up a large number of jobs to visit hosts.
-        maxpages = max(
-            1,
-            len(self) // self.config.controller.databases.maxHostConnectionThreads + (
-                1 if len(self) % self.config.controller.databases.maxHostConnectionThreads > 0 else 0
-            ),
-            len(self) // (1 if (self.config.controller.databases.hostConnectionQueueSize is None) else self.config.controller.databases.hostConnectionQueueSize) + (
-                1 if len(self) % (len(self) if (self.config.controller.databases.hostConnectionQueueSize is None) else self.config.controller.databases.hostConnectionQueueSize) > 0 else 0
-            )
-        )
-
-        while True:
-            collection_run_start = datetime.now()
+        asyncio.run(self._collectMetricsAsync())
 
-            for page in range(0, maxpages):
+    def _collectionInterval(self, host: Host) -> int:
+        """
+        Determine how often a host should be visited. In order of precedence, this is the host's own collectionInterval,
+        the shortest collectionInterval of any autoscaling group the host backs, or databases.collectionInterval.
 
-                # Set a lower and upper bound for a slice of hosts to visit from the whole config.
-                lower_bound = page * self.config.controller.databases.maxHostConnectionThreads
-                _potential_upper_bound = (1 + page) * self.config.controller.databases.maxHostConnectionThreads
-                upper_bound = _potential_upper_bound if _potential_upper_bound < len(self) else len(self)
+        Args:
+            host (Host): The host to determine the collection interval of.
 
-                if lower_bound == upper_bound:
-                    log.debug(f'No hosts to visit. Ensure you list managed hosts in the config file')
-                    break
+        Returns:
+            int: Seconds between visits to the host.
+        """
+        if host.collectionInterval is not None:
+            return host.collectionInterval
 
-                log.debug(f'Collecting metrics for hosts {lower_bound + 1} to {upper_bound} of total {len(self)}')
+        asg_intervals = [
+            asg.collectionInterval for _, asg in self.config.controller.autoscale.groups.items()
+            if asg.collectionInterval is not None and any(_host.name == host.name for _host in asg.hosts)
+        ]
 
-                # Reset our collection of threads every paginated iteration over hosts.
-                threads = []
+        if asg_intervals:
+            return min(asg_intervals)
 
-                with ThreadPoolExecutor(max_workers=self.config.controller.databases.maxHostConnectionThreads) as executor:
-                    for host in self[lower_bound:upper_bound]:
-                        threads.append(
-                            executor.submit(
-                                self._collectHostMetrics,
-                                host
-                            )
-                        )
+        return self.config.controller.databases.collectionInterval
 
-                    for thread in threads:
-                        if thread is not None:
-                            thread.result()
+    def _statsCacheTTL(self, host: Host) -> float:
+        """
+        Determine how long a host's stats may be reused for, i.e. databases.hostStatsCacheTTL, or half of the host's
+        collection interval, so calls within a visit share one round trip but the next visit always collects afresh.
 
-            # Wait for the next collection interval, or start right away if collection took longer than that interval.
+        Args:
+            host (Host): The host.
 
-            collection_run_end = datetime.now()
-            collection_run_duration = round((collection_run_end - collection_run_start).total_seconds(), 2)
+        Returns:
+            float: The TTL of the host's stats cache in seconds. 0 disables caching.
+        """
+        if (ttl := self.config.controller.databases.hostStatsCacheTTL) is not None:
+            return ttl
 
-            log.debug(f'Collection run took {collection_run_duration} seconds')
+        return self._collectionInterval(host) / 2
 
-            if collection_run_duration < timedelta(seconds=self.config.controller.databases.collectionInterval).total_seconds():
-                actual_sleep = round(self.config.controller.databases.collectionInterval - (collection_run_end - collection_run_start).total_seconds(), 2)
-                log.debug(f'Waiting for {actual_sleep} seconds before revisiting every host')
-                sleep(actual_sleep)
-            else:
-                log.warning(f'Collection took longer than the collection interval of {self.config.controller.databases.collectionInterval} seconds. Starting collection immediately')
+    def _hostGroups(self) -> Dict[str, List[str]]:
+        """
+        Determine which autoscaling groups each host backs.
 
-    def _collectHostMetrics(self, host: Host) -> None:
+        Returns:
+            Dict[str, List[str]]: Names of the autoscaling groups each host backs, by host name.
         """
-        Collect metrics for a single host over a readonly Libvirt connection and store them in the appropriate backend database.
+        groups: Dict[str, List[str]] = {}
 
-        This method is intended to be called with a host argument from a ThreadPoolExecutor-based thread.
+        for name, asg in self.config.controller.autoscale.groups.items():
+            for host in asg.hosts:
+                groups.setdefault(host.name, []).append(name)
+
+        return groups
+
+    def _targetMetrics(self, host: Host) -> FrozenSet[str] | None:
+        """
+        Determine which metrics need to be collected from a host, i.e. the metrics targeted by the autoscaling groups
+        the host backs. Hypervisors only request the stats needed to compute these.
 
         Args:
-            host (Host): The host object to collect metrics from.
+            host (Host): The host to determine the metrics of.
+
+        Returns:
+            FrozenSet[str] | None: The metrics to collect, or None to collect every metric if none of the host's
+                autoscaling groups target any.
         """
-        timeseriesConnection: TimeSeries | None = None
+        metrics = frozenset(
+            metric for _, asg in self.config.controller.autoscale.groups.items()
+            if any(_host.name == host.name for _host in asg.hosts)
+            for metric in asg.scaling.targetUtilization
+        )
 
-        # Set up database interfaces.
-        if self.timeseries_enabled:
-            timeseriesConnection = build_timeseries_connection(self.config)
-            timeseriesConnection.open()
+        return metrics or None
+
+    async def _collectMetricsAsync(self) -> None:
+        """
+        Visit hosts with a CollectionEngine as a Scheduler says they come due, and periodically report on collection.
+        """
+        engine = CollectionEngine(
+            self._collectHostMetrics,
+            concurrency=self.config.controller.databases.maxHostConnectionThreads,
+            threads=cast(int, self.config.controller.databases.hostConnectionExecutorThreads),
+            host_timeout=self.config.controller.databases.hostConnectionTimeout
+        )
+
+        scheduler = Scheduler()
+        scheduler.update(
+            (host, self._collectionInterval(host)) for host in self
+        )
+
+        if len(scheduler) == 0:
+            log.debug(f'No hosts to visit. Ensure you list managed hosts in the config file')
+
+        # Set whenever a visit completes, since rescheduling a host may move the next due time earlier.
+        wakeup = asyncio.Event()
+
+        outcomes: Dict[str, int] = {}
+        backing_off = 0
+        max_lag = 0.0
+
+        def _visited(host: Host, task: asyncio.Task) -> None:
+            scheduler.done(host)
+            outcomes[task.result()] = outcomes.get(task.result(), 0) + 1
 
-        domain_timeseries: List[Tuple] = []
+            # A visit that timed out is most likely stuck in an RPC on its connection. Drop the connection (off the
+            # event loop, since closing it may block) so the next visit starts on a fresh one.
+            if task.result() == engine.TIMED_OUT:
+                asyncio.get_running_loop().run_in_executor(None, self._pool.invalidate, host)
 
-        with build_hypervisor_connection(host, readonly=True) as host_connection:
+            wakeup.set()
+
+        report_interval = self.config.controller.databases.collectionInterval
+        report_start = datetime.now()
+
+        # In cluster mode, renew our lease and pick up replicas joining or leaving every heartbeat interval.
+        heartbeat_interval = self.config.controller.cluster.heartbeatInterval if self.config.controller.cluster is not None else report_interval
+        heartbeat_start = datetime.now()
+
+        try:
+            while True:
+                if self._cluster is not None and (datetime.now() - heartbeat_start).total_seconds() >= heartbeat_interval:
+                    heartbeat_start = datetime.now()
+
+                    # Membership lives in a database or on shared storage, so keep it off the event loop.
+                    if await asyncio.to_thread(self._cluster.refresh):
+                        self._rebalance(scheduler)
+
+                for host, lag in scheduler.pop_due():
+                    max_lag = max(max_lag, lag)
+
+                    # Don't give a slot to a host that's backing off; its breaker will let a probe through later.
+                    if not self._pool.available(host):
+                        scheduler.done(host)
+                        backing_off += 1
+                        continue
+
+                    # This waits for a free slot, so hosts queue up (and accumulate lag) when every slot is busy. A visit
+                    # must finish within its host's interval, so stale data never holds up the next visit.
+                    task = await engine.submit(host, timeout=scheduler.interval(host))
+                    task.add_done_callback(partial(_visited, host))
+
+                if (report_duration := (datetime.now() - report_start).total_seconds()) >= report_interval:
+                    log.debug(f'Visited {sum(outcomes.values())} hosts in the last {round(report_duration, 2)}s: {outcomes.get(engine.SUCCEEDED, 0)} succeeded, {outcomes.get(engine.FAILED, 0)} failed, {outcomes.get(engine.TIMED_OUT, 0)} timed out, {backing_off} skipped while backing off')
+
+                    if engine.overdue > 0:
+                        log.warning(f'{engine.overdue} timed out host visits are still blocked on their hosts')
+
+                    if self._sink is not None:
+                        log.debug(f'Time series sink: {self._sink.written} points written in {self._sink.flushes} batches, {self._sink.qsize()} hosts queued, {self._sink.dropped} domains dropped, {self._sink.failed} points failed')
+
+                        if self._sink.rates is not None:
+                            log.debug(f'Rate cache: {len(self._sink.rates)} domains, {self._sink.rates.resets} counter resets, {self._sink.rates.evicted} evicted')
+
+                        if self._sink.rollups is not None:
+                            log.debug(f'Rollups: {len(self._sink.rollups)} autoscaling groups and hosts')
+
+                        if self._sink.deadband is not None:
+                            log.debug(f'Deadband filter: {self._sink.deadband.emitted} points written, {self._sink.deadband.suppressed} suppressed')
+
+                        # The query scans the report interval's points and holds the store's lock, so it's only run
+                        # when it'll be logged, and off the event loop so it doesn't hold up scheduling.
+                        if self._timeseries is not None and log.isEnabledFor(logging.DEBUG):
+                            try:
+                                utilization = await asyncio.to_thread(
+                                    self._timeseries.query,
+                                    Query(
+                                        start=datetime.now(timezone.utc) - timedelta(seconds=report_interval),
+                                        measurement='host',
+                                        fields=('cpu_utilization', 'memory_utilization'),
+                                        group_by=('host',),
+                                        aggregate='last'
+                                    )
+                                )
+                            except Exception as e:
+                                log.warning(f'Failed to query the latest host utilization: {e}')
+                            else:
+                                summary = ', '.join(f'{_aggregate.tags.get("host")} {_aggregate.field}={_aggregate.value}' for _aggregate in utilization)
+                                log.debug(f'Latest host utilization: {summary}')
+
+                    if self._writer is not None:
+                        log.debug(f'Time series writer: {self._writer.written} points forwarded by other collector processes written, {self._writer.failed} failed')
+
+                    if max_lag > report_interval:
+                        log.warning(f'Host visits started up to {round(max_lag, 2)}s late. Consider raising maxHostConnectionThreads or collection intervals')
+
+                    if self._cluster is not None:
+                        log.debug(f'Hosts owned per controller replica: {self._cluster.assignments(host.name for host in self.config.controller.autoscale.hosts)}')
+
+                    if self._events is not None:
+                        log.debug(f'Domain events: {self._events.events} events received, {len(self._events.index)} domains indexed, {self._events.resyncs} resyncs')
+
+                    hits, misses = self._pool.stats_cache_info()
+
+                    if hits + misses > 0:
+                        log.debug(f'Host stats cache: {hits} hits, {misses} misses ({round(hits / (hits + misses) * 100, 1)}% hit rate) across {len(self._pool)} pooled connections')
+
+                    if (evicted := self._pool.evict_idle()) > 0:
+                        log.debug(f'Evicted {evicted} idle host connections, {len(self._pool)} remain pooled')
+
+                    outcomes.clear()
+                    backing_off = 0
+                    max_lag = 0.0
+                    report_start = datetime.now()
+
+                wait = scheduler.next_wait()
+                wakeup.clear()
+
+                try:
+                    await asyncio.wait_for(
+                        wakeup.wait(),
+                        timeout=min(report_interval, heartbeat_interval) if wait is None else min(wait, report_interval, heartbeat_interval)
+                    )
+                except asyncio.TimeoutError:
+                    pass
+        finally:
+            engine.close()
+
+    def _collectHostMetrics(self, host: Host, deadline: Deadline) -> bool:
+        """
+        Collect metrics for a single host over a pooled, readonly Libvirt connection and store them in the appropriate backend database.
+
+        This method is blocking, and is intended to be called with a host argument from a CollectionEngine worker thread.
+        State is written through the collector's shared, thread-safe state connection, while time series data is handed
+        off to the sink so database latency doesn't add to the visit. Results gathered after the visit's deadline are
+        discarded rather than stored, since the engine has already reported the visit as timed out.
+
+        Args:
+            host (Host): The host object to collect metrics from.
+            deadline (Deadline): The visit's deadline.
+
+        Returns:
+            bool: True if the host was reached and its metrics were collected.
+        """
+        with self._pool.connection(host) as host_connection:
 
             # Exit early; instantiating the connection to the host failed and has already been logged.
             # We'll try again on the next iteration.
             if host_connection is None:
-                return None
+                return False
+
+            if deadline.expired:
+                log.debug(f'Connected to host {host.name} after the visit\'s deadline, skipping collection')
+                return False
 
             log.debug(f'Connection to host {host.name} succeeded, collecting metrics')
 
-            stateConnection = build_state_connection(self.config)
-            stateConnection.open()
+            host_connection.set_stats_cache(self._statsCacheTTL(host))
 
             # Diff current state and recorded state and update the state database. We
             # split reads and writes here to avoid locking the database for too long.
-            if stateConnection.get_host(host.name, host.address) != (host_state := host.state()):
+            if self._state.get_host(host.name, host.address) != (host_state := host.state()):
                 log.debug(f'Host {host.name} has changed. Updating state database entry')
-                stateConnection.host_update(
+                self._state.host_update(
                     **host_state,
                 )
 
-            if timeseriesConnection is not None:
-                # If time series data collection is enabled, collect and store both host and virtual machine time-series data about their performance.
-                domain_timeseries = host_connection.timeseries(
-                    backend=self.config.controller.databases.timeseries.type
-                )
-            else:
+            # Inventory is only listed when a host is first watched (or its connection was reopened); events keep it
+            # current from then on.
+            if self._events is not None:
+                self._events.watch(host_connection)
+
+            if self._sink is None:
                 log.debug(f'Time series data collection is disabled. Skipping collection for host {host.name}')
-                return None
+                return True
+
+            # If time series data collection is enabled, collect virtual machine time-series data about their performance.
+            domains = host_connection.domain_stats_batch(self._targetMetrics(host))
+
+            # Host capacity and utilization come from the same connection, so placement and scale-up decisions can
+            # read the host's headroom from the time series database instead of connecting to it themselves.
+            if (host_stats := host_connection.host_stats()) is not None:
+                domains.add_host(host_stats)
+
+        if deadline.expired:
+            log.debug(f'Discarding late time series metrics for {len(domains)} VMs on host {host.name}')
+            return False
 
-        for domain in domain_timeseries:
-            # vm :: Tuple[Dict, Dict, Dict, Dict]
-            # each Dict is a different measurement by which we can scale on.
-            log.debug(f'Inserting time series metrics for VM: {domain}')
-            timeseriesConnection.insert_batch(domain)
+        log.debug(f'Queueing time series metrics for {len(domains)} VMs on host {host.name}')
+        self._sink.put(domains)
 
-        log.debug(f'Time series metrics currently stored: "{timeseriesConnection.get_all()}"')
\ No newline at end of file
+        return True
\ No newline at end of file
@@ -0,0 +1,351 @@
+"""
+Coordinate host ownership between controller replicas. Replicas advertise themselves through a membership backend and
+place each other on a consistent-hash ring, so every host is visited by exactly one replica, and only the hosts of a
+replica that joins or leaves change hands.
+"""
+
+
+from __future__ import annotations
+
+import bisect
+import hashlib
+import logging
+import os
+
+from typing import TYPE_CHECKING
+from abc import ABC, abstractmethod
+from pathlib import Path
+from time import time
+
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Tuple
+    from premiscale.metrics.state._base import State
+
+
+log = logging.getLogger(__name__)
+
+
+class HashRing:
+    """
+    A consistent-hash ring. Every member is placed on the ring at a number of pseudo-random points (virtual nodes), and
+    a key is owned by the member at the first point clockwise from the key's own hash. Adding or removing a member only
+    moves the keys adjacent to that member's points, i.e. about 1/N of all keys.
+
+    Args:
+        members (Iterable[str]): The initial members of the ring. Defaults to none.
+        replicas (int): The number of virtual nodes per member. More virtual nodes balance keys more evenly. Defaults to 100.
+    """
+    def __init__(self, members: Iterable[str] = (), replicas: int = 100) -> None:
+        self.replicas = max(1, replicas)
+
+        # Parallel sorted lists of point hashes and the members owning them, so lookups are a single bisect.
+        self._points: List[int] = []
+        self._owners: List[str] = []
+        self._members: set = set()
+
+        for member in members:
+            self.add(member)
+
+    def __len__(self) -> int:
+        """
+        Return the number of members on the ring.
+
+        Returns:
+            int: The number of members.
+        """
+        return len(self._members)
+
+    def __contains__(self, member: str) -> bool:
+        return member in self._members
+
+    @property
+    def members(self) -> List[str]:
+        """
+        The members of the ring, sorted.
+
+        Returns:
+            List[str]: The members of the ring.
+        """
+        return sorted(self._members)
+
+    @staticmethod
+    def _hash(key: str) -> int:
+        """
+        Hash a key onto the ring.
+
+        Args:
+            key (str): The key to hash.
+
+        Returns:
+            int: The key's position on the ring.
+        """
+        return int.from_bytes(hashlib.blake2b(key.encode('utf-8'), digest_size=8).digest(), 'big')
+
+    def add(self, member: str) -> None:
+        """
+        Place a member on the ring. Adding a member that's already on the ring does nothing.
+
+        Args:
+            member (str): The member to add.
+        """
+        if member in self._members:
+            return None
+
+        self._members.add(member)
+
+        for replica in range(self.replicas):
+            point = self._hash(f'{member}#{replica}')
+            index = bisect.bisect(self._points, point)
+            self._points.insert(index, point)
+            self._owners.insert(index, member)
+
+    def remove(self, member: str) -> None:
+        """
+        Take a member off the ring. Removing a member that isn't on the ring does nothing.
+
+        Args:
+            member (str): The member to remove.
+        """
+        if member not in self._members:
+            return None
+
+        self._members.discard(member)
+
+        points: List[Tuple[int, str]] = [
+            (point, owner) for point, owner in zip(self._points, self._owners) if owner != member
+        ]
+        self._points = [point for point, _ in points]
+        self._owners = [owner for _, owner in points]
+
+    def owner(self, key: str) -> str | None:
+        """
+        Find the member that owns a key.
+
+        Args:
+            key (str): The key to look up, e.g. a host's name.
+
+        Returns:
+            str | None: The owning member, or None if the ring is empty.
+        """
+        if not self._points:
+            return None
+
+        index = bisect.bisect(self._points, self._hash(key)) % len(self._points)
+
+        return self._owners[index]
+
+
+class Membership(ABC):
+    """
+    An abstract base class for the ways replicas advertise themselves to each other. A member is live for as long as
+    it renews its lease (heartbeats) at least every lease_timeout seconds. Lease times are wall-clock times, since
+    they're compared between replicas.
+
+    Args:
+        member (str): This replica's name. Must be unique among replicas.
+        lease_timeout (float): Seconds since its last heartbeat after which a member is considered dead.
+    """
+    def __init__(self, member: str, lease_timeout: float) -> None:
+        self.member = member
+        self.lease_timeout = lease_timeout
+
+    @abstractmethod
+    def heartbeat(self) -> None:
+        """
+        Renew this replica's lease.
+
+        Raises:
+            NotImplementedError: If the method is not implemented.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def members(self) -> List[str]:
+        """
+        List the members whose leases haven't expired.
+
+        Returns:
+            List[str]: The names of live members.
+
+        Raises:
+            NotImplementedError: If the method is not implemented.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def leave(self) -> None:
+        """
+        Give up this replica's lease, so other replicas take over its hosts without waiting for the lease to expire.
+
+        Raises:
+            NotImplementedError: If the method is not implemented.
+        """
+        raise NotImplementedError
+
+
+class StateMembership(Membership):
+    """
+    Keep membership in the state database. Replicas must share a state database for this to be meaningful.
+
+    Args:
+        state (State): An open connection to the state database.
+        member (str): This replica's name. Must be unique among replicas.
+        lease_timeout (float): Seconds since its last heartbeat after which a member is considered dead.
+    """
+    def __init__(self, state: State, member: str, lease_timeout: float) -> None:
+        super().__init__(member, lease_timeout)
+        self._state = state
+
+    def heartbeat(self) -> None:
+        self._state.member_heartbeat(self.member, time())
+
+    def members(self) -> List[str]:
+        return self._state.member_report(time() - self.lease_timeout)
+
+    def leave(self) -> None:
+        self._state.member_delete(self.member)
+
+
+class FileMembership(Membership):
+    """
+    Keep membership as lease files in a directory on shared storage, one file per replica holding the time of its last
+    heartbeat. Meant for testing and small deployments without a shared state database.
+
+    Args:
+        path (str): The directory to keep lease files in. Created if it doesn't exist.
+        member (str): This replica's name. Must be unique among replicas.
+        lease_timeout (float): Seconds since its last heartbeat after which a member is considered dead.
+    """
+
+    SUFFIX = '.lease'
+
+    def __init__(self, path: str, member: str, lease_timeout: float) -> None:
+        super().__init__(member, lease_timeout)
+        self.path = Path(path)
+        self.path.mkdir(parents=True, exist_ok=True)
+
+    def heartbeat(self) -> None:
+        lease = self.path / f'{self.member}{self.SUFFIX}'
+        _lease = lease.with_name(f'.{lease.name}.{os.getpid()}')
+
+        # Write then rename, so other replicas never read a partially-written lease.
+        _lease.write_text(str(time()))
+        os.replace(_lease, lease)
+
+    def members(self) -> List[str]:
+        cutoff = time() - self.lease_timeout
+        members: List[str] = []
+
+        for lease in self.path.glob(f'*{self.SUFFIX}'):
+            try:
+                if float(lease.read_text()) >= cutoff:
+                    members.append(lease.name[:-len(self.SUFFIX)])
+            except (OSError, ValueError):
+                # Leases can disappear or be replaced while we list them.
+                continue
+
+        return members
+
+    def leave(self) -> None:
+        (self.path / f'{self.member}{self.SUFFIX}').unlink(missing_ok=True)
+
+
+class Cluster:
+    """
+    Track the live controller replicas and decide which hosts this replica owns.
+
+    Args:
+        membership (Membership): How replicas advertise themselves to each other.
+        replicas (int): The number of virtual nodes per replica on the hash ring. Defaults to 100.
+        lease (bool): Whether this process holds the replica's lease, i.e. renews it and gives it up on leave(). A
+            replica's collector processes share its lease, so only one of them may hold it; otherwise any one of them
+            exiting would hand the replica's hosts over while the others keep visiting them. Defaults to True.
+    """
+    def __init__(self, membership: Membership, replicas: int = 100, lease: bool = True) -> None:
+        self.membership = membership
+        self.member = membership.member
+        self.lease = lease
+
+        # Until we've heard from the other replicas, assume we're on our own.
+        self.ring = HashRing([self.member], replicas=replicas)
+
+    def refresh(self) -> bool:
+        """
+        Renew this replica's lease, if this process holds it, and rebuild the ring from the live members.
+
+        Returns:
+            bool: True if the set of live members changed, i.e. host ownership may have moved.
+        """
+        try:
+            if self.lease:
+                self.membership.heartbeat()
+
+            members = set(self.membership.members())
+        except Exception as e:
+            log.error(f'Failed to refresh cluster membership, keeping {len(self.ring)} known members: {e}')
+            return False
+
+        # We're alive regardless of whether our own heartbeat made it into the listing.
+        members.add(self.member)
+
+        current = set(self.ring.members)
+
+        if members == current:
+            return False
+
+        for member in current - members:
+            log.info(f'Controller replica {member} left the cluster')
+            self.ring.remove(member)
+
+        for member in members - current:
+            log.info(f'Controller replica {member} joined the cluster')
+            self.ring.add(member)
+
+        log.info(f'Cluster membership changed, {len(self.ring)} live replicas: {", ".join(self.ring.members)}')
+
+        return True
+
+    def owns(self, name: str) -> bool:
+        """
+        Check whether this replica owns a host.
+
+        Args:
+            name (str): The host's name.
+
+        Returns:
+            bool: True if this replica should visit the host.
+        """
+        return self.ring.owner(name) == self.member
+
+    def assignments(self, names: Iterable[str]) -> Dict[str, int]:
+        """
+        Count how many of the given hosts each live replica owns.
+
+        Args:
+            names (Iterable[str]): Host names.
+
+        Returns:
+            Dict[str, int]: The number of hosts owned by each replica.
+        """
+        counts: Dict[str, int] = {member: 0 for member in self.ring.members}
+
+        for name in names:
+            if (owner := self.ring.owner(name)) is not None:
+                counts[owner] += 1
+
+        return counts
+
+    def leave(self) -> None:
+        """
+        Leave the cluster, handing this replica's hosts over to the remaining replicas. Does nothing if this process
+        doesn't hold the replica's lease.
+        """
+        if not self.lease:
+            return None
+
+        try:
+            self.membership.leave()
+            log.info(f'Controller replica {self.member} left the cluster')
+        except Exception as e:
+            log.error(f'Failed to leave the cluster cleanly, other replicas will take over once our lease expires: {e}')
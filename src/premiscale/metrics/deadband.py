@@ -0,0 +1,156 @@
+"""
+Cut time series write volume by not writing points that haven't meaningfully changed since they were last written.
+"""
+
+
+from __future__ import annotations
+
+import logging
+
+from typing import TYPE_CHECKING
+
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, Iterator, Tuple
+    from premiscale.hypervisor.qemu_data import DomainRecord
+
+
+log = logging.getLogger(__name__)
+
+
+class DeadbandFilter:
+    """
+    Suppress a domain's measurements while their values stay within a deadband of the values last written.
+
+    A measurement is written if any of its values (see DomainRecord.levels) moved by more than the absolute or the
+    relative threshold, whichever is larger, if its set of values changed (e.g. a device was added), if the domain's
+    state changed, or if it hasn't been written for max_silence seconds. Otherwise it's suppressed. Since the last
+    written values are kept rather than the last seen ones, slow drifts are written once they add up.
+
+    Measurements are compared on rates rather than raw counters, so records should have passed through a RateCache.
+    Silence is measured in collection time, and domains that haven't been written for twice max_silence are forgotten.
+
+    Not thread-safe; meant to be used from a single thread, such as a Sink's consumer thread.
+
+    Args:
+        absolute (float): Change of a value below which it's considered unchanged. Defaults to 0.
+        relative (float): Change of a value, as a fraction of its last written value, below which it's considered
+            unchanged. Defaults to 0.01.
+        max_silence (float): Maximum seconds between writes of a measurement. Defaults to 300.
+    """
+    def __init__(self, absolute: float = 0, relative: float = 0.01, max_silence: float = 300) -> None:
+        self.absolute = absolute
+        self.relative = relative
+        self.max_silence = max_silence
+
+        # The values, domain state and collection time of each measurement as it was last written, by
+        # (host, domain, measurement).
+        self._written: Dict[Tuple[str, str, str], Tuple[Tuple[int | float | None, ...], Tuple[int | None, int | None], float]] = {}
+
+        self._latest = 0.0
+        self._swept = 0.0
+
+        # Counters.
+        self.emitted = 0
+        self.suppressed = 0
+
+    def __len__(self) -> int:
+        """
+        Return the number of measurements whose last written values are kept.
+
+        Returns:
+            int: The size of the filter's state.
+        """
+        return len(self._written)
+
+    def _changed(self, previous: Tuple[int | float | None, ...], values: Tuple[int | float | None, ...]) -> bool:
+        """
+        Check whether any value moved out of the deadband around its previous value.
+
+        Args:
+            previous (Tuple[int | float | None, ...]): The values last written.
+            values (Tuple[int | float | None, ...]): The current values.
+
+        Returns:
+            bool: True if the values changed.
+        """
+        if len(previous) != len(values):
+            return True
+
+        for _previous, value in zip(previous, values):
+            if _previous is None or value is None:
+                if _previous is not value:
+                    return True
+
+                continue
+
+            if abs(value - _previous) > max(self.absolute, self.relative * abs(_previous)):
+                return True
+
+        return False
+
+    def apply(self, records: Iterable[DomainRecord]) -> Iterator[DomainRecord]:
+        """
+        Mark the measurements of each record that don't need to be written as suppressed. Records must be given in
+        the order they were collected.
+
+        Args:
+            records (Iterable[DomainRecord]): Domain records, e.g. from RateCache.apply().
+
+        Yields:
+            DomainRecord: The same records, with unchanged measurements suppressed.
+        """
+        written = self._written
+
+        for record in records:
+            state = (record.state, record.reason)
+            suppressed = []
+
+            for measurement, values in record.levels():
+                key = (record.host, record.name, measurement)
+                previous = written.get(key)
+
+                if (
+                    previous is not None
+                    and previous[1] == state
+                    and record.time - previous[2] < self.max_silence
+                    and not self._changed(previous[0], values)
+                ):
+                    suppressed.append(measurement)
+                    continue
+
+                written[key] = (values, state, record.time)
+                self.emitted += 1
+
+            if suppressed:
+                record.suppressed = frozenset(suppressed)
+                self.suppressed += len(suppressed)
+
+            if record.time > self._latest:
+                self._latest = record.time
+
+            yield record
+
+        # Sweeping costs a pass over the state, so only do it once per max_silence.
+        if self._latest - self._swept >= self.max_silence:
+            self.sweep()
+
+    def sweep(self) -> int:
+        """
+        Forget measurements that haven't been written for twice max_silence, i.e. of domains that have vanished.
+
+        Returns:
+            int: The number of forgotten measurements.
+        """
+        cutoff = self._latest - 2 * self.max_silence
+        stale = [key for key, (_, _, _time) in self._written.items() if _time < cutoff]
+
+        for key in stale:
+            del self._written[key]
+
+        self._swept = self._latest
+
+        if stale:
+            log.debug(f'Forgot {len(stale)} measurements of vanished domains, {len(self._written)} remain')
+
+        return len(stale)
@@ -0,0 +1,160 @@
+"""
+An asyncio-based engine for visiting hosts concurrently. Blocking libvirt calls run in a bounded thread pool, while the
+event loop keeps a sliding window of in-flight host visits and enforces a deadline on each of them.
+"""
+
+
+from __future__ import annotations
+
+import asyncio
+import logging
+
+from typing import TYPE_CHECKING
+from concurrent.futures import ThreadPoolExecutor
+from threading import Event
+from time import monotonic
+
+
+if TYPE_CHECKING:
+    from typing import Callable
+    from premiscale.config.v1alpha1 import Host
+
+
+log = logging.getLogger(__name__)
+
+
+class Deadline:
+    """
+    A host visit's deadline, shared between the event loop and the thread running the visit. Threads can't be
+    interrupted, so a visit checks its deadline before acting on its results, and discards them if it ran late.
+
+    Args:
+        timeout (float): Seconds from now until the deadline.
+    """
+    def __init__(self, timeout: float) -> None:
+        self.timeout = timeout
+        self._expires = monotonic() + timeout
+        self._cancelled = Event()
+
+    def cancel(self) -> None:
+        """
+        Cancel the visit, e.g. because the engine already reported it as timed out.
+        """
+        self._cancelled.set()
+
+    @property
+    def expired(self) -> bool:
+        """
+        Whether the visit is past its deadline or was cancelled.
+
+        Returns:
+            bool: True if the visit's results should be discarded.
+        """
+        return self._cancelled.is_set() or monotonic() >= self._expires
+
+
+class CollectionEngine:
+    """
+    Run a blocking per-host visit function for many hosts concurrently.
+
+    Unlike paging through hosts in fixed-size batches, a new visit starts as soon as any in-flight visit finishes, so a
+    single slow host only ever occupies a single slot. A visit that overruns its deadline is reported as timed out and
+    its slot is freed. The thread running it can't be interrupted, so it's left to finish (or fail) on its own, but its
+    Deadline is cancelled so that it discards its now-stale results instead of storing them.
+
+    Args:
+        visit (Callable[[Host, Deadline], bool]): Blocking function called for each host with the visit's deadline.
+            Returns True if the visit succeeded.
+        concurrency (int): Maximum number of host visits in flight at once.
+        threads (int): Size of the thread pool visits run in. Threads beyond 'concurrency' are headroom for visits that
+            overran their deadline and are still blocked on a host. Must be >= concurrency.
+        host_timeout (float): Seconds a single host visit may take before it's considered timed out, unless a shorter
+            timeout is given when the visit is submitted.
+    """
+
+    # Possible outcomes of a host visit.
+    SUCCEEDED = 'succeeded'
+    FAILED = 'failed'
+    TIMED_OUT = 'timed_out'
+
+    def __init__(self,
+                 visit: Callable[[Host, Deadline], bool],
+                 concurrency: int,
+                 threads: int,
+                 host_timeout: float) -> None:
+        self._visit_fn = visit
+        self.concurrency = max(1, concurrency)
+        self.threads = max(self.concurrency, threads)
+        self.host_timeout = host_timeout
+
+        self._executor = ThreadPoolExecutor(
+            max_workers=self.threads,
+            thread_name_prefix='host-visit'
+        )
+        self._slots = asyncio.Semaphore(self.concurrency)
+
+        # Visits reported as timed out whose threads are still blocked on their hosts.
+        self.overdue = 0
+
+    async def submit(self, host: Host, timeout: float | None = None) -> asyncio.Task:
+        """
+        Wait for a free slot, then start visiting a host in the background.
+
+        Args:
+            host (Host): The host to visit.
+            timeout (float | None): Seconds the visit may take. Defaults to None, i.e. host_timeout.
+
+        Returns:
+            asyncio.Task: A task resolving to the visit's outcome.
+        """
+        await self._slots.acquire()
+
+        return asyncio.create_task(
+            self._visit(host, self.host_timeout if timeout is None else min(timeout, self.host_timeout)),
+            name=f'visit-{host.name}'
+        )
+
+    def _finished_overdue(self, _: asyncio.Future) -> None:
+        self.overdue -= 1
+
+    async def _visit(self, host: Host, timeout: float) -> str:
+        """
+        Visit a single host in the thread pool, subject to a deadline. Releases the host's slot on exit.
+
+        Args:
+            host (Host): The host to visit.
+            timeout (float): Seconds the visit may take.
+
+        Returns:
+            str: The outcome of the visit.
+        """
+        loop = asyncio.get_running_loop()
+        deadline = Deadline(timeout)
+
+        try:
+            future = loop.run_in_executor(self._executor, self._visit_fn, host, deadline)
+
+            # Shield the executor future; cancelling it can't stop a running thread anyway.
+            if await asyncio.wait_for(asyncio.shield(future), timeout=timeout):
+                return self.SUCCEEDED
+
+            return self.FAILED
+        except asyncio.TimeoutError:
+            deadline.cancel()
+
+            self.overdue += 1
+            future.add_done_callback(self._finished_overdue)
+
+            log.warning(f'Visiting host {host.name} exceeded its {round(timeout, 2)}s deadline, discarding its results')
+            return self.TIMED_OUT
+        except Exception as e:
+            log.error(f'Visiting host {host.name} failed: {e}', exc_info=True)
+            return self.FAILED
+        finally:
+            self._slots.release()
+
+    def close(self) -> None:
+        """
+        Shut down the thread pool without waiting on visits that are still blocked on hosts.
+        """
+        self._executor.shutdown(wait=False, cancel_futures=True)
@@ -0,0 +1,197 @@
+"""
+Turn the monotonically increasing counters libvirt reports (CPU time, bytes sent and received, bytes read and written)
+into per-second rates as they're collected, so consumers of the time series database read ready-made rates instead of
+differencing raw totals themselves.
+"""
+
+
+from __future__ import annotations
+
+import logging
+
+from typing import TYPE_CHECKING
+from time import monotonic
+
+
+if TYPE_CHECKING:
+    from typing import Callable, Dict, Iterable, Iterator, Tuple
+    from premiscale.hypervisor.qemu_data import DomainRecord
+
+
+log = logging.getLogger(__name__)
+
+
+class _Sample:
+    """
+    The counters of a domain's previous record.
+    """
+
+    __slots__ = ('time', 'cpu_time', 'net', 'block', 'seen')
+
+    def __init__(self, record: DomainRecord, seen: float) -> None:
+        self.time = record.time
+        self.cpu_time = record.cpu_time
+
+        # Counters of each device, by name.
+        self.net: Dict[str, Tuple[int, int, int]] = {name: (_bytes, errors, drops) for name, _bytes, errors, drops in record.net}
+        self.block: Dict[str, Tuple[int, int]] = {name: (read, write) for name, _, _, _, _, read, write in record.block}
+
+        # When the domain was last seen, on the cache's clock.
+        self.seen = seen
+
+
+class RateCache:
+    """
+    Keep the previous sample of every (host, domain) pair, and its devices, in memory, and derive per-second rates
+    from the difference between consecutive samples.
+
+    A counter that went backwards means its domain was restarted (or its device replaced), so no rate is derived from
+    it, and the new value becomes the baseline for the next sample. Domains that haven't been seen for max_age seconds
+    (e.g. because they were shut down, migrated or deleted) are evicted, which bounds the cache to the live fleet.
+
+    Not thread-safe; meant to be used from a single thread, such as a Sink's consumer thread.
+
+    Args:
+        max_age (float): Seconds without a sample after which a domain is evicted. Defaults to 300.
+        clock (Callable[[], float]): Monotonic clock used for eviction. Defaults to time.monotonic.
+    """
+    def __init__(self, max_age: float = 300, clock: Callable[[], float] = monotonic) -> None:
+        self.max_age = max_age
+        self._clock = clock
+
+        self._samples: Dict[Tuple[str, str], _Sample] = {}
+        self._swept = clock()
+
+        # Counters.
+        self.resets = 0
+        self.evicted = 0
+
+    def __len__(self) -> int:
+        """
+        Return the number of domains with a cached sample.
+
+        Returns:
+            int: The size of the cache.
+        """
+        return len(self._samples)
+
+    def apply(self, records: Iterable[DomainRecord]) -> Iterator[DomainRecord]:
+        """
+        Fill in the rates of each record from the domain's previous sample, and cache the record's counters for next
+        time. Records must be given in the order they were collected.
+
+        Args:
+            records (Iterable[DomainRecord]): Domain records, e.g. from DomainStatsBatch.records().
+
+        Yields:
+            DomainRecord: The same records, with rates filled in where they can be derived.
+        """
+        now = self._clock()
+
+        for record in records:
+            key = (record.host, record.name)
+            previous = self._samples.get(key)
+
+            if previous is not None:
+                self._derive(record, previous)
+
+            # Keep the older baseline if the record isn't newer, e.g. the same stats were queued twice.
+            if previous is None or record.time > previous.time:
+                self._samples[key] = _Sample(record, now)
+            else:
+                previous.seen = now
+
+            yield record
+
+        # Sweeping costs a pass over the cache, so only do it a few times per max_age.
+        if now - self._swept >= self.max_age / 4:
+            self.sweep(now)
+
+    def sweep(self, now: float | None = None) -> int:
+        """
+        Evict domains that haven't been seen for max_age seconds.
+
+        Args:
+            now (float | None): The current time on the cache's clock. Defaults to now.
+
+        Returns:
+            int: The number of evicted domains.
+        """
+        if now is None:
+            now = self._clock()
+
+        cutoff = now - self.max_age
+        stale = [key for key, sample in self._samples.items() if sample.seen < cutoff]
+
+        for key in stale:
+            del self._samples[key]
+
+        self._swept = now
+
+        if stale:
+            self.evicted += len(stale)
+            log.debug(f'Evicted {len(stale)} vanished domains from the rate cache, {len(self._samples)} remain')
+
+        return len(stale)
+
+    def _derive(self, record: DomainRecord, previous: _Sample) -> None:
+        """
+        Derive a record's rates from the domain's previous sample.
+
+        Args:
+            record (DomainRecord): The domain's new record.
+            previous (_Sample): The domain's previous sample.
+        """
+        interval = record.time - previous.time
+
+        if interval <= 0:
+            return None
+
+        if record.cpu_time is not None and previous.cpu_time is not None:
+            if record.cpu_time < previous.cpu_time:
+                self.resets += 1
+                log.debug(f'CPU time of domain {record.name} on host {record.host} went backwards, assuming it restarted')
+            else:
+                # CPU time is in nanoseconds, summed over all of the domain's vCPUs.
+                vcpus = record.vcpu_current or 1
+                record.cpu_utilization = round(
+                    min(100.0, (record.cpu_time - previous.cpu_time) / (interval * 1e9 * vcpus) * 100),
+                    2
+                )
+
+        net = []
+
+        for name, _bytes, errors, drops in record.net:
+            if (counters := previous.net.get(name)) is None:
+                continue
+
+            if _bytes < counters[0] or errors < counters[1] or drops < counters[2]:
+                self.resets += 1
+                continue
+
+            net.append((
+                name,
+                round((_bytes - counters[0]) / interval, 2),
+                round((errors - counters[1]) / interval, 2),
+                round((drops - counters[2]) / interval, 2)
+            ))
+
+        record.net_rates = tuple(net)
+
+        block = []
+
+        for name, _, _, _, _, read, write in record.block:
+            if (_counters := previous.block.get(name)) is None:
+                continue
+
+            if read < _counters[0] or write < _counters[1]:
+                self.resets += 1
+                continue
+
+            block.append((
+                name,
+                round((read - _counters[0]) / interval, 2),
+                round((write - _counters[1]) / interval, 2)
+            ))
+
+        record.block_rates = tuple(block)
@@ -0,0 +1,279 @@
+"""
+Aggregate domain metrics per autoscaling group and per host as they're collected, so reconciliation can read a handful
+of precomputed rollup points instead of every domain's points over a window.
+"""
+
+
+from __future__ import annotations
+
+import logging
+
+from typing import TYPE_CHECKING
+from math import inf
+
+
+if TYPE_CHECKING:
+    from typing import Any, Callable, Dict, Iterable, Iterator, List, Set, Tuple
+    from premiscale.hypervisor.qemu_data import DomainRecord
+
+
+log = logging.getLogger(__name__)
+
+
+class SlidingWindow:
+    """
+    Count, sum, minimum, maximum and sum of squares of the samples of the last `width` seconds.
+
+    Samples are accumulated into `buckets` time buckets, and buckets that slide out of the window are dropped whole,
+    so adding a sample is O(1) and summarizing the window is O(buckets), however many samples it holds. The window
+    therefore slides in steps of width / buckets seconds. All five statistics merge by addition (or min/max), so
+    summaries of the same window from different collectors can be combined by the reader.
+
+    Args:
+        width (float): Length of the window in seconds.
+        buckets (int): Number of buckets the window is divided into. Defaults to 6.
+    """
+
+    __slots__ = ('width', '_step', '_buckets', '_latest')
+
+    def __init__(self, width: float, buckets: int = 6) -> None:
+        self.width = width
+        self._step = width / max(1, buckets)
+
+        # [count, sum, min, max, sum of squares] by bucket index.
+        self._buckets: Dict[int, List[float]] = {}
+        self._latest = -inf
+
+    def add(self, time: float, value: float) -> None:
+        """
+        Add a sample.
+
+        Args:
+            time (float): Time of the sample, as a POSIX timestamp.
+            value (float): The sample.
+        """
+        if time <= self._latest - self.width:
+            return None
+
+        self._latest = max(self._latest, time)
+        index = int(time // self._step)
+
+        if (bucket := self._buckets.get(index)) is None:
+            self._buckets[index] = [1, value, value, value, value * value]
+            return None
+
+        bucket[0] += 1
+        bucket[1] += value
+        bucket[2] = min(bucket[2], value)
+        bucket[3] = max(bucket[3], value)
+        bucket[4] += value * value
+
+    def summary(self, now: float | None = None) -> Tuple[int, float, float, float, float] | None:
+        """
+        Summarize the window, dropping buckets that slid out of it.
+
+        Args:
+            now (float | None): End of the window, as a POSIX timestamp. Defaults to the time of the latest sample.
+
+        Returns:
+            Tuple[int, float, float, float, float] | None: The count, sum, minimum, maximum and sum of squares of the
+                window's samples, or None if the window is empty.
+        """
+        end = self._latest if now is None else max(self._latest, now)
+        oldest = int((end - self.width) // self._step) + 1
+
+        for index in [index for index in self._buckets if index < oldest]:
+            del self._buckets[index]
+
+        if not self._buckets:
+            return None
+
+        count = 0
+        _sum = sumsq = 0.0
+        _min, _max = inf, -inf
+
+        for bucket in self._buckets.values():
+            count += int(bucket[0])
+            _sum += bucket[1]
+            _min = min(_min, bucket[2])
+            _max = max(_max, bucket[3])
+            sumsq += bucket[4]
+
+        return count, _sum, _min, _max, sumsq
+
+
+class Rollups:
+    """
+    Maintain sliding-window rollups of domain metrics per autoscaling group and per host, and turn them into points.
+
+    Every record fed through apply() adds its domain's CPU utilization (%), memory utilization (%), network throughput
+    (bytes/s) and block throughput (bytes/s) to the windows of its host and of every autoscaling group its host backs.
+    Metrics derived from rates are only available once a RateCache has seen a domain twice.
+
+    points() then summarizes the groups that received samples since it was last called, as one 'asg_rollup' or
+    'host_rollup' point per group, metric and window, tagged with the collector that computed it. In cluster mode each
+    replica only sees its own hosts, so an autoscaling group's rollup is the merge of its collectors' points.
+
+    Not thread-safe; meant to be used from a single thread, such as a Sink's consumer thread.
+
+    Args:
+        groups (Dict[str, List[str]]): Names of the autoscaling groups each host backs, by host name.
+        windows (Iterable[float]): Lengths of the sliding windows to maintain, in seconds.
+        collector (str): Name of this collector, to tell apart the partial rollups of several controller replicas.
+        buckets (int): Number of buckets each window is divided into. Defaults to 6.
+    """
+
+    # Measurements rollups are written as, by scope.
+    MEASUREMENTS = {
+        'asg': 'asg_rollup',
+        'host': 'host_rollup',
+    }
+
+    def __init__(self, groups: Dict[str, List[str]], windows: Iterable[float], collector: str, buckets: int = 6) -> None:
+        self.groups = groups
+        self.windows = tuple(sorted(set(windows)))
+        self.collector = collector
+        self.buckets = buckets
+
+        # Windows by (scope, name), then by (metric, window length).
+        self._rollups: Dict[Tuple[str, str], Dict[Tuple[str, float], SlidingWindow]] = {}
+
+        # (scope, name) pairs that received samples since points() was last called.
+        self._dirty: Set[Tuple[str, str]] = set()
+
+        self._latest = 0.0
+        self._swept = 0.0
+
+    def __len__(self) -> int:
+        """
+        Return the number of groups and hosts with rollups.
+
+        Returns:
+            int: The number of rollups.
+        """
+        return len(self._rollups)
+
+    @staticmethod
+    def _samples(record: DomainRecord) -> Iterator[Tuple[str, float]]:
+        """
+        Get the metrics a domain record contributes to rollups.
+
+        Args:
+            record (DomainRecord): The domain's record.
+
+        Yields:
+            Tuple[str, float]: Each available metric's name and value.
+        """
+        if record.cpu_utilization is not None:
+            yield 'cpu', record.cpu_utilization
+
+        if (record.balloon_current is not None or record.balloon_rss is not None) and (memory := record.memory_utilization()) >= 0:
+            yield 'memory', memory
+
+        if record.net_rates:
+            yield 'net', sum(rates[1] for rates in record.net_rates)
+
+        if record.block_rates:
+            yield 'block', sum(rates[1] + rates[2] for rates in record.block_rates)
+
+    def _add(self, scope: str, name: str, time: float, samples: List[Tuple[str, float]]) -> None:
+        """
+        Add a domain's samples to a group's or host's windows.
+
+        Args:
+            scope (str): Either 'asg' or 'host'.
+            name (str): The autoscaling group's or host's name.
+            time (float): Time of the samples, as a POSIX timestamp.
+            samples (List[Tuple[str, float]]): The metrics' names and values.
+        """
+        key = (scope, name)
+
+        if (rollup := self._rollups.get(key)) is None:
+            rollup = self._rollups[key] = {}
+
+        for metric, value in samples:
+            for width in self.windows:
+                if (window := rollup.get((metric, width))) is None:
+                    window = rollup[(metric, width)] = SlidingWindow(width, self.buckets)
+
+                window.add(time, value)
+
+        self._dirty.add(key)
+
+    def apply(self, records: Iterable[DomainRecord]) -> Iterator[DomainRecord]:
+        """
+        Add each record's metrics to the rollups of its host and autoscaling groups.
+
+        Args:
+            records (Iterable[DomainRecord]): Domain records, e.g. from RateCache.apply().
+
+        Yields:
+            DomainRecord: The same records, unchanged.
+        """
+        for record in records:
+            samples = list(self._samples(record))
+
+            if samples:
+                self._add('host', record.host, record.time, samples)
+
+                for group in self.groups.get(record.host, ()):
+                    self._add('asg', group, record.time, samples)
+
+                if record.time > self._latest:
+                    self._latest = record.time
+
+            yield record
+
+    def points(self, timestamp: Callable[[float], Any]) -> List[Dict]:
+        """
+        Summarize the rollups that received samples since the last call as points, and forget rollups whose windows
+        have all emptied.
+
+        Args:
+            timestamp (Callable[[float], Any]): Converts a POSIX timestamp to the backend's time format.
+
+        Returns:
+            List[Dict]: The rollups' points, in the schema documented on DomainStats.to_tinyflux.
+        """
+        _data: List[Dict] = []
+        _time = timestamp(self._latest)
+
+        for scope, name in self._dirty:
+            rollup = self._rollups[(scope, name)]
+
+            for (metric, width), window in rollup.items():
+                if (summary := window.summary(self._latest)) is None:
+                    continue
+
+                count, _sum, _min, _max, sumsq = summary
+
+                _data.append({
+                    'measurement': self.MEASUREMENTS[scope],
+                    'time': _time,
+                    'tags': {
+                        scope: name,
+                        'metric': metric,
+                        'window': str(int(width)),
+                        'collector': self.collector
+                    },
+                    'fields': {
+                        'count': count,
+                        'sum': _sum,
+                        'min': _min,
+                        'max': _max,
+                        'sumsq': sumsq,
+                        'mean': round(_sum / count, 2)
+                    }
+                })
+
+        self._dirty.clear()
+
+        # Hosts and groups that stopped reporting (e.g. were removed from the configuration) drop out once their
+        # windows have emptied. This is a pass over every rollup, so only do it once per (shortest) window.
+        if self.windows and self._latest - self._swept >= self.windows[0]:
+            for key in [key for key, rollup in self._rollups.items() if all(window.summary(self._latest) is None for window in rollup.values())]:
+                del self._rollups[key]
+
+            self._swept = self._latest
+
+        return _data
@@ -0,0 +1,210 @@
+"""
+Schedule host visits so they're spread out over each host's collection interval instead of all hosts being visited in
+lockstep at the top of every interval.
+"""
+
+
+from __future__ import annotations
+
+import heapq
+import logging
+
+from typing import TYPE_CHECKING
+from itertools import count
+from math import ceil
+from time import monotonic
+from zlib import crc32
+
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Set, Tuple
+    from premiscale.config.v1alpha1 import Host
+
+
+log = logging.getLogger(__name__)
+
+
+class Scheduler:
+    """
+    A priority queue of hosts ordered by the time each host is next due to be visited.
+
+    Every host gets a deterministic offset (phase) within its interval derived from a hash of its name, which spreads
+    hosts across the interval and keeps a host's phase stable across restarts and as other hosts come and go. Hosts
+    are rescheduled on their own phase once a visit completes, so a slow visit delays only that host, and visits that
+    overran an entire interval skip the slots they missed rather than firing back-to-back to catch up.
+
+    Hosts that are due but not yet rescheduled (i.e., in flight) are never handed out twice.
+    """
+    def __init__(self) -> None:
+        # Heap entries are (due, sequence, key); the sequence number breaks ties without comparing keys.
+        self._heap: List[Tuple[float, int, str]] = []
+        self._sequence = count()
+
+        self._hosts: Dict[str, Host] = {}
+        self._intervals: Dict[str, float] = {}
+        self._due: Dict[str, float] = {}
+        self._in_flight: Set[str] = set()
+
+    def __len__(self) -> int:
+        """
+        Return the number of scheduled hosts.
+
+        Returns:
+            int: The number of hosts being scheduled.
+        """
+        return len(self._hosts)
+
+    def __contains__(self, host: Host) -> bool:
+        return host.name in self._hosts
+
+    @staticmethod
+    def offset(name: str, interval: float) -> float:
+        """
+        Compute a host's deterministic phase within its interval.
+
+        Args:
+            name (str): The host's name.
+            interval (float): The host's collection interval in seconds.
+
+        Returns:
+            float: Seconds into the interval at which the host is visited.
+        """
+        return (crc32(name.encode('utf-8')) % 10_000) / 10_000 * interval
+
+    def _push(self, key: str, due: float) -> None:
+        self._due[key] = due
+        heapq.heappush(self._heap, (due, next(self._sequence), key))
+
+    def add(self, host: Host, interval: float, now: float | None = None) -> None:
+        """
+        Start scheduling a host. If the host is already scheduled, its interval is updated and takes effect from its
+        next visit.
+
+        Args:
+            host (Host): The host to schedule.
+            interval (float): Seconds between visits to this host.
+            now (float | None): The current monotonic time. Defaults to None, i.e. time.monotonic().
+        """
+        if host.name in self._hosts:
+            self._hosts[host.name] = host
+            self._intervals[host.name] = interval
+            return None
+
+        now = monotonic() if now is None else now
+
+        self._hosts[host.name] = host
+        self._intervals[host.name] = interval
+        self._push(host.name, now + self.offset(host.name, interval))
+
+        log.debug(f'Scheduled host {host.name} every {interval}s, first visit in {round(self._due[host.name] - now, 2)}s')
+
+    def interval(self, host: Host) -> float:
+        """
+        Get the interval a host is scheduled on.
+
+        Args:
+            host (Host): A scheduled host.
+
+        Returns:
+            float: Seconds between visits to the host.
+        """
+        return self._intervals[host.name]
+
+    def remove(self, host: Host) -> None:
+        """
+        Stop scheduling a host. Its heap entry is discarded lazily.
+
+        Args:
+            host (Host): The host to stop scheduling.
+        """
+        self._hosts.pop(host.name, None)
+        self._intervals.pop(host.name, None)
+        self._due.pop(host.name, None)
+        self._in_flight.discard(host.name)
+
+    def update(self, hosts: Iterable[Tuple[Host, float]], now: float | None = None) -> None:
+        """
+        Reconcile the scheduled hosts with a new set of (host, interval) pairs, adding new hosts, updating intervals,
+        and removing hosts that are no longer present.
+
+        Args:
+            hosts (Iterable[Tuple[Host, float]]): The hosts to schedule and their intervals.
+            now (float | None): The current monotonic time. Defaults to None, i.e. time.monotonic().
+        """
+        wanted = {host.name: (host, interval) for host, interval in hosts}
+
+        for name in [name for name in self._hosts if name not in wanted]:
+            self.remove(self._hosts[name])
+
+        for host, interval in wanted.values():
+            self.add(host, interval, now)
+
+    def pop_due(self, now: float | None = None) -> List[Tuple[Host, float]]:
+        """
+        Take every host that is due for a visit off the queue and mark it in flight.
+
+        Args:
+            now (float | None): The current monotonic time. Defaults to None, i.e. time.monotonic().
+
+        Returns:
+            List[Tuple[Host, float]]: Due hosts paired with how many seconds late they are.
+        """
+        now = monotonic() if now is None else now
+        due: List[Tuple[Host, float]] = []
+
+        while self._heap and self._heap[0][0] <= now:
+            _due, _, key = heapq.heappop(self._heap)
+
+            # Skip entries for removed hosts, and stale entries superseded by a reschedule.
+            if key not in self._hosts or self._due.get(key) != _due or key in self._in_flight:
+                continue
+
+            self._in_flight.add(key)
+            due.append((self._hosts[key], now - _due))
+
+        return due
+
+    def done(self, host: Host, now: float | None = None) -> None:
+        """
+        Reschedule a host after its visit completes, on the next slot of its phase that's still in the future.
+
+        Args:
+            host (Host): The host whose visit completed.
+            now (float | None): The current monotonic time. Defaults to None, i.e. time.monotonic().
+        """
+        if host.name not in self._hosts:
+            return None
+
+        now = monotonic() if now is None else now
+
+        self._in_flight.discard(host.name)
+
+        interval = self._intervals[host.name]
+        previous = self._due[host.name]
+        missed = max(1, ceil((now - previous) / interval))
+
+        if missed > 1:
+            log.warning(f'Visit to host {host.name} overran its {interval}s interval, skipping {missed - 1} visits')
+
+        self._push(host.name, previous + missed * interval)
+
+    def next_wait(self, now: float | None = None) -> float | None:
+        """
+        Seconds until the next host is due, or None if nothing is scheduled.
+
+        Args:
+            now (float | None): The current monotonic time. Defaults to None, i.e. time.monotonic().
+
+        Returns:
+            float | None: Seconds to wait (0 if a host is already due), or None if the queue is empty.
+        """
+        now = monotonic() if now is None else now
+
+        # Drop stale entries so they don't cause spurious wakeups.
+        while self._heap and (self._heap[0][2] not in self._hosts or self._due.get(self._heap[0][2]) != self._heap[0][0]):
+            heapq.heappop(self._heap)
+
+        if not self._heap:
+            return None
+
+        return max(0.0, self._heap[0][0] - now)
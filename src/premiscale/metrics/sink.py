@@ -0,0 +1,358 @@
+"""
+Decouple scraping hosts from writing to the time series database. Host threads hand their domains' stats to a Sink,
+which converts them and writes them to the database in large batches from a dedicated thread.
+"""
+
+
+from __future__ import annotations
+
+import logging
+
+from typing import TYPE_CHECKING, cast
+from queue import Queue, Empty, Full
+from threading import Thread, Lock
+from time import monotonic
+from datetime import datetime, timezone
+from premiscale.hypervisor.qemu_data import DomainStatsBatch
+
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, List, Tuple
+    from multiprocessing.queues import Queue as ProcessQueue
+    from premiscale.hypervisor.qemu_data import DomainRecord
+    from premiscale.metrics.deadband import DeadbandFilter
+    from premiscale.metrics.rates import RateCache
+    from premiscale.metrics.rollup import Rollups
+    from premiscale.metrics.timeseries._base import TimeSeries
+
+
+log = logging.getLogger(__name__)
+
+
+class Sink:
+    """
+    A bounded producer/consumer pipeline in front of a time series database.
+
+    Producers (host threads) put a host's DomainStatsBatch on a bounded queue. A single consumer thread coalesces the
+    batches of many hosts into one columnar batch, which is flushed once it holds batch_size points or its oldest point
+    is flush_interval seconds old. Flushing writes the batch's DomainRecords, which backends convert to their native
+    format themselves, after a RateCache (if any) has filled in their counters' rates, Rollups (if any) have
+    aggregated them, and a DeadbandFilter (if any) has suppressed measurements that haven't changed. Rollups that
+    changed are written along with every batch. If the consumer falls behind and the queue fills up, producers wait up
+    to put_timeout seconds before the stats are dropped and counted.
+
+    Every collector process runs a Sink of its own, so converting and writing points scales with the number of
+    processes. Backends that only allow a single writer process (e.g. a file) are written by a single Writer instead:
+    the other processes' Sinks still do all the work of converting their batches to points, but forward the points to
+    the Writer through a queue shared between processes (e.g. a multiprocessing Manager queue) rather than writing them.
+
+    Args:
+        timeseries (TimeSeries | None): The (open) time series database to write to, or None if this Sink forwards
+            its points.
+        backend (str): The time series database type. One of 'memory', 'ringbuffer', 'segments' or 'influxdb'.
+        queue_size (int): Maximum number of hosts' stats waiting to be written. Defaults to 1000.
+        batch_size (int): Number of points at which a batch is flushed. Defaults to 5000.
+        flush_interval (float): Maximum seconds a point waits in a batch before it's flushed. Defaults to 5.
+        put_timeout (float): Seconds producers wait on a full queue before dropping stats. Defaults to 1.
+        forward (Queue | ProcessQueue | None): A queue shared with a Writer to forward points to instead of writing
+            them, e.g. a multiprocessing Manager queue. Defaults to None (points are written to timeseries).
+        rates (RateCache | None): Derives per-second rates of the domains' counters before they're written. Only
+            used by the consumer thread. Defaults to None (raw counters only).
+        rollups (Rollups | None): Aggregates the domains' metrics per autoscaling group and host. Only used by the
+            consumer thread. Defaults to None (no rollups).
+        deadband (DeadbandFilter | None): Suppresses measurements that haven't changed since they were last written.
+            Only used by the consumer thread. Defaults to None (every measurement is written).
+    """
+    def __init__(self,
+                 timeseries: TimeSeries | None,
+                 backend: str,
+                 queue_size: int = 1000,
+                 batch_size: int = 5000,
+                 flush_interval: float = 5,
+                 put_timeout: float = 1,
+                 forward: Queue | ProcessQueue | None = None,
+                 rates: RateCache | None = None,
+                 rollups: Rollups | None = None,
+                 deadband: DeadbandFilter | None = None) -> None:
+        match backend:
+            case 'memory' | 'ringbuffer' | 'segments' | 'influxdb':
+                self.backend = backend
+            case _:
+                raise ValueError(f'Could not convert collected time series data to type "{backend}"')
+
+        if timeseries is None and forward is None:
+            raise ValueError('A time series sink needs either a time series database or a queue to forward points to')
+
+        self.timeseries = timeseries
+        self.forward = forward
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.put_timeout = put_timeout
+        self.rates = rates
+        self.rollups = rollups
+        self.deadband = deadband
+
+        # Items are a host's DomainStatsBatch, or None to signal the consumer to stop.
+        self._queue: Queue[DomainStatsBatch | None] = Queue(maxsize=queue_size)
+        self._thread: Thread | None = None
+
+        self._batch = DomainStatsBatch()
+        self._batch_start = monotonic()
+
+        # Counters. Only 'dropped' is updated by producers, so it's the only one that needs a lock.
+        self._lock = Lock()
+        self.dropped = 0
+        self.written = 0
+        self.failed = 0
+        self.flushes = 0
+
+    def start(self) -> None:
+        """
+        Start the consumer thread.
+        """
+        self._thread = Thread(
+            target=self._run,
+            name='timeseries-sink',
+            daemon=True
+        )
+        self._thread.start()
+
+        log.debug(f'Started time series sink (batch size {self.batch_size}, flush interval {self.flush_interval}s{", forwarding points to a writer" if self.forward is not None else ""})')
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop the consumer thread once it has drained the queue and flushed its last batch.
+
+        Args:
+            timeout (float | None): Seconds to wait for the consumer thread to finish. Defaults to None (wait forever).
+        """
+        if self._thread is None:
+            return None
+
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def put(self, domains: DomainStatsBatch) -> bool:
+        """
+        Queue a host's domain stats to be written. Called from producer (host) threads.
+
+        Args:
+            domains (DomainStatsBatch): Stats of the domains on one host.
+
+        Returns:
+            bool: True if the stats were queued, False if they were dropped because the queue stayed full.
+        """
+        try:
+            self._queue.put(domains, timeout=self.put_timeout)
+            return True
+        except Full:
+            with self._lock:
+                self.dropped += len(domains)
+
+            log.warning(f'Time series sink is falling behind, dropped stats of {len(domains)} domains')
+            return False
+
+    def qsize(self) -> int:
+        """
+        Return the approximate number of hosts' stats waiting to be written.
+
+        Returns:
+            int: The approximate size of the queue.
+        """
+        return self._queue.qsize()
+
+    def _timestamp(self, timestamp: float) -> datetime | int:
+        """
+        Convert a POSIX timestamp to the backend's time format.
+
+        Args:
+            timestamp (float): The timestamp.
+
+        Returns:
+            datetime | int: The time as a datetime for TinyFlux, or as whole seconds for InfluxDB.
+        """
+        if self.backend == 'influxdb':
+            return int(timestamp)
+
+        return datetime.fromtimestamp(timestamp, tz=timezone.utc)
+
+    def _stats_points(self, batch: DomainStatsBatch) -> List[Dict]:
+        """
+        Convert the host and mount point stats of a batch to points in the backend's format.
+
+        Args:
+            batch (DomainStatsBatch): The batch.
+
+        Returns:
+            List[Dict]: The stats' points.
+        """
+        if self.backend == 'influxdb':
+            return [stats.to_influx() for stats in batch.hosts] + [stats.to_influx() for stats in batch.mountpoints]
+
+        return [stats.to_tinyflux() for stats in batch.hosts] + [stats.to_tinyflux() for stats in batch.mountpoints]
+
+    def _points(self, records: Iterable[DomainRecord]) -> List[Dict]:
+        """
+        Convert domain records to points, for backends that are written by a Writer. Such backends are all local, so
+        the points are in the schema documented on DomainStats.to_tinyflux.
+
+        Args:
+            records (Iterable[DomainRecord]): The records.
+
+        Returns:
+            List[Dict]: The records' points.
+        """
+        points: List[Dict] = []
+
+        for record in records:
+            time = self._timestamp(record.time)
+            tags = record.tags()
+
+            for measurement, fields in record.measurements():
+                points.append({
+                    'measurement': measurement,
+                    'time': time,
+                    'tags': tags,
+                    'fields': fields
+                })
+
+        return points
+
+    def _run(self) -> None:
+        """
+        Consume queued stats until stopped, flushing batches by size or age.
+        """
+        while True:
+            timeout = max(0.0, self.flush_interval - (monotonic() - self._batch_start)) if self._batch else None
+
+            try:
+                domains = self._queue.get(timeout=timeout)
+            except Empty:
+                self._flush()
+                continue
+
+            if domains is None:
+                self._flush()
+                return None
+
+            if not self._batch:
+                self._batch_start = monotonic()
+
+            self._batch.extend(domains)
+
+            if self._batch.points >= self.batch_size or monotonic() - self._batch_start >= self.flush_interval:
+                self._flush()
+
+    def _flush(self) -> None:
+        """
+        Write the current batch to the time series database.
+        """
+        if not self._batch:
+            return None
+
+        batch, self._batch = self._batch, DomainStatsBatch()
+
+        records = batch.records()
+
+        if self.rates is not None:
+            records = self.rates.apply(records)
+
+        # Rollups see every record, including those the deadband suppresses.
+        if self.rollups is not None:
+            records = self.rollups.apply(records)
+
+        # Records are filtered as the backend consumes them, so the number of suppressed points is only known after.
+        suppressed = self.deadband.suppressed if self.deadband is not None else 0
+
+        if self.deadband is not None:
+            records = self.deadband.apply(records)
+
+        try:
+            if self.forward is not None:
+                # Everything but the write happens in this process; the Writer only inserts the points.
+                data = self._points(records)
+                data.extend(self._stats_points(batch))
+
+                if self.rollups is not None:
+                    data.extend(self.rollups.points(self._timestamp))
+
+                self.forward.put(tuple(data), timeout=self.put_timeout)
+                points = len(data)
+            else:
+                timeseries = cast('TimeSeries', self.timeseries)
+                timeseries.insert_records(records)
+                points = batch.points - ((self.deadband.suppressed - suppressed) if self.deadband is not None else 0)
+
+                if batch.hosts or batch.mountpoints:
+                    timeseries.insert_batch(tuple(self._stats_points(batch)))
+
+                if self.rollups is not None and (rollups := self.rollups.points(self._timestamp)):
+                    timeseries.insert_batch(tuple(rollups))
+                    points += len(rollups)
+
+            self.written += points
+            self.flushes += 1
+            log.debug(f'{"Forwarded" if self.forward is not None else "Flushed"} {points} points of {len(batch)} domains and {len(batch.hosts)} hosts to the time series database')
+        except Exception as e:
+            self.failed += batch.points
+            log.error(f'Failed to write a batch of {batch.points} points to the time series database: {e}')
+
+
+class Writer:
+    """
+    Write the points Sinks in other processes forward through a shared queue to a time series database that only
+    allows a single writer process. The Sinks have already converted their batches, so this only inserts them.
+
+    Args:
+        timeseries (TimeSeries): The (open) time series database to write to.
+        queue (Queue | ProcessQueue): The queue shared with the Sinks. Items are a Sink's batch of points, or None to
+            stop.
+    """
+    def __init__(self, timeseries: TimeSeries, queue: Queue | ProcessQueue) -> None:
+        self.timeseries = timeseries
+        self._queue: Queue[Tuple[Dict, ...] | None] | ProcessQueue[Tuple[Dict, ...] | None] = queue
+        self._thread: Thread | None = None
+
+        # Counters.
+        self.written = 0
+        self.failed = 0
+
+    def start(self) -> None:
+        """
+        Start the writer thread.
+        """
+        self._thread = Thread(
+            target=self._run,
+            name='timeseries-writer',
+            daemon=True
+        )
+        self._thread.start()
+
+        log.debug('Started time series writer for points forwarded by other collector processes')
+
+    def stop(self, timeout: float | None = None) -> None:
+        """
+        Stop the writer thread once it has written the points queued so far.
+
+        Args:
+            timeout (float | None): Seconds to wait for the writer thread to finish. Defaults to None (wait forever).
+        """
+        if self._thread is None:
+            return None
+
+        self._queue.put(None)
+        self._thread.join(timeout=timeout)
+        self._thread = None
+
+    def _run(self) -> None:
+        """
+        Write forwarded batches of points until stopped.
+        """
+        while (points := self._queue.get()) is not None:
+            try:
+                self.timeseries.insert_batch(points)
+                self.written += len(points)
+            except Exception as e:
+                self.failed += len(points)
+                log.error(f'Failed to write a batch of {len(points)} forwarded points to the time series database: {e}')
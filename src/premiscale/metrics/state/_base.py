@@ -352,4 +352,55 @@ class State(ABC):
         Raises:
             NotImplementedError: If the method is not implemented.
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    ## Cluster members
+
+    @abstractmethod
+    def member_heartbeat(self, member: str, timestamp: float) -> bool:
+        """
+        Create or renew a controller replica's membership lease.
+
+        Args:
+            member (str): name of the controller replica.
+            timestamp (float): time of the heartbeat, in seconds since the epoch.
+
+        Returns:
+            bool: True if action completed successfully.
+
+        Raises:
+            NotImplementedError: If the method is not implemented.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def member_delete(self, member: str) -> bool:
+        """
+        Delete a controller replica's membership lease.
+
+        Args:
+            member (str): name of the controller replica.
+
+        Returns:
+            bool: True if action completed successfully.
+
+        Raises:
+            NotImplementedError: If the method is not implemented.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def member_report(self, since: float) -> List:
+        """
+        Get the controller replicas that have sent a heartbeat since a point in time.
+
+        Args:
+            since (float): seconds since the epoch.
+
+        Returns:
+            List: Names of live controller replicas.
+
+        Raises:
+            NotImplementedError: If the method is not implemented.
+        """
+        raise NotImplementedError
@@ -112,6 +112,9 @@ class Local(State):
         self._cursor.execute(
             'CREATE TABLE IF NOT EXISTS asgs (name TEXT)'
         )
+        self._cursor.execute(
+            'CREATE TABLE IF NOT EXISTS members (name TEXT PRIMARY KEY, heartbeat REAL)'
+        )
         self.commit()
         log.info('SQLite database initialized')
 
@@ -422,4 +425,61 @@ class Local(State):
 
         return self._cursor.execute(
             'SELECT * FROM asgs'
-        ).fetchall()
\ No newline at end of file
+        ).fetchall()
+
+    ## Cluster members
+
+    @synchronized
+    def member_heartbeat(self, member: str, timestamp: float) -> bool:
+        """
+        Create or renew a controller replica's membership lease.
+
+        Args:
+            member (str): name of the controller replica.
+            timestamp (float): time of the heartbeat, in seconds since the epoch.
+
+        Returns:
+            bool: True if action completed successfully.
+        """
+        self._cursor.execute(
+            'INSERT INTO members (name, heartbeat) VALUES (?, ?) ON CONFLICT (name) DO UPDATE SET heartbeat = excluded.heartbeat',
+            (member, timestamp)
+        )
+        self.commit()
+        return True
+
+    @synchronized
+    def member_delete(self, member: str) -> bool:
+        """
+        Delete a controller replica's membership lease.
+
+        Args:
+            member (str): name of the controller replica.
+
+        Returns:
+            bool: True if action completed successfully.
+        """
+        self._cursor.execute(
+            'DELETE FROM members WHERE name = ?',
+            (member,)
+        )
+        self.commit()
+        return True
+
+    @synchronized
+    def member_report(self, since: float) -> List:
+        """
+        Get the controller replicas that have sent a heartbeat since a point in time.
+
+        Args:
+            since (float): seconds since the epoch.
+
+        Returns:
+            List: Names of live controller replicas.
+        """
+        return [
+            name for (name,) in self._cursor.execute(
+                'SELECT name FROM members WHERE heartbeat >= ?',
+                (since,)
+            ).fetchall()
+        ]
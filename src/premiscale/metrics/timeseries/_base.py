@@ -9,14 +9,143 @@ import logging
 
 from typing import TYPE_CHECKING
 from abc import ABC, abstractmethod
+from attrs import define
+from attr import ib
+from datetime import datetime, timezone
 
 if TYPE_CHECKING:
-    from typing import Any, Dict, Tuple
+    from typing import Any, Dict, Iterable, List, Sequence, Tuple
+    from premiscale.hypervisor.qemu_data import DomainRecord
 
 
 log = logging.getLogger(__name__)
 
 
+# Aggregations a Query can compute over each group and window.
+AGGREGATES = ('mean', 'max', 'min', 'last', 'sum', 'count', 'percentile')
+
+
+@define
+class Query:
+    """
+    A query of time series data, aggregated per field, group and window.
+
+    Points of the measurement in the time range whose tags match are grouped by the values of the group_by tags and
+    into windows of `window` seconds, aligned to the epoch, and each field is aggregated per group and window.
+    """
+    # Start (inclusive) and stop (exclusive) of the time range. Stop defaults to now.
+    start: datetime
+    stop: datetime | None = ib(default=None)
+
+    # Measurement to query. If None, every measurement is queried.
+    measurement: str | None = ib(default=None)
+
+    # Fields to aggregate. If None, every field is aggregated.
+    fields: Tuple[str, ...] | None = ib(default=None)
+
+    # Tags points must have, by tag name: either a value, or a tuple of values any of which matches.
+    tags: Dict[str, str | Tuple[str, ...]] = ib(factory=dict)
+
+    # Tags whose values points are grouped by.
+    group_by: Tuple[str, ...] = ib(default=())
+
+    # Length of the windows points are bucketed into, in seconds. If None, the whole time range is a single window.
+    window: int | None = ib(default=None)
+
+    # One of AGGREGATES, and for 'percentile', the percentile to compute (0-100).
+    aggregate: str = ib(default='mean')
+    percentile: float = ib(default=95)
+
+    def __attrs_post_init__(self) -> None:
+        if self.aggregate not in AGGREGATES:
+            raise ValueError(f'Unknown aggregate "{self.aggregate}", expected one of {", ".join(AGGREGATES)}')
+
+        if not 0 <= self.percentile <= 100:
+            raise ValueError(f'Percentile must be between 0 and 100, got {self.percentile}')
+
+
+@define
+class Aggregate:
+    """
+    A dataclass for storing one aggregated value of a Query's result.
+    """
+    measurement: str
+    field: str
+
+    # Values of the query's group_by tags. Tags the group's points don't have are left out.
+    tags: Dict[str, str]
+
+    # Start of the window, or of the query's time range if it isn't windowed.
+    time: datetime
+
+    value: int | float
+
+
+def match_tags(tags: Dict[str, str], filters: Dict[str, str | Tuple[str, ...]] | None) -> bool:
+    """
+    Check whether a point's tags match tag filters.
+
+    Args:
+        tags (Dict[str, str]): The point's tags.
+        filters (Dict[str, str | Tuple[str, ...]] | None): Tags the point must have, by tag name: either a value, or a
+            tuple of values any of which matches. If None, any tags match.
+
+    Returns:
+        bool: True if the tags match.
+    """
+    if filters is None:
+        return True
+
+    for tag, value in filters.items():
+        if isinstance(value, str):
+            if tags.get(tag) != value:
+                return False
+        elif tags.get(tag) not in value:
+            return False
+
+    return True
+
+
+def aggregate(values: Sequence[int | float], how: str, percentile: float = 95) -> int | float:
+    """
+    Aggregate values.
+
+    Args:
+        values (Sequence[int | float]): The values, in time order. Must not be empty.
+        how (str): One of AGGREGATES.
+        percentile (float): For 'percentile', the percentile to compute (0-100), interpolating linearly between the
+            closest values. Defaults to 95.
+
+    Returns:
+        int | float: The aggregate.
+
+    Raises:
+        ValueError: If the aggregate is unknown.
+    """
+    match how:
+        case 'mean':
+            return sum(values) / len(values)
+        case 'max':
+            return max(values)
+        case 'min':
+            return min(values)
+        case 'last':
+            return values[-1]
+        case 'sum':
+            return sum(values)
+        case 'count':
+            return len(values)
+        case 'percentile':
+            _values = sorted(values)
+            rank = (len(_values) - 1) * percentile / 100
+            low = int(rank)
+            high = min(low + 1, len(_values) - 1)
+
+            return _values[low] + (_values[high] - _values[low]) * (rank - low)
+        case _:
+            raise ValueError(f'Unknown aggregate "{how}", expected one of {", ".join(AGGREGATES)}')
+
+
 class TimeSeries(ABC):
     """
     An abstract base class with a skeleton interface for metrics class-types.
@@ -79,12 +208,26 @@ class TimeSeries(ABC):
         raise NotImplementedError
 
     @abstractmethod
-    def insert_batch(self, data: Tuple[Dict]) -> None:
+    def insert_batch(self, data: Tuple[Dict, ...]) -> None:
         """
         Insert a batch of points into the metrics store.
 
         Args:
-            data (Tuple[Dict]): the data to insert.
+            data (Tuple[Dict, ...]): the data to insert.
+
+        Raises:
+            NotImplementedError: if the method is not implemented.
+        """
+        raise NotImplementedError
+
+    @abstractmethod
+    def insert_records(self, records: Iterable[DomainRecord]) -> None:
+        """
+        Insert the points of a batch of domain records into the metrics store, writing them in the backend's native
+        format straight from the records.
+
+        Args:
+            records (Iterable[DomainRecord]): the records to insert.
 
         Raises:
             NotImplementedError: if the method is not implemented.
@@ -111,6 +254,76 @@ class TimeSeries(ABC):
         """
         raise NotImplementedError
 
+    @abstractmethod
+    def range(self,
+              measurement: str | None = None,
+              start: datetime | None = None,
+              stop: datetime | None = None,
+              tags: Dict[str, str | Tuple[str, ...]] | None = None) -> Tuple:
+        """
+        Get the points of the matching series in a time range, sorted by time.
+
+        Args:
+            measurement (str | None): The measurement to get points of. If None, points of every measurement are returned.
+            start (datetime | None): Time of the first point to get (inclusive). Defaults to the start of retention.
+            stop (datetime | None): Time of the last point to get (exclusive). Defaults to now.
+            tags (Dict[str, str | Tuple[str, ...]] | None): Tags the points must have, by tag name: either a value, or a
+                tuple of values any of which matches. Defaults to None, i.e. any tags.
+
+        Returns:
+            Tuple: The points, in the schema documented on DomainStats.to_tinyflux.
+
+        Raises:
+            NotImplementedError: if the method is not implemented.
+        """
+        raise NotImplementedError
+
+    def query(self, query: Query) -> List[Aggregate]:
+        """
+        Aggregate the points matching a query. Backends that can aggregate natively override this; by default, the
+        points in the query's range are read with range(), which only reads the matching series, and aggregated in a
+        single pass.
+
+        Args:
+            query (Query): The query.
+
+        Returns:
+            List[Aggregate]: The aggregates, sorted by measurement, field, group and time.
+        """
+        stop = query.stop if query.stop is not None else datetime.now(timezone.utc)
+        start = query.start.timestamp()
+
+        # Values by (measurement, field, group, window).
+        buckets: Dict[Tuple[str, str, Tuple[str | None, ...], float], List[int | float]] = {}
+
+        for point in self.range(query.measurement, query.start, stop, query.tags or None):
+            group = tuple(point['tags'].get(tag) for tag in query.group_by)
+
+            if query.window is None:
+                window = start
+            else:
+                # Windows are clipped to the time range, as in InfluxDB.
+                window = max(point['time'].timestamp() // query.window * query.window, start)
+
+            for name, value in point['fields'].items():
+                if value is None or (query.fields is not None and name not in query.fields):
+                    continue
+
+                buckets.setdefault((point['measurement'], name, group, window), []).append(value)
+
+        return [
+            Aggregate(
+                measurement=measurement,
+                field=name,
+                tags={tag: value for tag, value in zip(query.group_by, group) if value is not None},
+                time=datetime.fromtimestamp(window, tz=timezone.utc),
+                value=aggregate(values, query.aggregate, query.percentile)
+            ) for (measurement, name, group, window), values in sorted(
+                buckets.items(),
+                key=lambda bucket: (bucket[0][0], bucket[0][1], tuple(value or '' for value in bucket[0][2]), bucket[0][3])
+            )
+        ]
+
     @abstractmethod
     def get_all(self) -> Tuple:
         """
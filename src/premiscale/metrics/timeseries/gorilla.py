@@ -0,0 +1,387 @@
+"""
+Gorilla-style compression of time series columns: delta-of-delta timestamps, XOR-encoded floats and varint-encoded
+integer deltas, as described in "Gorilla: A Fast, Scalable, In-Memory Time Series Database" (Pelkonen et al., 2015).
+
+Points collected at a steady interval compress to a few bits per timestamp, and slowly changing gauges to a few bits
+per value. Decoders are generators, so a range scan stops decoding a column once it's past the end of its range.
+"""
+
+
+from __future__ import annotations
+
+import logging
+
+from typing import TYPE_CHECKING
+from array import array
+from struct import Struct
+
+if TYPE_CHECKING:
+    from typing import Iterator, Sequence, Tuple
+
+
+log = logging.getLogger(__name__)
+
+
+# Timestamps are encoded with microsecond precision, the precision of a datetime.
+RESOLUTION = 1_000_000
+
+# Reinterpret the bits of a double as an unsigned integer, and back.
+DOUBLE = Struct('<d')
+BITS = Struct('<Q')
+
+# Delta-of-delta buckets, as (control bits, length of the control bits, length of the value). Collection times jitter
+# by milliseconds, so buckets are wider than the paper's second-precision ones.
+BUCKETS = (
+    (0b10, 2, 7),
+    (0b110, 3, 9),
+    (0b1110, 4, 12),
+    (0b11110, 5, 20),
+    (0b11111, 5, 64),
+)
+
+
+class BitWriter:
+    """
+    Write a stream of bits, most significant bit first.
+    """
+
+    __slots__ = ('_buffer', '_bits', '_length')
+
+    def __init__(self) -> None:
+        self._buffer = bytearray()
+
+        # Bits not yet written to the buffer, and their number.
+        self._bits = 0
+        self._length = 0
+
+    def write(self, value: int, length: int) -> None:
+        """
+        Write the lowest bits of a value.
+
+        Args:
+            value (int): The value. Must be non-negative and fit in `length` bits.
+            length (int): Number of bits to write.
+        """
+        self._bits = (self._bits << length) | value
+        self._length += length
+
+        if self._length >= 64:
+            rest = self._length % 8
+            self._buffer += (self._bits >> rest).to_bytes((self._length - rest) // 8, 'big')
+            self._bits &= (1 << rest) - 1
+            self._length = rest
+
+    def getvalue(self) -> bytes:
+        """
+        Get the stream's bytes, padding the last byte with zeros.
+
+        Returns:
+            bytes: The stream.
+        """
+        padding = -self._length % 8
+
+        return bytes(self._buffer) + (self._bits << padding).to_bytes((self._length + padding) // 8, 'big')
+
+
+class BitReader:
+    """
+    Read a stream of bits written by a BitWriter.
+
+    Args:
+        data (bytes): The stream.
+    """
+
+    __slots__ = ('_bits', '_length', '_position')
+
+    def __init__(self, data: bytes) -> None:
+        self._bits = int.from_bytes(data, 'big')
+        self._length = 8 * len(data)
+        self._position = 0
+
+    def read(self, length: int) -> int:
+        """
+        Read bits as an unsigned integer.
+
+        Args:
+            length (int): Number of bits to read.
+
+        Returns:
+            int: The bits.
+        """
+        self._position += length
+
+        return (self._bits >> (self._length - self._position)) & ((1 << length) - 1)
+
+    def ones(self, limit: int) -> int:
+        """
+        Read bits up to and including the first zero, or up to a limit.
+
+        Args:
+            limit (int): Maximum number of bits to read.
+
+        Returns:
+            int: The number of ones read.
+        """
+        count = 0
+
+        while count < limit and self.read(1):
+            count += 1
+
+        return count
+
+
+def zigzag(value: int) -> int:
+    """
+    Map a signed integer to an unsigned one, so small magnitudes map to small values.
+
+    Args:
+        value (int): The signed integer.
+
+    Returns:
+        int: The unsigned integer.
+    """
+    return 2 * value if value >= 0 else -2 * value - 1
+
+
+def unzigzag(value: int) -> int:
+    """
+    Map an unsigned integer from zigzag() back to a signed one.
+
+    Args:
+        value (int): The unsigned integer.
+
+    Returns:
+        int: The signed integer.
+    """
+    return value >> 1 if not value & 1 else -((value + 1) >> 1)
+
+
+def encode_times(times: Sequence[float]) -> bytes:
+    """
+    Encode increasing timestamps as their delta-of-deltas.
+
+    The first timestamp is written in full, and every other one as the change of the delta to its predecessor: a
+    single zero bit if the interval didn't change, or a control prefix and the change in up to 64 bits otherwise.
+
+    Args:
+        times (Sequence[float]): POSIX timestamps, in increasing order.
+
+    Returns:
+        bytes: The encoded timestamps.
+    """
+    writer = BitWriter()
+    previous = delta = 0
+
+    for index, time in enumerate(times):
+        _time = round(time * RESOLUTION)
+
+        if index == 0:
+            writer.write(zigzag(_time), 64)
+            previous = _time
+            continue
+
+        _delta = _time - previous
+        value = zigzag(_delta - delta)
+        previous, delta = _time, _delta
+
+        if value == 0:
+            writer.write(0, 1)
+            continue
+
+        for control, control_length, length in BUCKETS:
+            if value < 1 << length:
+                writer.write(control, control_length)
+                writer.write(value, length)
+                break
+
+    return writer.getvalue()
+
+
+def decode_times(data: bytes, count: int) -> Iterator[float]:
+    """
+    Decode timestamps written by encode_times().
+
+    Args:
+        data (bytes): The encoded timestamps.
+        count (int): The number of timestamps.
+
+    Yields:
+        float: Each POSIX timestamp.
+    """
+    if count == 0:
+        return None
+
+    reader = BitReader(data)
+    time = unzigzag(reader.read(64))
+    delta = 0
+
+    yield time / RESOLUTION
+
+    for _ in range(count - 1):
+        if (ones := reader.ones(len(BUCKETS))) != 0:
+            delta += unzigzag(reader.read(BUCKETS[ones - 1][2]))
+
+        time += delta
+
+        yield time / RESOLUTION
+
+
+def encode_floats(values: Sequence[float]) -> bytes:
+    """
+    Encode floats as the XOR of their bits with their predecessor's.
+
+    A value equal to its predecessor is written as a single zero bit. Otherwise, only the bits between the leading and
+    trailing zeros of the XOR are written, reusing the predecessor's window of meaningful bits if they fit in it.
+
+    Args:
+        values (Sequence[float]): The values. NaN stands in for missing values, and is encoded like any other.
+
+    Returns:
+        bytes: The encoded values.
+    """
+    writer = BitWriter()
+    bits = array('Q')
+    bits.frombytes(array('d', values).tobytes())
+
+    previous = 0
+    leading = trailing = -1
+
+    for index, value in enumerate(bits):
+        if index == 0:
+            writer.write(value, 64)
+            previous = value
+            continue
+
+        xor = value ^ previous
+        previous = value
+
+        if xor == 0:
+            writer.write(0, 1)
+            continue
+
+        _leading = min(64 - xor.bit_length(), 31)
+        _trailing = (xor & -xor).bit_length() - 1
+
+        if leading >= 0 and _leading >= leading and _trailing >= trailing:
+            writer.write(0b10, 2)
+            writer.write(xor >> trailing, 64 - leading - trailing)
+            continue
+
+        leading, trailing = _leading, _trailing
+        length = 64 - leading - trailing
+
+        writer.write(0b11, 2)
+        writer.write(leading, 5)
+        writer.write(length - 1, 6)
+        writer.write(xor >> trailing, length)
+
+    return writer.getvalue()
+
+
+def decode_floats(data: bytes, count: int) -> Iterator[float]:
+    """
+    Decode floats written by encode_floats().
+
+    Args:
+        data (bytes): The encoded values.
+        count (int): The number of values.
+
+    Yields:
+        float: Each value.
+    """
+    if count == 0:
+        return None
+
+    reader = BitReader(data)
+    value = reader.read(64)
+    leading = trailing = 0
+
+    yield DOUBLE.unpack(BITS.pack(value))[0]
+
+    for _ in range(count - 1):
+        if reader.read(1):
+            if reader.read(1):
+                leading = reader.read(5)
+                trailing = 64 - leading - (reader.read(6) + 1)
+
+            value ^= reader.read(64 - leading - trailing) << trailing
+
+        yield DOUBLE.unpack(BITS.pack(value))[0]
+
+
+def encode_ints(values: Sequence[int]) -> bytes:
+    """
+    Encode integers, e.g. counters, as zigzag varints of their deltas.
+
+    Args:
+        values (Sequence[int]): The values.
+
+    Returns:
+        bytes: The encoded values.
+    """
+    buffer = bytearray()
+    previous = 0
+
+    for value in values:
+        encode_varint(zigzag(value - previous), buffer)
+        previous = value
+
+    return bytes(buffer)
+
+
+def decode_ints(data: bytes, count: int) -> Iterator[int]:
+    """
+    Decode integers written by encode_ints().
+
+    Args:
+        data (bytes): The encoded values.
+        count (int): The number of values.
+
+    Yields:
+        int: Each value.
+    """
+    offset = value = 0
+
+    for _ in range(count):
+        delta, offset = decode_varint(data, offset)
+        value += unzigzag(delta)
+
+        yield value
+
+
+def encode_varint(value: int, buffer: bytearray) -> None:
+    """
+    Append an unsigned varint to a buffer.
+
+    Args:
+        value (int): The value. Must be non-negative.
+        buffer (bytearray): The buffer.
+    """
+    while value >= 0x80:
+        buffer.append((value & 0x7F) | 0x80)
+        value >>= 7
+
+    buffer.append(value)
+
+
+def decode_varint(data: bytes | memoryview, offset: int) -> Tuple[int, int]:
+    """
+    Read an unsigned varint from a buffer.
+
+    Args:
+        data (bytes | memoryview): The buffer.
+        offset (int): Offset of the varint in the buffer.
+
+    Returns:
+        Tuple[int, int]: The value, and the offset following it.
+    """
+    value = shift = 0
+
+    while True:
+        byte = data[offset]
+        offset += 1
+        value |= (byte & 0x7F) << shift
+        shift += 7
+
+        if byte < 0x80:
+            return value, offset
@@ -8,13 +8,17 @@ from __future__ import annotations
 import logging
 import sys
 
-from typing import TYPE_CHECKING
+from typing import TYPE_CHECKING, cast
+from datetime import datetime, timezone
+from wrapt import synchronized
 from influxdb_client import InfluxDBClient, Point, WritePrecision, BucketRetentionRules
 from influxdb_client.client.write_api import SYNCHRONOUS
-from premiscale.metrics.timeseries._base import TimeSeries
+from premiscale.metrics.timeseries._base import TimeSeries, Aggregate
 
 if TYPE_CHECKING:
-    from typing import Dict, Tuple
+    from typing import Any, Dict, Iterable, List, Tuple
+    from premiscale.hypervisor.qemu_data import DomainRecord
+    from premiscale.metrics.timeseries._base import Query
     from influxdb_client import (
         QueryApi,
         WriteApi,
@@ -27,9 +31,30 @@ if TYPE_CHECKING:
 log = logging.getLogger(__name__)
 
 
+# Flux functions computing each of the aggregates a Query supports, besides 'percentile'.
+FLUX_AGGREGATES = {
+    'mean': 'mean',
+    'max': 'max',
+    'min': 'min',
+    'last': 'last',
+    'sum': 'sum',
+    'count': 'count'
+}
+
+# Points are written with second precision. WritePrecision's values are plain strings, though the client annotates its
+# parameters with the class itself.
+WRITE_PRECISION = cast('WritePrecision', WritePrecision.S)
+
+# Columns of Flux records that aren't tags.
+FLUX_COLUMNS = {'result', 'table', '_start', '_stop', '_time', '_value', '_field', '_measurement'}
+
+
 class InfluxDB(TimeSeries):
     """
     Implement required interface methods that connect with InfluxDB.
+
+    The InfluxDB client and its synchronous write API are thread-safe, so only opening and closing the connection is
+    synchronized; a single instance may be shared between threads.
     """
     def __init__(self, time_series_config: TimeSeriesConfig) -> None:
         if time_series_config.connection is None:
@@ -42,7 +67,11 @@ class InfluxDB(TimeSeries):
         # database is analogous to the bucket name in InfluxDB.
         self.bucket = time_series_config.connection.database
 
-        self.organization = time_series_config.connection.organization
+        if time_series_config.connection.organization is None:
+            log.error("InfluxDB organization must be provided in the configuration file")
+            sys.exit(1)
+
+        self.organization: str = time_series_config.connection.organization
 
         # Credentials
         self._username = time_series_config.connection.credentials.username # this isn't used for InfluxDB
@@ -69,6 +98,7 @@ class InfluxDB(TimeSeries):
         """
         return self._connection is not None
 
+    @synchronized
     def open(self) -> None:
         """
         Open a connection to the metrics backend these methods interact with.
@@ -102,6 +132,7 @@ class InfluxDB(TimeSeries):
                 )
             )
 
+    @synchronized
     def close(self) -> None:
         """
         Close the connection to the metrics backend.
@@ -133,6 +164,179 @@ class InfluxDB(TimeSeries):
 
         return data
 
+    def _filter(self,
+                measurement: str | None,
+                start: datetime | None,
+                stop: datetime | None,
+                tags: Dict[str, str | Tuple[str, ...]] | None,
+                fields: Tuple[str, ...] | None = None) -> Tuple[str, Dict[str, Any]]:
+        """
+        Build the Flux selecting the points of the matching series in a time range. Values are passed as parameters
+        rather than formatted into the query.
+
+        Args:
+            measurement (str | None): The measurement to select points of. If None, points of every measurement are selected.
+            start (datetime | None): Time of the first point to select (inclusive). Defaults to the start of retention.
+            stop (datetime | None): Time of the last point to select (exclusive). Defaults to now.
+            tags (Dict[str, str | Tuple[str, ...]] | None): Tags the points must have.
+            fields (Tuple[str, ...] | None): Fields to select. If None, every field is selected.
+
+        Returns:
+            Tuple[str, Dict[str, Any]]: The Flux, and its parameters.
+        """
+        params: Dict[str, Any] = {}
+        flux = f'from(bucket: "{self.bucket}")'
+
+        if start is not None:
+            params['start'] = start
+            flux += ' |> range(start: params.start'
+        else:
+            flux += f' |> range(start: -{self.retention}s'
+
+        if stop is not None:
+            params['stop'] = stop
+            flux += ', stop: params.stop)'
+        else:
+            flux += ')'
+
+        predicates: List[str] = []
+
+        if measurement is not None:
+            params['measurement'] = measurement
+            predicates.append('r._measurement == params.measurement')
+
+        for index, (tag, value) in enumerate((tags or {}).items()):
+            values = (value,) if isinstance(value, str) else tuple(value)
+            alternatives: List[str] = []
+
+            for _index, _value in enumerate(values):
+                params[f'tag{index}_{_index}'] = _value
+                alternatives.append(f'r["{tag}"] == params.tag{index}_{_index}')
+
+            predicates.append(f'({" or ".join(alternatives) or "false"})')
+
+        if fields is not None:
+            alternatives = []
+
+            for index, field in enumerate(fields):
+                params[f'field{index}'] = field
+                alternatives.append(f'r._field == params.field{index}')
+
+            predicates.append(f'({" or ".join(alternatives) or "false"})')
+
+        if predicates:
+            flux += f' |> filter(fn: (r) => {" and ".join(predicates)})'
+
+        return flux, params
+
+    def range(self,
+              measurement: str | None = None,
+              start: datetime | None = None,
+              stop: datetime | None = None,
+              tags: Dict[str, str | Tuple[str, ...]] | None = None) -> Tuple:
+        """
+        Get the points of the matching series in a time range, sorted by time. InfluxDB returns a record per field,
+        so records are regrouped into points.
+
+        Args:
+            measurement (str | None): The measurement to get points of. If None, points of every measurement are returned.
+            start (datetime | None): Time of the first point to get (inclusive). Defaults to the start of retention.
+            stop (datetime | None): Time of the last point to get (exclusive). Defaults to now.
+            tags (Dict[str, str | Tuple[str, ...]] | None): Tags the points must have, by tag name: either a value, or a
+                tuple of values any of which matches. Defaults to None, i.e. any tags.
+
+        Returns:
+            Tuple: The points, in the schema documented on DomainStats.to_tinyflux. If the connection is not open,
+                return an empty tuple.
+        """
+        if self._query_api is None:
+            log.error("InfluxDB connection is not open")
+            return tuple()
+
+        flux, params = self._filter(measurement, start, stop, tags)
+
+        points: Dict[Tuple[str, datetime, Tuple[Tuple[str, str], ...]], Dict] = {}
+
+        for table in self._query_api.query(flux, org=self.organization, params=params):
+            for record in table.records:
+                _tags = {key: value for key, value in record.values.items() if key not in FLUX_COLUMNS}
+                key = (record.get_measurement(), record.get_time(), tuple(sorted(_tags.items())))
+
+                if key not in points:
+                    points[key] = {
+                        'measurement': key[0],
+                        'time': key[1],
+                        'tags': _tags,
+                        'fields': {}
+                    }
+
+                points[key]['fields'][record.get_field()] = record.get_value()
+
+        return tuple(sorted(points.values(), key=lambda point: point['time']))
+
+    def query(self, query: Query) -> List[Aggregate]:
+        """
+        Aggregate the points matching a query. The query is pushed down to InfluxDB, so only the aggregates are
+        returned by the server.
+
+        Args:
+            query (Query): The query.
+
+        Returns:
+            List[Aggregate]: The aggregates, sorted by measurement, field, group and time. If the connection is not
+                open, return an empty list.
+        """
+        if self._query_api is None:
+            log.error("InfluxDB connection is not open")
+            return []
+
+        flux, params = self._filter(query.measurement, query.start, query.stop, query.tags, query.fields)
+
+        columns = ', '.join(f'"{column}"' for column in (*query.group_by, '_measurement', '_field'))
+        flux += f' |> group(columns: [{columns}])'
+
+        if query.aggregate == 'percentile':
+            params['q'] = query.percentile / 100
+            function = 'fn: (column, tables=<-) => tables |> quantile(q: params.q, column: column, method: "exact_mean")'
+            aggregate = 'quantile(q: params.q, method: "exact_mean")'
+        else:
+            function = f'fn: {FLUX_AGGREGATES[query.aggregate]}'
+            aggregate = f'{FLUX_AGGREGATES[query.aggregate]}()'
+
+        if query.window is not None:
+            flux += f' |> aggregateWindow(every: {query.window}s, {function}, createEmpty: false, timeSrc: "_start")'
+        else:
+            flux += f' |> {aggregate}'
+
+        log.debug(f'Querying InfluxDB with "{flux}"')
+
+        aggregates: List[Aggregate] = []
+
+        for table in self._query_api.query(flux, org=self.organization, params=params):
+            for record in table.records:
+                if record.get_value() is None:
+                    continue
+
+                aggregates.append(
+                    Aggregate(
+                        measurement=record.get_measurement(),
+                        field=record.get_field(),
+                        tags={tag: record.values[tag] for tag in query.group_by if record.values.get(tag) is not None},
+                        time=record.get_time() if query.window is not None else query.start.astimezone(timezone.utc),
+                        value=record.get_value()
+                    )
+                )
+
+        return sorted(
+            aggregates,
+            key=lambda _aggregate: (
+                _aggregate.measurement,
+                _aggregate.field,
+                tuple(_aggregate.tags.get(tag, '') for tag in query.group_by),
+                _aggregate.time
+            )
+        )
+
     def commit(self) -> None:
         """
         Commit any changes to the database. By default, this does nothing, since InfluxDB isn't transactional.
@@ -152,7 +356,7 @@ class InfluxDB(TimeSeries):
 
         point = Point.from_dict(
             datum,
-            write_precision=WritePrecision.S
+            write_precision=WRITE_PRECISION
         )
 
         self._write_api.write(
@@ -175,16 +379,36 @@ class InfluxDB(TimeSeries):
         points = [
             Point.from_dict(
                 datum,
-                write_precision=WritePrecision.S
+                write_precision=WRITE_PRECISION
             ) for datum in data
         ]
 
-        for point in points:
-            self._write_api.write(
-                bucket=self.bucket,
-                org=self.organization,
-                record=point
-            )
+        # Write the whole batch in a single request.
+        self._write_api.write(
+            bucket=self.bucket,
+            org=self.organization,
+            record=points
+        )
+
+    def insert_records(self, records: Iterable[DomainRecord]) -> None:
+        """
+        Insert the points of a batch of domain records into the metrics store, formatted as line protocol straight
+        from the records.
+
+        Args:
+            records (Iterable[DomainRecord]): the records to insert.
+        """
+        if self._write_api is None:
+            log.error("InfluxDB connection is not open.")
+            return None
+
+        # Write the whole batch in a single request.
+        self._write_api.write(
+            bucket=self.bucket,
+            org=self.organization,
+            record=[line for line in (record.to_line_protocol() for record in records) if line],
+            write_precision=WRITE_PRECISION
+        )
 
     def clear(self) -> None:
         """
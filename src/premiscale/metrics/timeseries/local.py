@@ -9,12 +9,14 @@ import logging
 
 from typing import TYPE_CHECKING
 from datetime import timedelta, datetime, timezone
+from wrapt import synchronized
 from tinyflux import TinyFlux, Point, FieldQuery, TagQuery, TimeQuery
 from tinyflux.storages import MemoryStorage, CSVStorage
-from premiscale.metrics.timeseries._base import TimeSeries
+from premiscale.metrics.timeseries._base import TimeSeries, match_tags
 
 if TYPE_CHECKING:
-    from typing import Dict, Tuple
+    from typing import Dict, Iterable, List, Tuple
+    from premiscale.hypervisor.qemu_data import DomainRecord
 
 
 log = logging.getLogger(__name__)
@@ -23,6 +25,9 @@ log = logging.getLogger(__name__)
 class Local(TimeSeries):
     """
     Implement an interface to storing host metrics in memory.
+
+    TinyFlux isn't thread-safe, so every method touching the database is synchronized, which allows a single instance
+    to be shared between threads.
     """
 
     # # https://medium.com/analytics-vidhya/how-to-create-a-thread-safe-singleton-class-in-python-822e1170a7f6
@@ -49,6 +54,7 @@ class Local(TimeSeries):
         """
         return self._connection is not None
 
+    @synchronized
     def open(self) -> None:
         """
         Open a connection to the metrics backend these methods interact with.
@@ -63,6 +69,7 @@ class Local(TimeSeries):
                 storage=MemoryStorage
             )
 
+    @synchronized
     def close(self) -> None:
         """
         Close the connection to the metrics backend.
@@ -76,6 +83,7 @@ class Local(TimeSeries):
         """
         return None
 
+    @synchronized
     def insert(self, data: Dict) -> None:
         """
         Insert a point into the metrics store.
@@ -88,6 +96,7 @@ class Local(TimeSeries):
         self._connection.insert(point)
         self._run_retention_policy()
 
+    @synchronized
     def insert_batch(self, data: Tuple) -> None:
         """
         Insert a batch of points into the metrics store.
@@ -103,19 +112,49 @@ class Local(TimeSeries):
         self._connection.insert_multiple(points)
         self._run_retention_policy()
 
+    @synchronized
+    def insert_records(self, records: Iterable[DomainRecord]) -> None:
+        """
+        Insert the points of a batch of domain records into the metrics store. Points are built straight from the
+        records, and a domain's points share its tags.
+
+        Args:
+            records (Iterable[DomainRecord]): the records to insert.
+        """
+        points: List[Point] = []
+
+        # Domains of a host are collected at the same time, so consecutive records usually share a timestamp.
+        _last: float | None = None
+        _time = datetime.now(tz=timezone.utc)
+
+        for record in records:
+            if record.time != _last:
+                _last = record.time
+                _time = datetime.fromtimestamp(_last, tz=timezone.utc)
+
+            tags = record.tags()
+
+            for measurement, fields in record.measurements():
+                points.append(Point(time=_time, measurement=measurement, tags=tags, fields=fields))
+
+        self._connection.insert_multiple(points)
+        self._run_retention_policy()
+
+    @synchronized
     def clear(self) -> None:
         """
         Clear the metrics store of all data.
         """
         self._connection.remove_all()
 
+    @synchronized
     def _run_retention_policy(self) -> None:
         """
         Run the retention policy on the database, removing points older than the retention policy.
         """
         removed_item_number = 0
 
-        for measurement in ['cpu', 'memory', 'block', 'net']:
+        for measurement in ['cpu', 'memory', 'block', 'net', 'host', 'mountpoint', 'asg_rollup', 'host_rollup']:
             removed_item_number += self._connection.remove(
                 TimeQuery() < datetime.now(tz=timezone.utc) - self.retention,
                 measurement=measurement
@@ -123,6 +162,42 @@ class Local(TimeSeries):
 
         log.debug(f"Retention removed {removed_item_number} items from the database.")
 
+    @synchronized
+    def range(self,
+              measurement: str | None = None,
+              start: datetime | None = None,
+              stop: datetime | None = None,
+              tags: Dict[str, str | Tuple[str, ...]] | None = None) -> Tuple:
+        """
+        Get the points of the matching series in a time range, sorted by time. TinyFlux indexes points by time and
+        measurement, so only the points in the range are read; tags are matched on those.
+
+        Args:
+            measurement (str | None): The measurement to get points of. If None, points of every measurement are returned.
+            start (datetime | None): Time of the first point to get (inclusive). Defaults to the start of retention.
+            stop (datetime | None): Time of the last point to get (exclusive). Defaults to now.
+            tags (Dict[str, str | Tuple[str, ...]] | None): Tags the points must have. Defaults to None, i.e. any tags.
+
+        Returns:
+            Tuple: The points.
+        """
+        _start = start if start is not None else datetime.now(timezone.utc) - self.retention
+        _stop = stop if stop is not None else datetime.now(timezone.utc)
+
+        return tuple(
+            {
+                'measurement': point.measurement,
+                'time': point.time,
+                'tags': point.tags,
+                'fields': point.fields
+            } for point in self._connection.search(
+                (TimeQuery() >= _start) & (TimeQuery() < _stop),
+                measurement=measurement,
+                sorted=True
+            ) if match_tags(point.tags, tags)
+        )
+
+    @synchronized
     def get_all(self, measurement: str | None = None) -> Tuple:
         """
         Get all the data in the metrics store.
@@ -0,0 +1,440 @@
+"""
+Methods for interacting with an in-memory metrics store of fixed-size, time-ordered ring buffers.
+"""
+
+
+from __future__ import annotations
+
+import logging
+
+from typing import TYPE_CHECKING
+from array import array
+from datetime import timedelta, datetime, timezone
+from math import isnan, nan
+from time import time as now
+from wrapt import synchronized
+from premiscale.metrics.timeseries._base import TimeSeries, match_tags
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, Iterator, List, Set, Tuple
+    from premiscale.hypervisor.qemu_data import DomainRecord
+
+
+log = logging.getLogger(__name__)
+
+
+class Series:
+    """
+    The points of one series, i.e. one measurement with one set of tags, in a ring buffer of `capacity` points.
+
+    Times and each field are stored in parallel typed arrays, preallocated to the buffer's capacity. Points are
+    appended at the tail and expire from the head, so appending, expiring a point and overwriting the oldest point
+    once the buffer is full are all O(1), and since points are kept in time order, the points in a time range are
+    found by binary search. Fields missing from a point are stored as NaN and left out when it's read.
+
+    Args:
+        measurement (str): The series' measurement.
+        tags (Dict[str, str]): The series' tags.
+        capacity (int): Maximum number of points kept.
+    """
+
+    __slots__ = ('measurement', 'tags', 'capacity', 'head', 'size', 'times', 'fields', '_ints')
+
+    def __init__(self, measurement: str, tags: Dict[str, str], capacity: int) -> None:
+        self.measurement = measurement
+        self.tags = tags
+        self.capacity = capacity
+
+        # Physical index of the oldest point, and the number of points.
+        self.head = 0
+        self.size = 0
+
+        # POSIX timestamps.
+        self.times = array('d', bytes(8 * capacity))
+        self.fields: Dict[str, array] = {}
+
+        # Fields written as integers, which are read back as integers.
+        self._ints: Set[str] = set()
+
+    def __len__(self) -> int:
+        """
+        Return the number of points in the series.
+
+        Returns:
+            int: The number of points.
+        """
+        return self.size
+
+    def latest(self) -> float | None:
+        """
+        Get the time of the newest point.
+
+        Returns:
+            float | None: The time of the newest point, or None if the series is empty.
+        """
+        if self.size == 0:
+            return None
+
+        return self.times[(self.head + self.size - 1) % self.capacity]
+
+    def append(self, time: float, fields: Dict[str, int | float | None]) -> bool:
+        """
+        Append a point, overwriting the oldest point if the series is full.
+
+        Args:
+            time (float): Time of the point, as a POSIX timestamp. Must not be older than the newest point.
+            fields (Dict[str, int | float | None]): The point's fields. None fields are left out.
+
+        Returns:
+            bool: True if the point was appended, False if it was older than the newest point.
+        """
+        if self.size and time < self.times[(self.head + self.size - 1) % self.capacity]:
+            return False
+
+        if self.size == self.capacity:
+            tail = self.head
+            self.head = (self.head + 1) % self.capacity
+        else:
+            tail = (self.head + self.size) % self.capacity
+            self.size += 1
+
+        self.times[tail] = time
+        ints = self._ints
+
+        for name, column in self.fields.items():
+            if (value := fields.get(name)) is None:
+                column[tail] = nan
+                continue
+
+            column[tail] = value
+
+            # A field that was only ever written as an integer may turn out to be a float, e.g. a utilization of -1.
+            if name in ints and not isinstance(value, int):
+                ints.discard(name)
+
+        for name in fields.keys() - self.fields.keys():
+            if (value := fields[name]) is None:
+                continue
+
+            column = self.fields[name] = array('d', [nan]) * self.capacity
+            column[tail] = value
+
+            if isinstance(value, int):
+                ints.add(name)
+
+        return True
+
+    def expire(self, cutoff: float) -> int:
+        """
+        Drop points older than a cutoff from the head of the series.
+
+        Args:
+            cutoff (float): POSIX timestamp before which points are dropped.
+
+        Returns:
+            int: The number of dropped points.
+        """
+        dropped = 0
+
+        while self.size and self.times[self.head] < cutoff:
+            self.head = (self.head + 1) % self.capacity
+            self.size -= 1
+            dropped += 1
+
+        return dropped
+
+    def _bisect(self, time: float) -> int:
+        """
+        Find the logical index of the first point at or after a time.
+
+        Args:
+            time (float): The POSIX timestamp to search for.
+
+        Returns:
+            int: The logical index, between 0 and the number of points.
+        """
+        low, high = 0, self.size
+
+        while low < high:
+            middle = (low + high) // 2
+
+            if self.times[(self.head + middle) % self.capacity] < time:
+                low = middle + 1
+            else:
+                high = middle
+
+        return low
+
+    def range(self, start: float | None = None, stop: float | None = None) -> Iterator[Tuple[float, Dict[str, int | float]]]:
+        """
+        Read the points in a time range, in time order.
+
+        Args:
+            start (float | None): POSIX timestamp of the first point to read (inclusive). Defaults to the oldest point.
+            stop (float | None): POSIX timestamp of the last point to read (exclusive). Defaults to after the newest point.
+
+        Yields:
+            Tuple[float, Dict[str, int | float]]: Each point's time and fields.
+        """
+        first = 0 if start is None else self._bisect(start)
+        last = self.size if stop is None else self._bisect(stop)
+
+        for index in range(first, last):
+            physical = (self.head + index) % self.capacity
+            _fields: Dict[str, int | float] = {}
+
+            for name, column in self.fields.items():
+                if not isnan(value := column[physical]):
+                    _fields[name] = int(value) if name in self._ints else value
+
+            yield self.times[physical], _fields
+
+
+class RingBuffer(TimeSeries):
+    """
+    Implement an interface to storing host metrics in memory, in one fixed-capacity ring buffer per series (see
+    Series), keyed by measurement and tags.
+
+    Unlike the TinyFlux-backed Local store, retention never scans the whole store: a series' expired points are
+    dropped from its head when it's written to, and series that stopped receiving points are dropped whole by a sweep
+    that runs at most once per retention period. Memory is bounded by the number of series times their capacity,
+    however long the controller runs. Points older than their series' newest point are dropped.
+
+    Every method touching the store is synchronized, which allows a single instance to be shared between threads.
+
+    Args:
+        retention (timedelta): How long points are kept.
+        capacity (int): Maximum number of points kept per series. Should hold at least a retention period's worth of
+            points at the shortest collection interval. Defaults to 64.
+    """
+    def __init__(self, retention: timedelta, capacity: int = 64) -> None:
+        self.retention: timedelta = retention
+        self.capacity = capacity
+
+        self._series: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], Series] | None = None
+        self._swept = 0.0
+
+        # Counters.
+        self.expired = 0
+        self.out_of_order = 0
+
+    def is_connected(self) -> bool:
+        """
+        Check if the store is open.
+
+        Returns:
+            bool: True if the store is open.
+        """
+        return self._series is not None
+
+    @synchronized
+    def open(self) -> None:
+        """
+        Open the store.
+        """
+        if self._series is None:
+            self._series = {}
+
+    @synchronized
+    def close(self) -> None:
+        """
+        Close the store, discarding its data.
+        """
+        self._series = None
+
+    def commit(self) -> None:
+        """
+        Commit any changes to the database. In this class' case, we do nothing since everything is
+        committed by default.
+        """
+        return None
+
+    @staticmethod
+    def _time(time: datetime | float | int) -> float:
+        """
+        Convert a point's time to a POSIX timestamp.
+
+        Args:
+            time (datetime | float | int): The point's time, as a datetime or a POSIX timestamp.
+
+        Returns:
+            float: The POSIX timestamp.
+        """
+        if isinstance(time, datetime):
+            return time.timestamp()
+
+        return float(time)
+
+    def _append(self, measurement: str, tags: Dict[str, str], time: float, fields: Dict[str, int | float | None], cutoff: float) -> None:
+        """
+        Append a point to its series, creating the series if needed and expiring its old points.
+
+        Args:
+            measurement (str): The point's measurement.
+            tags (Dict[str, str]): The point's tags.
+            time (float): The point's time, as a POSIX timestamp.
+            fields (Dict[str, int | float | None]): The point's fields. None fields are left out.
+            cutoff (float): POSIX timestamp before which points have expired.
+        """
+        if self._series is None:
+            raise ValueError('Time series store is not open')
+
+        key = (measurement, tuple(sorted(tags.items())))
+
+        if (series := self._series.get(key)) is None:
+            series = self._series[key] = Series(measurement, dict(tags), self.capacity)
+
+        if not series.append(time, fields):
+            self.out_of_order += 1
+            return None
+
+        self.expired += series.expire(cutoff)
+
+    @synchronized
+    def insert(self, data: Dict) -> None:
+        """
+        Insert a point into the metrics store.
+
+        Args:
+            data (Dict): a dictionary containing the data to insert.
+        """
+        self.insert_batch((data,))
+
+    @synchronized
+    def insert_batch(self, data: Tuple) -> None:
+        """
+        Insert a batch of points into the metrics store.
+
+        Args:
+            data (Tuple): a tuple of dictionaries containing the data to insert, in the schema documented on
+                DomainStats.to_tinyflux. Times may be datetimes or POSIX timestamps.
+        """
+        cutoff = now() - self.retention.total_seconds()
+
+        for datum in data:
+            self._append(datum['measurement'], datum.get('tags', {}), self._time(datum['time']), datum['fields'], cutoff)
+
+        self._run_retention_policy()
+
+    @synchronized
+    def insert_records(self, records: Iterable[DomainRecord]) -> None:
+        """
+        Insert the points of a batch of domain records into the metrics store, straight from the records.
+
+        Args:
+            records (Iterable[DomainRecord]): the records to insert.
+        """
+        cutoff = now() - self.retention.total_seconds()
+
+        for record in records:
+            tags = record.tags()
+
+            for measurement, fields in record.measurements():
+                self._append(measurement, tags, record.time, fields, cutoff)
+
+        self._run_retention_policy()
+
+    @synchronized
+    def clear(self) -> None:
+        """
+        Clear the metrics store of all data.
+        """
+        if self._series is not None:
+            self._series.clear()
+
+    @synchronized
+    def _run_retention_policy(self) -> None:
+        """
+        Drop series whose newest point is older than the retention policy, e.g. of domains that are gone. Series that
+        are written to expire their own points as they're written, so this only needs to run once per retention
+        period.
+        """
+        if self._series is None:
+            return None
+
+        _now = now()
+        retention = self.retention.total_seconds()
+
+        if _now - self._swept < retention:
+            return None
+
+        cutoff = _now - retention
+        stale = [key for key, series in self._series.items() if (latest := series.latest()) is None or latest < cutoff]
+
+        for key in stale:
+            self.expired += len(self._series.pop(key))
+
+        self._swept = _now
+
+        log.debug(f'Retention removed {len(stale)} series from the database, {len(self._series)} remain')
+
+    def _select(self, measurement: str | None = None, tags: Dict[str, str | Tuple[str, ...]] | None = None) -> List[Series]:
+        """
+        Select the series of a measurement whose tags match.
+
+        Args:
+            measurement (str | None): The measurement. If None, series of every measurement are selected.
+            tags (Dict[str, str | Tuple[str, ...]] | None): Tags the series must have. If None, series with any tags are
+                selected.
+
+        Returns:
+            List[Series]: The matching series.
+        """
+        if self._series is None:
+            return []
+
+        return [
+            series for (_measurement, _), series in self._series.items()
+            if (measurement is None or _measurement == measurement)
+            and match_tags(series.tags, tags)
+        ]
+
+    @synchronized
+    def range(self,
+              measurement: str | None = None,
+              start: datetime | None = None,
+              stop: datetime | None = None,
+              tags: Dict[str, str | Tuple[str, ...]] | None = None) -> Tuple:
+        """
+        Get the points of the matching series in a time range, sorted by time.
+
+        Args:
+            measurement (str | None): The measurement to get points of. If None, points of every measurement are returned.
+            start (datetime | None): Time of the first point to get (inclusive). Defaults to the start of retention.
+            stop (datetime | None): Time of the last point to get (exclusive). Defaults to now.
+            tags (Dict[str, str | Tuple[str, ...]] | None): Tags the points must have, by tag name: either a value, or a
+                tuple of values any of which matches. Defaults to None, i.e. any tags.
+
+        Returns:
+            Tuple: The points, in the schema documented on DomainStats.to_tinyflux.
+        """
+        _start = start.timestamp() if start is not None else now() - self.retention.total_seconds()
+        _stop = stop.timestamp() if stop is not None else None
+
+        points = [
+            (time, series, fields)
+            for series in self._select(measurement, tags)
+            for time, fields in series.range(_start, _stop)
+        ]
+        points.sort(key=lambda point: point[0])
+
+        return tuple(
+            {
+                'measurement': series.measurement,
+                'time': datetime.fromtimestamp(time, tz=timezone.utc),
+                'tags': dict(series.tags),
+                'fields': fields
+            } for time, series, fields in points
+        )
+
+    def get_all(self, measurement: str | None = None) -> Tuple:
+        """
+        Get all the data in the metrics store.
+
+        Args:
+            measurement (str | None): the measurement to get data for. If None, all data is returned. (Default: None.)
+
+        Returns:
+            Tuple: all the data in the metrics store.
+        """
+        return self.range(measurement)
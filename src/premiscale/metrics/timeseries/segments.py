@@ -0,0 +1,811 @@
+"""
+Methods for interacting with an on-disk metrics store of time-partitioned, append-only segment files.
+"""
+
+
+from __future__ import annotations
+
+import json
+import logging
+import mmap
+import os
+
+from typing import TYPE_CHECKING
+from array import array
+from datetime import timedelta, datetime, timezone
+from functools import lru_cache
+from math import inf, isnan, nan
+from struct import Struct
+from time import time as now
+from wrapt import synchronized
+from premiscale.metrics.timeseries._base import TimeSeries, match_tags
+from premiscale.metrics.timeseries.gorilla import (
+    encode_times, decode_times, encode_floats, decode_floats, encode_ints, decode_ints, encode_varint, decode_varint
+)
+
+if TYPE_CHECKING:
+    from typing import Dict, Iterable, Iterator, List, Mapping, Sequence, Tuple
+    from premiscale.hypervisor.qemu_data import DomainRecord
+
+
+log = logging.getLogger(__name__)
+
+
+# An index entry: the block's offset and length in the segment file, its number of points, the times of its oldest and
+# newest points and the codec its columns are encoded with.
+INDEX = Struct('<QIIddB')
+
+# A series' header in a block: the length of its key, its number of points, and the lengths of its fields' headers and
+# of its encoded times and columns.
+SERIES = Struct('<HIHI')
+
+# A field's header in a series: the length of its name and its type (see Segment.encode).
+FIELD = Struct('<BB')
+
+# Block codecs: fixed-width columns, or Gorilla-compressed ones (see premiscale.metrics.timeseries.gorilla).
+RAW = 0
+GORILLA = 1
+
+# Field types.
+INT = ord('q')
+FLOAT = ord('d')
+SPARSE_INT = ord('i')
+
+# Range of the integers an INT column holds.
+INT_MIN = -2**63
+INT_MAX = 2**63 - 1
+
+
+@lru_cache(maxsize=256)
+def _parse_fields(header: bytes) -> Tuple[Tuple[str, int], ...]:
+    """
+    Parse the fields' headers of a series. Series of a measurement share their fields, so this is memoized.
+
+    Args:
+        header (bytes): The fields' headers.
+
+    Returns:
+        Tuple[Tuple[str, int], ...]: The name and type of each field.
+    """
+    fields: List[Tuple[str, int]] = []
+    offset = 0
+
+    while offset < len(header):
+        name_length, _type = FIELD.unpack_from(header, offset)
+        offset += FIELD.size
+        fields.append((header[offset:offset + name_length].decode(), _type))
+        offset += name_length
+
+    return tuple(fields)
+
+
+@lru_cache(maxsize=256)
+def _layout(count: int, types: Tuple[int, ...]) -> Struct:
+    """
+    Build the layout of a series' encoded times and columns, to decode them in a single call.
+
+    Args:
+        count (int): The series' number of points.
+        types (Tuple[int, ...]): The type of each of the series' fields.
+
+    Returns:
+        Struct: The layout.
+    """
+    return Struct('<' + 'd' * count + ''.join(('q' if _type == INT else 'd') * count for _type in types))
+
+
+class Segment:
+    """
+    One time partition of a Segments store: a segment file of blocks, each holding the points of one write grouped by
+    series, and an index file of one fixed-size entry per block.
+
+    Both files are only ever appended to. A block is written to the segment file, and synced to disk, before its index
+    entry, so a crash of the process or of the machine leaves at most an unindexed block, which is never read, or a
+    partial index entry, which is ignored and truncated before the partition is written again. A partition is
+    compacted by writing its points to the files of its next generation (see Segment.replace), which supersede the
+    previous generation's once their index exists.
+
+    Args:
+        directory (str): The store's directory.
+        start (int): Start of the partition, as a POSIX timestamp.
+        generation (int): Number of times the partition was compacted. Defaults to 0.
+    """
+
+    __slots__ = ('start', 'generation', 'data', 'index', 'blocks')
+
+    def __init__(self, directory: str, start: int, generation: int = 0) -> None:
+        self.start = start
+        self.generation = generation
+
+        name = f'{start:012d}' if generation == 0 else f'{start:012d}.{generation}'
+        self.data = os.path.join(directory, f'{name}.seg')
+        self.index = os.path.join(directory, f'{name}.idx')
+
+        # Index entries, as (offset, length, points, first, last, codec).
+        self.blocks: List[Tuple[int, int, int, float, float, int]] = []
+
+    def load(self) -> None:
+        """
+        Read the partition's index. Entries of blocks that aren't fully written are ignored.
+        """
+        try:
+            with open(self.index, 'rb') as f:
+                entries = f.read()
+
+            size = os.path.getsize(self.data)
+        except FileNotFoundError:
+            self.blocks = []
+            return None
+
+        usable = len(entries) - len(entries) % INDEX.size
+
+        self.blocks = [
+            entry for entry in INDEX.iter_unpack(entries[:usable])
+            if entry[0] + entry[1] <= size
+        ]
+
+    @staticmethod
+    def encode(series: Mapping[bytes, Sequence[Tuple[float, Mapping[str, int | float | None]]]], codec: int = RAW) -> bytes:
+        """
+        Encode points as a block.
+
+        A block is a sequence of series, each a header (see SERIES), its key, the name and type of each of its fields
+        (see FIELD), its times, and a column per field. Fields whose values are all integers are stored as integers,
+        and other fields as doubles, with NaN standing in for missing values; integer fields with missing values are
+        marked as such so they're read back as integers. Integers outside the range of a 64-bit integer are stored as
+        doubles too, and read back as floats.
+
+        With the RAW codec, times and doubles are stored as 64-bit floats and integers as 64-bit integers. With the
+        GORILLA codec, times are delta-of-delta encoded, doubles XOR encoded and integers stored as varint deltas,
+        each column prefixed with its length as a varint.
+
+        Args:
+            series (Mapping[bytes, Sequence[Tuple[float, Mapping[str, int | float | None]]]]): Each series' points,
+                as their time and fields, by series key. None fields are stored as missing values.
+            codec (int): The codec to encode columns with. Defaults to RAW.
+
+        Returns:
+            bytes: The block.
+        """
+        chunks: List[bytes] = []
+
+        for key, _points in series.items():
+            points = sorted(_points, key=lambda point: point[0])
+
+            names: Dict[str, None] = {}
+
+            for _, fields in points:
+                names.update(dict.fromkeys(fields))
+
+            header: List[bytes] = []
+            times = [point[0] for point in points]
+            columns: List[bytes] = [array('d', times).tobytes() if codec == RAW else encode_times(times)]
+
+            for name in names:
+                values = [fields.get(name) for _, fields in points]
+                ints = [value for value in values if isinstance(value, int)]
+                missing = values.count(None)
+
+                # Integers that don't fit in 64 bits are stored as doubles, like fields that aren't all integers.
+                integral = len(ints) + missing == len(values) and all(INT_MIN <= value <= INT_MAX for value in ints)
+
+                if integral and not missing:
+                    _type = INT
+                    columns.append(array('q', ints).tobytes() if codec == RAW else encode_ints(ints))
+                else:
+                    _type = SPARSE_INT if integral else FLOAT
+                    _values = [nan if value is None else value for value in values]
+                    columns.append(array('d', _values).tobytes() if codec == RAW else encode_floats(_values))
+
+                _name = name.encode()
+                header.append(FIELD.pack(len(_name), _type) + _name)
+
+            _header = b''.join(header)
+
+            if codec == RAW:
+                body = b''.join(columns)
+            else:
+                _body = bytearray()
+
+                for column in columns:
+                    encode_varint(len(column), _body)
+                    _body += column
+
+                body = bytes(_body)
+
+            chunks.append(SERIES.pack(len(key), len(points), len(_header), len(body)))
+            chunks.append(key)
+            chunks.append(_header)
+            chunks.append(body)
+
+        return b''.join(chunks)
+
+    @staticmethod
+    def decode(block: bytes, codec: int) -> Iterator[Tuple[bytes, int, bytes, memoryview]]:
+        """
+        Walk the series of a block.
+
+        Args:
+            block (bytes): The block.
+            codec (int): The codec the block's columns are encoded with.
+
+        Yields:
+            Tuple[bytes, int, bytes, memoryview]: Each series' key, its number of points, its fields' headers, and
+                its encoded times and columns. These are only decoded by Segment.points, so series that don't match a
+                query are skipped cheaply.
+
+        Raises:
+            ValueError: If the codec is unknown.
+        """
+        if codec not in (RAW, GORILLA):
+            raise ValueError(f'Unknown segment block codec: {codec}')
+
+        view = memoryview(block)
+        offset = 0
+
+        while offset < len(block):
+            key_length, count, header_length, body_length = SERIES.unpack_from(block, offset)
+            offset += SERIES.size + key_length + header_length
+
+            yield (
+                block[offset - key_length - header_length:offset - header_length],
+                count,
+                block[offset - header_length:offset],
+                view[offset:offset + body_length]
+            )
+            offset += body_length
+
+    @staticmethod
+    def points(body: memoryview, count: int, header: bytes, start: float, stop: float, codec: int = RAW) -> Iterator[Tuple[float, Dict[str, int | float]]]:
+        """
+        Decode the points of a series in a time range.
+
+        Args:
+            body (memoryview): The series' encoded times and columns.
+            count (int): The series' number of points.
+            header (bytes): The series' fields' headers.
+            start (float): POSIX timestamp of the first point to read (inclusive).
+            stop (float): POSIX timestamp of the last point to read (exclusive).
+            codec (int): The codec the series' columns are encoded with. Defaults to RAW.
+
+        Yields:
+            Tuple[float, Dict[str, int | float]]: Each point's time and fields.
+        """
+        fields = _parse_fields(header)
+
+        if codec == GORILLA:
+            yield from Segment._stream(body, count, fields, start, stop)
+            return None
+
+        values = _layout(count, tuple(_type for _, _type in fields)).unpack_from(body)
+
+        for index in range(count):
+            if not start <= (_time := values[index]) < stop:
+                continue
+
+            _fields: Dict[str, int | float] = {}
+
+            for position, (name, _type) in enumerate(fields, start=1):
+                value = values[count * position + index]
+
+                if _type == INT:
+                    _fields[name] = value
+                elif not isnan(value):
+                    _fields[name] = int(value) if _type == SPARSE_INT else value
+
+            yield _time, _fields
+
+    @staticmethod
+    def _stream(body: memoryview, count: int, fields: Tuple[Tuple[str, int], ...], start: float, stop: float) -> Iterator[Tuple[float, Dict[str, int | float]]]:
+        """
+        Decode the points of a Gorilla-compressed series in a time range, decoding its columns in lockstep and stopping
+        at the end of the range.
+
+        Args:
+            body (memoryview): The series' encoded times and columns.
+            count (int): The series' number of points.
+            fields (Tuple[Tuple[str, int], ...]): The name and type of each of the series' fields.
+            start (float): POSIX timestamp of the first point to read (inclusive).
+            stop (float): POSIX timestamp of the last point to read (exclusive).
+
+        Yields:
+            Tuple[float, Dict[str, int | float]]: Each point's time and fields.
+        """
+        columns: List[bytes] = []
+        offset = 0
+
+        for _ in range(len(fields) + 1):
+            length, offset = decode_varint(body, offset)
+            columns.append(bytes(body[offset:offset + length]))
+            offset += length
+
+        times = decode_times(columns[0], count)
+        values = [
+            decode_ints(column, count) if _type == INT else decode_floats(column, count)
+            for column, (_, _type) in zip(columns[1:], fields)
+        ]
+
+        for _time, *_values in zip(times, *values):
+            if _time >= stop:
+                break
+
+            if _time < start:
+                continue
+
+            _fields: Dict[str, int | float] = {}
+
+            for (name, _type), value in zip(fields, _values):
+                if _type == INT:
+                    _fields[name] = value
+                elif not isnan(value):
+                    _fields[name] = int(value) if _type == SPARSE_INT else value
+
+            yield _time, _fields
+
+    def append(self, block: bytes, points: int, first: float, last: float, codec: int = RAW) -> None:
+        """
+        Append a block to the segment file and its entry to the index file.
+
+        Args:
+            block (bytes): The block.
+            points (int): The block's number of points.
+            first (float): Time of the block's oldest point, as a POSIX timestamp.
+            last (float): Time of the block's newest point, as a POSIX timestamp.
+            codec (int): The codec the block's columns are encoded with. Defaults to RAW.
+        """
+        with open(self.data, 'ab') as f:
+            offset = f.tell()
+            f.write(block)
+
+            # The index entry mustn't reach the disk before the block it points at.
+            f.flush()
+            os.fsync(f.fileno())
+
+        with open(self.index, 'ab') as f:
+            # Drop a partial entry left by a crash, so the entries that follow stay aligned.
+            if (partial := f.tell() % INDEX.size) != 0:
+                f.truncate(f.tell() - partial)
+                f.seek(0, os.SEEK_END)
+
+            entry = (offset, len(block), points, first, last, codec)
+            f.write(INDEX.pack(*entry))
+
+        self.blocks.append(entry)
+
+    def replace(self, block: bytes, points: int, first: float, last: float, codec: int = RAW) -> None:
+        """
+        Write the partition's files from scratch, holding a single block. The files are written under temporary names,
+        synced and then renamed into place, index last, so the partition's index only ever exists once it's complete.
+
+        Args:
+            block (bytes): The block.
+            points (int): The block's number of points.
+            first (float): Time of the block's oldest point, as a POSIX timestamp.
+            last (float): Time of the block's newest point, as a POSIX timestamp.
+            codec (int): The codec the block's columns are encoded with. Defaults to RAW.
+        """
+        entry = (0, len(block), points, first, last, codec)
+
+        for path, content in ((self.data, block), (self.index, INDEX.pack(*entry))):
+            with open(f'{path}.tmp', 'wb') as f:
+                f.write(content)
+                f.flush()
+                os.fsync(f.fileno())
+
+        os.replace(f'{self.data}.tmp', self.data)
+        os.replace(f'{self.index}.tmp', self.index)
+
+        # Sync the renames too, so they reach the disk before the files this partition supersedes are deleted.
+        directory = os.open(os.path.dirname(self.index) or '.', os.O_RDONLY)
+
+        try:
+            os.fsync(directory)
+        finally:
+            os.close(directory)
+
+        self.blocks = [entry]
+
+    def remove(self) -> None:
+        """
+        Delete the partition's files, along with any temporary files a crash left behind while they were replaced.
+        """
+        for path in (self.index, self.data, f'{self.index}.tmp', f'{self.data}.tmp'):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class Segments(TimeSeries):
+    """
+    Implement an interface to storing host metrics on disk, in a directory of append-only segment files, one per
+    time partition of `duration` seconds (see Segment).
+
+    Every write appends one block per partition it touches, so inserting never rewrites existing data. Retention
+    deletes the files of partitions that have entirely expired, and reads only the index entries of partitions and
+    blocks overlapping the queried time range, memory-mapping just those segment files. Opening the store reads the
+    partitions' small index files, not the points, so a restarted controller keeps its history without reloading it.
+
+    With compression, once points newer than a partition's end plus a fifth of a partition (a grace period for late
+    hosts) are written, the partition's blocks are merged into a single Gorilla-compressed block, which holds each
+    series' points of the whole partition. Points written to a partition after it was compacted are appended to it
+    uncompressed and merged in by compacting it again.
+
+    Every method touching the store is synchronized, which allows a single instance to be shared between threads.
+    Several processes may open the same directory, but only one should write to it.
+
+    Args:
+        retention (timedelta): How long points are kept.
+        path (str): Directory the segment files are stored in. Created if it doesn't exist.
+        duration (int): Length of a partition, in seconds. Defaults to 300.
+        compression (bool): Whether to compact partitions into Gorilla-compressed blocks. Defaults to True.
+    """
+
+    # Fraction of a partition past its end after which it's compacted, which leaves late hosts' points time to arrive.
+    GRACE = 0.2
+
+    def __init__(self, retention: timedelta, path: str, duration: int = 300, compression: bool = True) -> None:
+        self.retention: timedelta = retention
+        self.path = path
+        self.duration = duration
+        self.compression = compression
+
+        self._segments: Dict[int, Segment] | None = None
+
+        # Superseded generations of compacted partitions, left behind by a crash, which the writer deletes.
+        self._stale: List[Segment] = []
+
+        # Time of the newest point written, as a POSIX timestamp.
+        self._latest = 0.0
+
+        # Series keys decode to the same few measurements and tags over and over.
+        self._keys: Dict[bytes, Tuple[str, Dict[str, str]]] = {}
+
+    def is_connected(self) -> bool:
+        """
+        Check if the store is open.
+
+        Returns:
+            bool: True if the store is open.
+        """
+        return self._segments is not None
+
+    @synchronized
+    def open(self) -> None:
+        """
+        Open the store, reading the index of every partition in its directory.
+        """
+        os.makedirs(self.path, exist_ok=True)
+
+        generations: Dict[int, List[Segment]] = {}
+        segments: Dict[int, Segment] = {}
+        self._stale = []
+
+        for file in os.listdir(self.path):
+            stem, extension = os.path.splitext(file)
+
+            if temporary := extension == '.tmp':
+                stem, extension = os.path.splitext(stem)
+
+            start, _, generation = stem.partition('.')
+
+            if not start.isdigit() or not (generation.isdigit() or generation == ''):
+                continue
+
+            if extension != '.idx' and not (temporary and extension == '.seg'):
+                continue
+
+            segment = Segment(self.path, int(start), int(generation or 0))
+
+            # Left behind by a crash while compacting the partition.
+            if temporary:
+                self._stale.append(segment)
+                continue
+
+            generations.setdefault(segment.start, []).append(segment)
+
+        for partition, _generations in generations.items():
+            _generations.sort(key=lambda segment: segment.generation, reverse=True)
+
+            for segment in _generations:
+                segment.load()
+
+            # Only the newest generation of a partition holding a complete block is read. A newer generation without
+            # any can't have been compacted from the others, so it mustn't supersede them.
+            segments[partition] = next((segment for segment in _generations if segment.blocks), _generations[-1])
+            self._stale.extend(segment for segment in _generations if segment is not segments[partition])
+
+        self._segments = dict(sorted(segments.items()))
+
+        log.debug(f'Opened {len(self._segments)} time series segments in {self.path}')
+
+    @synchronized
+    def close(self) -> None:
+        """
+        Close the store. Blocks are flushed as they're written, so there's nothing left to write.
+        """
+        self._segments = None
+
+    def commit(self) -> None:
+        """
+        Commit any changes to the database. In this class' case, we do nothing since every write is appended to the
+        segment files right away.
+        """
+        return None
+
+    @staticmethod
+    def _time(time: datetime | float | int) -> float:
+        """
+        Convert a point's time to a POSIX timestamp.
+
+        Args:
+            time (datetime | float | int): The point's time, as a datetime or a POSIX timestamp.
+
+        Returns:
+            float: The POSIX timestamp.
+        """
+        if isinstance(time, datetime):
+            return time.timestamp()
+
+        return float(time)
+
+    @staticmethod
+    def _key(measurement: str, tags: Dict[str, str]) -> bytes:
+        """
+        Build the key of a series.
+
+        Args:
+            measurement (str): The series' measurement.
+            tags (Dict[str, str]): The series' tags.
+
+        Returns:
+            bytes: The series' key.
+        """
+        return json.dumps([measurement, tags], sort_keys=True, separators=(',', ':')).encode()
+
+    def _parse(self, key: bytes) -> Tuple[str, Dict[str, str]]:
+        """
+        Parse the key of a series.
+
+        Args:
+            key (bytes): The series' key.
+
+        Returns:
+            Tuple[str, Dict[str, str]]: The series' measurement and tags.
+        """
+        if (parsed := self._keys.get(key)) is None:
+            measurement, tags = json.loads(key)
+            parsed = self._keys[key] = (measurement, tags)
+
+        return parsed
+
+    def _write(self, points: Iterable[Tuple[str, Dict[str, str], float, Dict[str, int | float | None]]]) -> None:
+        """
+        Append points to the partitions they fall in, as one block per partition.
+
+        Args:
+            points (Iterable[Tuple[str, Dict[str, str], float, Dict[str, int | float | None]]]): Each point's
+                measurement, tags, time (as a POSIX timestamp) and fields. None fields are left out.
+        """
+        if self._segments is None:
+            raise ValueError('Time series store is not open')
+
+        # Points by partition, then by series.
+        partitions: Dict[int, Dict[bytes, List[Tuple[float, Dict[str, int | float | None]]]]] = {}
+
+        # Series keys by measurement and tags.
+        keys: Dict[Tuple[str, Tuple[Tuple[str, str], ...]], bytes] = {}
+
+        for measurement, tags, time, fields in points:
+            start = int(time // self.duration) * self.duration
+            _tags = (measurement, tuple(tags.items()))
+
+            if (key := keys.get(_tags)) is None:
+                key = keys[_tags] = self._key(measurement, tags)
+
+            partitions.setdefault(start, {}).setdefault(key, []).append((time, fields))
+
+        for start, series in partitions.items():
+            if (segment := self._segments.get(start)) is None:
+                segment = self._segments[start] = Segment(self.path, start)
+                self._segments = dict(sorted(self._segments.items()))
+
+            times = [time for _points in series.values() for time, _ in _points]
+            segment.append(Segment.encode(series), len(times), min(times), max(times))
+            self._latest = max(self._latest, max(times))
+
+        for segment in self._stale:
+            segment.remove()
+
+        self._stale.clear()
+
+        if self.compression:
+            for segment in list(self._segments.values()):
+                if segment.start + (1 + self.GRACE) * self.duration <= self._latest and any(block[5] == RAW for block in segment.blocks):
+                    self._compact(segment)
+
+        self._run_retention_policy()
+
+    def _compact(self, segment: Segment) -> None:
+        """
+        Merge the blocks of a partition into a single Gorilla-compressed block, written as its next generation.
+
+        Args:
+            segment (Segment): The partition.
+        """
+        if self._segments is None:
+            return None
+
+        series: Dict[bytes, List[Tuple[float, Dict[str, int | float]]]] = {}
+
+        with open(segment.data, 'rb') as f:
+            data = f.read()
+
+        for offset, length, _, _, _, codec in segment.blocks:
+            for key, count, header, body in Segment.decode(data[offset:offset + length], codec):
+                series.setdefault(key, []).extend(Segment.points(body, count, header, -inf, inf, codec))
+
+        compacted = Segment(self.path, segment.start, segment.generation + 1)
+
+        # Remove what a crash may have left of this generation before writing it.
+        compacted.remove()
+
+        if series:
+            times = [time for _points in series.values() for time, _ in _points]
+            block = Segment.encode(series, GORILLA)
+            compacted.replace(block, len(times), min(times), max(times), GORILLA)
+
+            log.debug(f'Compacted {len(segment.blocks)} blocks of {len(data)} bytes into one of {len(block)} bytes for the segment starting at {segment.start}')
+
+        segment.remove()
+        self._segments[segment.start] = compacted
+
+    @synchronized
+    def insert(self, data: Dict) -> None:
+        """
+        Insert a point into the metrics store.
+
+        Args:
+            data (Dict): a dictionary containing the data to insert.
+        """
+        self.insert_batch((data,))
+
+    @synchronized
+    def insert_batch(self, data: Tuple) -> None:
+        """
+        Insert a batch of points into the metrics store.
+
+        Args:
+            data (Tuple): a tuple of dictionaries containing the data to insert, in the schema documented on
+                DomainStats.to_tinyflux. Times may be datetimes or POSIX timestamps.
+        """
+        self._write(
+            (datum['measurement'], datum.get('tags', {}), self._time(datum['time']), datum['fields'])
+            for datum in data
+        )
+
+    @synchronized
+    def insert_records(self, records: Iterable[DomainRecord]) -> None:
+        """
+        Insert the points of a batch of domain records into the metrics store, straight from the records.
+
+        Args:
+            records (Iterable[DomainRecord]): the records to insert.
+        """
+        self._write(
+            (measurement, tags, record.time, fields)
+            for record in records
+            for tags in (record.tags(),)
+            for measurement, fields in record.measurements()
+        )
+
+    @synchronized
+    def clear(self) -> None:
+        """
+        Clear the metrics store of all data, deleting every partition's files.
+        """
+        if self._segments is None:
+            return None
+
+        for segment in [*self._segments.values(), *self._stale]:
+            segment.remove()
+
+        self._segments.clear()
+        self._stale.clear()
+
+    @synchronized
+    def _run_retention_policy(self) -> None:
+        """
+        Delete the files of partitions whose points are all older than the retention policy.
+        """
+        if self._segments is None:
+            return None
+
+        cutoff = now() - self.retention.total_seconds()
+        expired = [start for start in self._segments if start + self.duration <= cutoff]
+
+        for start in expired:
+            self._segments.pop(start).remove()
+
+        if expired:
+            log.debug(f'Retention removed {len(expired)} segments from the database, {len(self._segments)} remain')
+
+    @synchronized
+    def range(self,
+              measurement: str | None = None,
+              start: datetime | None = None,
+              stop: datetime | None = None,
+              tags: Dict[str, str | Tuple[str, ...]] | None = None) -> Tuple:
+        """
+        Get the points of the matching series in a time range, sorted by time.
+
+        Args:
+            measurement (str | None): The measurement to get points of. If None, points of every measurement are returned.
+            start (datetime | None): Time of the first point to get (inclusive). Defaults to the start of retention.
+            stop (datetime | None): Time of the last point to get (exclusive). Defaults to any time.
+            tags (Dict[str, str | Tuple[str, ...]] | None): Tags the points must have, by tag name: either a value, or a
+                tuple of values any of which matches. Defaults to None, i.e. any tags.
+
+        Returns:
+            Tuple: The points, in the schema documented on DomainStats.to_tinyflux.
+        """
+        if self._segments is None:
+            return tuple()
+
+        _start = start.timestamp() if start is not None else now() - self.retention.total_seconds()
+        _stop = stop.timestamp() if stop is not None else float('inf')
+
+        points: List[Tuple[float, str, Dict[str, str], Dict[str, int | float]]] = []
+
+        for segment in self._segments.values():
+            if segment.start + self.duration <= _start or segment.start >= _stop:
+                continue
+
+            blocks = [block for block in segment.blocks if block[4] >= _start and block[3] < _stop]
+
+            if not blocks:
+                continue
+
+            try:
+                with open(segment.data, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+                    # Only the overlapping blocks are copied out of the map.
+                    _blocks = [(mapped[offset:offset + length], codec) for offset, length, _, _, _, codec in blocks]
+            except FileNotFoundError:
+                # Expired or compacted by the process writing the store since this one opened it.
+                continue
+
+            for block, codec in _blocks:
+                for key, count, header, body in Segment.decode(block, codec):
+                    _measurement, _tags = self._parse(key)
+
+                    if measurement is not None and _measurement != measurement:
+                        continue
+
+                    if not match_tags(_tags, tags):
+                        continue
+
+                    for _time, _fields in Segment.points(body, count, header, _start, _stop, codec):
+                        points.append((_time, _measurement, _tags, _fields))
+
+        points.sort(key=lambda point: point[0])
+
+        return tuple(
+            {
+                'measurement': _measurement,
+                'time': datetime.fromtimestamp(_time, tz=timezone.utc),
+                'tags': dict(_tags),
+                'fields': _fields
+            } for _time, _measurement, _tags, _fields in points
+        )
+
+    def get_all(self, measurement: str | None = None) -> Tuple:
+        """
+        Get all the data in the metrics store.
+
+        Args:
+            measurement (str | None): the measurement to get data for. If None, all data is returned. (Default: None.)
+
+        Returns:
+            Tuple: all the data in the metrics store.
+        """
+        return self.range(measurement)
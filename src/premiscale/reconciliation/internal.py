@@ -8,7 +8,7 @@ from __future__ import annotations
 import logging
 
 from typing import TYPE_CHECKING
-from datetime import datetime, timezone
+from datetime import datetime, timedelta, timezone
 from time import sleep
 from setproctitle import setproctitle
 
@@ -16,6 +16,7 @@ from premiscale.metrics import (
     build_state_connection,
     build_timeseries_connection
 )
+from premiscale.metrics.timeseries._base import Query
 
 from premiscale.autoscaling.actions import (
     Verb,
@@ -33,7 +34,7 @@ if TYPE_CHECKING:
     from premiscale.config.v1alpha1 import Config
     from multiprocessing.queues import Queue
     from premiscale.autoscaling.actions import Action
-    from typing import List, Dict
+    from typing import List, Dict, Tuple
 
 
 log = logging.getLogger(__name__)
@@ -85,7 +86,9 @@ class Reconcile:
 
             # Reconcile metrics and state databases into queued actions to bring the ASG back into the desired state.
             with self.timeseries_database as timeseries, self.state_database as state:
-                ts = timeseries.get_all()
+                utilization = self._utilization(timeseries)
+
+            log.debug(f'Autoscaling group utilization over the last {self._config.controller.reconciliation.interval}s: {utilization}')
 
             reconciliation_run_end = datetime.now(timezone.utc)
 
@@ -98,6 +101,48 @@ class Reconcile:
                 log.debug(f'Sleeping for {self._config.controller.reconciliation.interval - reconciliation_duration}s')
                 sleep(self._config.controller.reconciliation.interval - reconciliation_duration)
 
+    def _utilization(self, timeseries: TimeSeries) -> Dict[str, Dict[str, float]]:
+        """
+        Get the mean utilization of each autoscaling group over the reconciliation interval from the rollups written by
+        collectors, rather than reading every stored point.
+
+        Each collector writes the running summary of its own hosts' share of a group, so the latest point of every
+        collector is merged into the group's mean.
+
+        Args:
+            timeseries (TimeSeries): An open connection to the time series database.
+
+        Returns:
+            Dict[str, Dict[str, float]]: Mean of each metric, by autoscaling group and metric name.
+        """
+        interval = self._config.controller.reconciliation.interval
+
+        aggregates = timeseries.query(
+            Query(
+                start=datetime.now(timezone.utc) - timedelta(seconds=interval),
+                measurement='asg_rollup',
+                fields=('sum', 'count'),
+                tags={'window': str(int(interval))},
+                group_by=('asg', 'metric', 'collector'),
+                aggregate='last'
+            )
+        )
+
+        # Sums and counts across collectors, by (autoscaling group, metric).
+        totals: Dict[Tuple[str, str], Dict[str, float]] = {}
+
+        for aggregate in aggregates:
+            key = (aggregate.tags.get('asg', ''), aggregate.tags.get('metric', ''))
+            totals.setdefault(key, {'sum': 0.0, 'count': 0.0})[aggregate.field] += aggregate.value
+
+        utilization: Dict[str, Dict[str, float]] = {}
+
+        for (asg, metric), total in totals.items():
+            if total['count'] > 0:
+                utilization.setdefault(asg, {})[metric] = round(total['sum'] / total['count'], 2)
+
+        return utilization
+
     # Actions to place on the autoscaling queue.
 
     def _create(self) -> None:
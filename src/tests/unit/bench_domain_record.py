@@ -0,0 +1,67 @@
+"""
+Benchmark the memory held by a collection cycle's worth of domains as DomainStats, as the DomainRecords they're
+written from, and as a columnar DomainStatsBatch, along with the point dictionaries DomainStats.to_influx() builds.
+The recorded records are replicated into as many domains as requested.
+
+Run from src/ with
+
+    python -m tests.unit.bench_domain_record [domains]
+"""
+
+
+from __future__ import annotations
+
+import gc
+import sys
+import tracemalloc
+
+from typing import Any, Callable, Tuple
+from premiscale.hypervisor.qemu_parser import DomainStatsParser
+from tests.unit.bench_qemu_parser import records
+from tests.unit.test_qemu_parser import ADDRESS, HOST
+
+
+def allocated(function: Callable[[], Any]) -> Tuple[Any, int]:
+    """
+    Measure the memory still allocated by a function's result once it returns.
+
+    Args:
+        function (Callable[[], Any]): The function.
+
+    Returns:
+        Tuple[Any, int]: The function's result, and the bytes allocated while building it that it holds on to.
+    """
+    gc.collect()
+    tracemalloc.start()
+
+    try:
+        result = function()
+        gc.collect()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+
+    return result, size
+
+
+def main(domains: int = 10_000) -> None:
+    host = records(domains)
+    parser = DomainStatsParser()
+
+    # Compile the parser's keys up front, so its table isn't counted against whichever representation is built first.
+    parser.parse_batch(HOST, host[:1])
+
+    stats, stats_size = allocated(lambda: [parser.parse(name, HOST, ADDRESS, _stats) for name, _stats in host])
+    _, records_size = allocated(lambda: [domain.to_record() for domain in stats])
+    _, batch_size = allocated(lambda: parser.parse_batch(HOST, host))
+    _, points_size = allocated(lambda: [point for domain in stats for point in domain.to_influx()])
+
+    print(f'{domains} domains')
+    print(f'DomainStats:        {stats_size / 2**20:8.2f} MiB ({stats_size / domains:6.0f} B/domain)')
+    print(f'DomainRecord:       {records_size / 2**20:8.2f} MiB ({records_size / domains:6.0f} B/domain, {stats_size / records_size:.1f}x smaller)')
+    print(f'DomainStatsBatch:   {batch_size / 2**20:8.2f} MiB ({batch_size / domains:6.0f} B/domain, {stats_size / batch_size:.1f}x smaller)')
+    print(f'to_influx() points: {points_size / 2**20:8.2f} MiB ({points_size / domains:6.0f} B/domain), on top of DomainStats')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,131 @@
+"""
+Benchmark Gorilla-compressed segment blocks against raw ones: bytes per point, and decode throughput. Blocks hold a
+partition's worth of collections of simulated domains, with jittered collection times, counters and gauges.
+
+Run from src/ with
+
+    python -m tests.unit.bench_gorilla [domains] [collections]
+"""
+
+
+from __future__ import annotations
+
+import random
+import sys
+
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+from math import inf
+from timeit import repeat
+from premiscale.metrics.timeseries.gorilla import (
+    decode_floats, decode_ints, decode_times, encode_floats, encode_ints, encode_times
+)
+from premiscale.metrics.timeseries.segments import GORILLA, RAW, Segment, Segments
+
+
+def series(domains: int, collections: int, interval: int = 10) -> Dict[bytes, List[Tuple[float, Dict[str, int | float]]]]:
+    """
+    Simulate the cpu and memory points of domains over consecutive collections.
+
+    Args:
+        domains (int): Number of domains.
+        collections (int): Number of collections.
+        interval (int): Seconds between collections. Defaults to 10.
+
+    Returns:
+        Dict[bytes, List[Tuple[float, Dict[str, int | float]]]]: Each series' points, as their time and fields, by
+            series key.
+    """
+    _random = random.Random(1)
+    start = 1_700_000_000
+    _series: Dict[bytes, List[Tuple[float, Dict[str, int | float]]]] = {}
+
+    for domain in range(domains):
+        tags = {'name': f'vm{domain}', 'host': 'tynan', 'state': '1', 'reason': '1'}
+        cpu = _random.randint(10**11, 10**12)
+        utilization = _random.uniform(0, 100)
+        cpu_points = _series.setdefault(Segments._key('cpu', tags), [])
+        memory_points = _series.setdefault(Segments._key('memory', tags), [])
+
+        for collection in range(collections):
+            # Collections are late by up to 20 ms.
+            time = start + interval * collection + _random.uniform(0, 0.02)
+            utilization = min(100.0, max(0.0, utilization + _random.gauss(0, 2)))
+            cpu += int(utilization * 4e7)
+
+            cpu_points.append((time, {
+                'cpu_time': cpu,
+                'vcpu_current': 4,
+                'vcpu_maximum': 4,
+                'cpu_utilization_percent': round(utilization, 2)
+            }))
+            memory_points.append((time, {'total_memory_utilization': round(_random.uniform(40, 60), 2)}))
+
+    return _series
+
+
+def best(function: Callable[[], Any], number: int = 5) -> float:
+    """
+    Time a function.
+
+    Args:
+        function (Callable[[], Any]): The function.
+        number (int): Number of runs. Defaults to 5.
+
+    Returns:
+        float: Seconds the fastest run took.
+    """
+    return min(repeat(function, number=1, repeat=number))
+
+
+def decode(block: bytes, codec: int) -> int:
+    """
+    Decode every point of a block.
+
+    Args:
+        block (bytes): The block.
+        codec (int): The codec the block's columns are encoded with.
+
+    Returns:
+        int: The number of points decoded.
+    """
+    return sum(
+        1
+        for _, count, header, body in Segment.decode(block, codec)
+        for _ in Segment.points(body, count, header, -inf, inf, codec)
+    )
+
+
+def main(domains: int = 1000, collections: int = 30) -> None:
+    _series = series(domains, collections)
+    points = sum(len(_points) for _points in _series.values())
+
+    print(f'{points} points ({domains} domains x 2 measurements x {collections} collections)')
+
+    for name, codec in (('raw', RAW), ('gorilla', GORILLA)):
+        block = Segment.encode(_series, codec)
+        seconds = best(lambda: decode(block, codec))
+
+        print(f'{name:8} {len(block) / points:6.1f} B/point, decode {points / seconds:12,.0f} points/s')
+
+    # Columns of one series, without the keys and headers every series of a block carries.
+    cpu = next(iter(_series.values()))
+    times = [time for time, _ in cpu]
+    counters = [fields['cpu_time'] for _, fields in cpu]
+    gauges = [fields['cpu_utilization_percent'] for _, fields in cpu]
+
+    # Name, encoder, decoder and values of each column.
+    columns: List[Tuple[str, Callable[[Any], bytes], Callable[[bytes, int], Iterator[Any]], List[Any]]] = [
+        ('times', encode_times, decode_times, times),
+        ('counters', encode_ints, decode_ints, counters),
+        ('gauges', encode_floats, decode_floats, gauges),
+    ]
+
+    for name, encode, _decode, column in columns:
+        data = encode(column)
+        seconds = best(lambda: list(_decode(data, len(column))))
+
+        print(f'{name:8} {len(data) / len(column):6.2f} B/value (raw 8), decode {len(column) / seconds:12,.0f} values/s')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:3]))
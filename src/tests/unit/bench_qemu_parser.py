@@ -0,0 +1,69 @@
+"""
+Benchmark parsing a host's getAllDomainStats records with DomainStatsParser against the cattrs-based parser it
+replaced. The recorded records are replicated into as many domains as requested.
+
+Run from src/ with
+
+    python -m tests.unit.bench_qemu_parser [domains]
+"""
+
+
+from __future__ import annotations
+
+import sys
+
+from typing import Any, Callable, Dict, List, Tuple
+from timeit import repeat
+from premiscale.hypervisor.qemu_parser import DomainStatsParser
+from tests.unit.test_qemu_parser import ADDRESS, HOST, cattrs_parse, load_records
+
+
+def records(domains: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Replicate the recorded records into a host's worth of domains.
+
+    Args:
+        domains (int): Number of domains.
+
+    Returns:
+        List[Tuple[str, Dict[str, Any]]]: Each domain's name and record.
+    """
+    recorded = load_records()
+
+    return [
+        (f'{name}-{index}', dict(stats))
+        for index in range(-(-domains // len(recorded)))
+        for name, stats in recorded
+    ][:domains]
+
+
+def best(function: Callable[[], Any], number: int = 5) -> float:
+    """
+    Time a function.
+
+    Args:
+        function (Callable[[], Any]): The function.
+        number (int): Number of runs. Defaults to 5.
+
+    Returns:
+        float: Milliseconds the fastest run took.
+    """
+    return 1000 * min(repeat(function, number=1, repeat=number))
+
+
+def main(domains: int = 200) -> None:
+    host = records(domains)
+    parser = DomainStatsParser()
+
+    cattrs = best(lambda: [cattrs_parse(name, HOST, ADDRESS, stats) for name, stats in host])
+    parse = best(lambda: [parser.parse(name, HOST, ADDRESS, stats) for name, stats in host])
+    batch = best(lambda: parser.parse_batch(HOST, host))
+
+    print(f'{domains} domains, {sum(len(stats) for _, stats in host)} keys')
+    print(f'cattrs:                          {cattrs:8.2f} ms')
+    print(f'DomainStatsParser.parse:         {parse:8.2f} ms ({cattrs / parse:.1f}x)')
+    print(f'DomainStatsParser.parse_batch:   {batch:8.2f} ms ({cattrs / batch:.1f}x)')
+
+
+if __name__ == '__main__':
+    main(*(int(arg) for arg in sys.argv[1:2]))
@@ -0,0 +1,135 @@
+"""
+Check that the CircuitBreaker opens after consecutive failures, lets exactly one probe through once its backoff has
+elapsed, and doubles its backoff every time a probe fails.
+"""
+
+
+from __future__ import annotations
+
+from premiscale.hypervisor.breaker import CircuitBreaker
+
+
+class Clock:
+    """
+    A monotonic clock that only moves when told to.
+    """
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def breaker(clock: Clock, **kwargs) -> CircuitBreaker:
+    return CircuitBreaker('tynan', backoff=30, max_backoff=100, jitter=0, clock=clock, **kwargs)
+
+
+def test_opens_after_failure_threshold() -> None:
+    clock = Clock()
+    _breaker = breaker(clock, failure_threshold=3)
+
+    _breaker.failure()
+    _breaker.failure()
+
+    assert _breaker.state == CircuitBreaker.CLOSED
+    assert _breaker.allow()
+
+    _breaker.failure()
+
+    assert _breaker.state == CircuitBreaker.OPEN
+    assert not _breaker.ready()
+    assert not _breaker.allow()
+    assert _breaker.retry_in() == 30
+
+
+def test_success_resets_consecutive_failures() -> None:
+    clock = Clock()
+    _breaker = breaker(clock, failure_threshold=2)
+
+    _breaker.failure()
+    _breaker.success()
+    _breaker.failure()
+
+    assert _breaker.state == CircuitBreaker.CLOSED
+
+
+def test_single_probe_once_backoff_elapsed() -> None:
+    clock = Clock()
+    _breaker = breaker(clock)
+    _breaker.failure()
+    clock.now = 30
+
+    assert _breaker.state == CircuitBreaker.HALF_OPEN
+    assert _breaker.ready()
+    assert _breaker.retry_in() == 0
+
+    # The first caller is the probe; everyone else waits for its outcome.
+    assert _breaker.allow()
+    assert not _breaker.allow()
+    assert not _breaker.ready()
+
+    _breaker.success()
+
+    assert _breaker.state == CircuitBreaker.CLOSED
+    assert _breaker.allow()
+
+
+def test_failed_probes_double_backoff_up_to_max() -> None:
+    clock = Clock()
+    _breaker = breaker(clock)
+    _breaker.failure()
+
+    for backoff in (60, 100, 100):
+        clock.now += _breaker.retry_in()
+
+        assert _breaker.allow()
+
+        _breaker.failure()
+
+        assert _breaker.retry_in() == backoff
+
+    # Closing the breaker starts the next backoff over from the first.
+    clock.now += _breaker.retry_in()
+    _breaker.allow()
+    _breaker.success()
+    _breaker.failure()
+
+    assert _breaker.retry_in() == 30
+
+
+def test_straggling_failure_does_not_extend_backoff() -> None:
+    clock = Clock()
+    _breaker = breaker(clock)
+    _breaker.failure()
+    clock.now = 10
+    _breaker.failure()
+
+    assert _breaker.retry_in() == 20
+
+
+def test_lost_probe_is_retried_after_max_backoff() -> None:
+    clock = Clock()
+    _breaker = breaker(clock)
+    _breaker.failure()
+    clock.now = 30
+
+    assert _breaker.allow()
+
+    # The probe never reports back.
+    clock.now = 129
+
+    assert not _breaker.allow()
+
+    clock.now = 130
+
+    assert _breaker.allow()
+
+
+def test_jitter_only_lengthens_backoff() -> None:
+    clock = Clock()
+
+    for _ in range(20):
+        _breaker = CircuitBreaker('tynan', backoff=30, jitter=0.1, clock=clock)
+        _breaker.failure()
+
+        assert 30 <= _breaker.retry_in() <= 33
@@ -0,0 +1,136 @@
+"""
+Check that the DeadbandFilter suppresses measurements while they stay within the deadband of their last written
+values, and writes them once they move out of it, their domain's state changes, or they've been silent for too long.
+"""
+
+
+from __future__ import annotations
+
+from typing import List
+from premiscale.hypervisor.qemu_data import DomainRecord
+from premiscale.metrics.deadband import DeadbandFilter
+
+
+def record(time: float,
+           memory: int = 50,
+           utilization: float | None = 10.0,
+           state: int = 1,
+           name: str = 'vm0',
+           net: int | None = None) -> DomainRecord:
+    return DomainRecord(
+        name=name,
+        host='tynan',
+        time=time,
+        state=state,
+        reason=1,
+        cpu_time=10**12,
+        cpu_user=0,
+        cpu_system=0,
+        vcpu_current=2,
+        vcpu_maximum=2,
+        balloon_current=memory,
+        balloon_maximum=100,
+        cpu_utilization=utilization,
+        net_count=net
+    )
+
+
+def apply(deadband: DeadbandFilter, *records: DomainRecord) -> List[DomainRecord]:
+    return list(deadband.apply(records))
+
+
+def written(_record: DomainRecord) -> List[str]:
+    return [measurement for measurement, _ in _record.measurements()]
+
+
+def test_first_record_is_written() -> None:
+    deadband = DeadbandFilter()
+    first, = apply(deadband, record(0))
+
+    assert first.suppressed == frozenset()
+    assert written(first) == ['cpu', 'memory']
+    assert deadband.emitted == 2
+
+
+def test_unchanged_measurements_are_suppressed() -> None:
+    deadband = DeadbandFilter(relative=0.1)
+    apply(deadband, record(0, memory=50, utilization=10.0))
+
+    # Memory moved by 4% of its last written value, CPU utilization by 20%.
+    second, = apply(deadband, record(10, memory=52, utilization=12.0))
+
+    assert second.suppressed == frozenset({'memory'})
+    assert written(second) == ['cpu']
+    assert 'memory' not in second.to_line_protocol()
+    assert deadband.suppressed == 1
+
+
+def test_slow_drift_is_written_once_it_adds_up() -> None:
+    deadband = DeadbandFilter(relative=0.1)
+    apply(deadband, record(0, memory=50))
+
+    # Each step is within the deadband of the previous one, but not of the value last written.
+    suppressed = [
+        'memory' in _record.suppressed for _record in apply(deadband, *(record(10 * step, memory=50 + 2 * step) for step in range(1, 5)))
+    ]
+
+    assert suppressed == [True, True, False, True]
+
+
+def test_absolute_threshold() -> None:
+    deadband = DeadbandFilter(absolute=5, relative=0)
+    apply(deadband, record(0, utilization=10.0))
+    second, third = apply(deadband, record(10, utilization=15.0), record(20, utilization=15.5))
+
+    assert 'cpu' in second.suppressed
+    assert 'cpu' not in third.suppressed
+
+
+def test_missing_value_counts_as_change() -> None:
+    deadband = DeadbandFilter()
+    apply(deadband, record(0, utilization=None))
+    second, third = apply(deadband, record(10, utilization=None), record(20, utilization=10.0))
+
+    assert 'cpu' in second.suppressed
+    assert 'cpu' not in third.suppressed
+
+
+def test_new_values_count_as_change() -> None:
+    deadband = DeadbandFilter()
+    apply(deadband, record(0, net=1))
+
+    # The interface's rates are known from the domain's second collection on.
+    second = record(10, net=1)
+    second.net_rates = (('vnet0', 0.0, 0.0, 0.0),)
+    apply(deadband, second)
+
+    assert 'net' not in second.suppressed
+
+
+def test_state_change_is_written() -> None:
+    deadband = DeadbandFilter()
+    apply(deadband, record(0, state=1))
+    second, = apply(deadband, record(10, state=3))
+
+    assert second.suppressed == frozenset()
+
+
+def test_max_silence() -> None:
+    deadband = DeadbandFilter(max_silence=30)
+    apply(deadband, record(0))
+    suppressed = [_record.suppressed for _record in apply(deadband, record(10), record(20), record(30))]
+
+    assert suppressed == [frozenset({'cpu', 'memory'}), frozenset({'cpu', 'memory'}), frozenset()]
+
+
+def test_vanished_domains_are_forgotten() -> None:
+    deadband = DeadbandFilter(max_silence=30)
+    apply(deadband, record(0, name='vm0'), record(0, name='vm1'))
+    apply(deadband, record(50, name='vm1'))
+
+    assert len(deadband) == 4
+
+    # The filter sweeps once per max_silence, and vm0 hasn't been written for twice max_silence.
+    apply(deadband, record(80, name='vm1'))
+
+    assert len(deadband) == 2
@@ -0,0 +1,125 @@
+"""
+Check that DomainRecords, whether reduced from DomainStats or yielded by a DomainStatsBatch, are written with exactly
+the fields and field types DomainStats.to_influx() and to_tinyflux() produce.
+"""
+
+
+from __future__ import annotations
+
+import pickle
+import re
+
+from typing import Dict, List, Tuple, cast
+from queue import Queue
+from datetime import datetime, timezone
+from attrs import evolve
+from influxdb_client import Point
+from premiscale.hypervisor.qemu_data import DomainRecord, DomainStats
+from premiscale.hypervisor.qemu_parser import DomainStatsParser
+from premiscale.metrics.sink import Sink
+from premiscale.metrics.timeseries.influxdb import WRITE_PRECISION
+from tests.unit.test_qemu_parser import ADDRESS, HOST, load_records
+
+
+# Splits line protocol on the commas, equal signs and spaces that aren't escaped with a backslash.
+UNESCAPED = r'(?<!\\)'
+
+
+def parse_line(line: str) -> Tuple[str, Dict[str, str], Dict[str, type], int]:
+    """
+    Parse a line of InfluxDB line protocol.
+
+    Args:
+        line (str): The line.
+
+    Returns:
+        Tuple[str, Dict[str, str], Dict[str, type], int]: The line's measurement, tags, the type each field is written
+            as (integers carry an 'i' suffix, everything else is a float) and timestamp.
+    """
+    series, fields, timestamp = re.split(f'{UNESCAPED} ', line)
+    measurement, *tags = re.split(f'{UNESCAPED},', series)
+    types: Dict[str, type] = {}
+
+    for field in re.split(f'{UNESCAPED},', fields):
+        key, value = re.split(f'{UNESCAPED}=', field)
+        types[key] = int if value.endswith('i') else float
+
+    return measurement, dict(re.split(f'{UNESCAPED}=', tag) for tag in tags), types, int(timestamp)
+
+
+def parse_lines(lines: str) -> List[Tuple[str, Dict[str, str], Dict[str, type], int]]:
+    return [parse_line(line) for line in lines.splitlines()]
+
+
+def domains() -> List[DomainStats]:
+    """
+    Parse the recorded domains, along with copies that are missing a stats group, or the balloon's maximum, which
+    makes their memory utilization an integer rather than a float.
+
+    Returns:
+        List[DomainStats]: The domains' stats.
+    """
+    parser = DomainStatsParser()
+    _domains: List[DomainStats] = []
+
+    for name, stats in load_records():
+        domain = parser.parse(name, HOST, ADDRESS, stats)
+
+        _domains += [
+            domain,
+            evolve(domain, balloon_maximum=None),
+            evolve(domain, cpu_time=None),
+            evolve(domain, net_count=None, net=[]),
+            evolve(domain, block_count=None, block=[]),
+        ]
+
+    return _domains
+
+
+def test_line_protocol_matches_influx() -> None:
+    for domain in domains():
+        expected = parse_lines(
+            '\n'.join(Point.from_dict(point, write_precision=WRITE_PRECISION).to_line_protocol() for point in domain.to_influx())
+        )
+
+        assert parse_lines(domain.to_record().to_line_protocol()) == expected
+
+
+def test_measurements_match_tinyflux() -> None:
+    for domain in domains():
+        expected = [(point['measurement'], point['fields']) for point in domain.to_tinyflux()]
+        measurements = list(domain.to_record().measurements())
+
+        assert measurements == expected
+
+        # An int/float change would conflict with a field's type in InfluxDB, and == doesn't tell 100 from 100.0.
+        for (_, fields), (_, _fields) in zip(measurements, expected):
+            assert {key: type(value) for key, value in fields.items()} == {key: type(value) for key, value in _fields.items()}
+
+
+def test_batch_records_match_domains() -> None:
+    parser = DomainStatsParser()
+    records = load_records()
+    batch = parser.parse_batch(HOST, records)
+
+    for record, (name, stats) in zip(batch.records(), records):
+        domain = parser.parse(name, HOST, ADDRESS, stats)
+        _record: DomainRecord = evolve(record, time=cast(datetime, domain.time).timestamp())
+
+        assert _record == domain.to_record()
+        assert _record.to_line_protocol() == domain.to_record().to_line_protocol()
+
+
+def test_pickled_batch_points_match_domains() -> None:
+    parser = DomainStatsParser()
+    records = load_records()
+
+    # A batch crosses a process boundary pickled, when it's forwarded to a Writer.
+    batch = pickle.loads(pickle.dumps(parser.parse_batch(HOST, records)))
+    sink = Sink(None, 'memory', forward=Queue())
+
+    for record, (name, stats) in zip(batch.records(), records):
+        domain = parser.parse(name, HOST, ADDRESS, stats)
+        domain.time = datetime.fromtimestamp(record.time, tz=timezone.utc)
+
+        assert sink._points([record]) == list(domain.to_tinyflux())
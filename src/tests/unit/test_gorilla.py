@@ -0,0 +1,179 @@
+"""
+Check that Gorilla-compressed columns round-trip: timestamps to the microsecond, floats bit for bit and integers
+exactly, over fixed edge cases and seeded random sequences.
+"""
+
+
+from __future__ import annotations
+
+import random
+
+from typing import List, Sequence
+from array import array
+from math import inf, nan
+from pytest import mark
+from premiscale.metrics.timeseries.gorilla import (
+    RESOLUTION, BitReader, BitWriter, decode_floats, decode_ints, decode_times, decode_varint, encode_floats,
+    encode_ints, encode_times, encode_varint, unzigzag, zigzag
+)
+
+
+SEEDS = range(20)
+
+
+def bits(values: Sequence[float]) -> bytes:
+    """
+    Get the bits of floats, which tell apart NaNs, 0.0 and -0.0 where == doesn't.
+
+    Args:
+        values (Sequence[float]): The values.
+
+    Returns:
+        bytes: The values' bits.
+    """
+    return array('d', values).tobytes()
+
+
+def round_trip_times(times: Sequence[float]) -> None:
+    assert list(decode_times(encode_times(times), len(times))) == [round(time * RESOLUTION) / RESOLUTION for time in times]
+
+
+def round_trip_floats(values: Sequence[float]) -> None:
+    assert bits(list(decode_floats(encode_floats(values), len(values)))) == bits(values)
+
+
+def round_trip_ints(values: Sequence[int]) -> None:
+    assert list(decode_ints(encode_ints(values), len(values))) == list(values)
+
+
+def test_empty_columns() -> None:
+    for encode, decode in ((encode_times, decode_times), (encode_floats, decode_floats), (encode_ints, decode_ints)):
+        assert encode([]) == b''
+        assert list(decode(b'', 0)) == []
+
+
+def test_bit_stream() -> None:
+    lengths = [1, 7, 64, 3, 64, 13, 1, 120]
+    values = [random.Random(length).getrandbits(length) for length in lengths]
+    writer = BitWriter()
+
+    for value, length in zip(values, lengths):
+        writer.write(value, length)
+
+    reader = BitReader(writer.getvalue())
+
+    assert [reader.read(length) for length in lengths] == values
+
+
+@mark.parametrize('value', [0, 1, -1, 2**63 - 1, -2**63, 2**64, -2**70 - 3])
+def test_zigzag(value: int) -> None:
+    assert zigzag(value) >= 0
+    assert unzigzag(zigzag(value)) == value
+
+
+@mark.parametrize('value', [0, 1, 0x7F, 0x80, 2**64 - 1, 2**64, 2**100 + 1])
+def test_varint(value: int) -> None:
+    buffer = bytearray(b'\xff')
+    encode_varint(value, buffer)
+
+    assert decode_varint(bytes(buffer), 1) == (value, len(buffer))
+
+
+def test_times_steady_interval() -> None:
+    times = [1_700_000_000.0 + 10 * index for index in range(100)]
+
+    round_trip_times(times)
+
+    # Every timestamp after the second costs a single bit.
+    assert len(encode_times(times)) <= 8 + 9 + 13
+
+
+@mark.parametrize('seed', SEEDS)
+def test_times_jitter(seed: int) -> None:
+    _random = random.Random(seed)
+    start = _random.uniform(0, 2_000_000_000)
+    interval = _random.choice((1, 10, 60, 300))
+
+    # Collections are late by up to a second, and hosts sometimes skip one or several.
+    times = sorted(start + interval * index + _random.uniform(0, 1) for index in range(_random.randint(1, 200)) if _random.random() > 0.05)
+
+    round_trip_times(times)
+
+
+def test_times_buckets() -> None:
+    start = 1_700_000_000.0
+    times = [start]
+
+    # Delta-of-deltas filling every bucket, in both directions, including the full 64 bit one.
+    for change in (0, 1e-6, -1e-6, 1e-4, -1e-3, 1e-2, 0.5, -0.5, 100.0, 1e6, -1e6, 1e9):
+        times.append(times[-1] + (times[-1] - times[-2] if len(times) > 1 else 0) + change + 1)
+
+    round_trip_times(times)
+    round_trip_times([0.0])
+    round_trip_times([-1.5, 0.0, 1.5])
+
+
+def test_floats_special_values() -> None:
+    round_trip_floats([0.0, -0.0, 0.0, inf, -inf, nan, nan, -nan, 1.0, -0.0, nan, inf])
+    round_trip_floats([-0.0])
+    round_trip_floats([nan])
+
+    # A NaN with a payload isn't folded into the canonical NaN.
+    payload = array('d')
+    payload.frombytes((0x7FF0_0000_0000_0001).to_bytes(8, 'little'))
+
+    round_trip_floats([1.0, payload[0], 1.0])
+
+
+def test_floats_extremes() -> None:
+    round_trip_floats([5e-324, 1.7976931348623157e308, -5e-324, 2.2250738585072014e-308, 1.0])
+
+
+@mark.parametrize('seed', SEEDS)
+def test_floats_random(seed: int) -> None:
+    _random = random.Random(seed)
+    gauge = _random.uniform(0, 100)
+    values: List[float] = []
+
+    for _ in range(_random.randint(1, 300)):
+        match _random.randrange(6):
+            case 0:
+                values.append(nan)
+            case 1:
+                # Arbitrary bit patterns, e.g. subnormals and NaNs with payloads.
+                _values = array('d')
+                _values.frombytes(_random.getrandbits(64).to_bytes(8, 'little'))
+                values.append(_values[0])
+            case 2:
+                values.append(values[-1] if values else 0.0)
+            case _:
+                gauge = min(100.0, max(0.0, gauge + _random.gauss(0, 2)))
+                values.append(round(gauge, 2))
+
+    round_trip_floats(values)
+
+
+def test_ints_beyond_64_bits() -> None:
+    round_trip_ints([2**64 - 1, 0, 2**64 - 1, 2**70, -2**70, 2**128 + 7, -1])
+    round_trip_ints([-2**63, 2**63 - 1])
+
+
+@mark.parametrize('seed', SEEDS)
+def test_ints_random(seed: int) -> None:
+    _random = random.Random(seed)
+    counter = _random.getrandbits(48)
+    values: List[int] = []
+
+    for _ in range(_random.randint(1, 300)):
+        match _random.randrange(5):
+            case 0:
+                # A counter reset, e.g. after the domain restarted.
+                counter = 0
+            case 1:
+                counter = _random.getrandbits(_random.choice((8, 32, 64, 80))) * _random.choice((1, -1))
+            case _:
+                counter += _random.getrandbits(24)
+
+        values.append(counter)
+
+    round_trip_ints(values)
@@ -0,0 +1,97 @@
+"""
+Check that the ConnectionPool only evicts connections that are idle and not checked out.
+"""
+
+
+from __future__ import annotations
+
+from typing import List
+from time import sleep
+from premiscale.config.v1alpha1 import Host
+from premiscale.hypervisor import pool as _pool
+from premiscale.hypervisor.pool import ConnectionPool
+
+
+class Connection:
+    """
+    A stand-in for a Libvirt connection that's always alive until it's closed.
+    """
+
+    # Every connection opened, oldest first.
+    opened: List[Connection] = []
+
+    def __init__(self, host: Host, readonly: bool = True) -> None:
+        self.name = host.name
+        self.closed = False
+        self.breaker = None
+        Connection.opened.append(self)
+
+    def set_keepalive(self, interval: int, count: int) -> None:
+        return None
+
+    def open(self) -> Connection:
+        return self
+
+    def is_alive(self) -> bool:
+        return not self.closed
+
+    def is_connected(self) -> bool:
+        return not self.closed
+
+    def close(self) -> None:
+        self.closed = True
+
+
+def host(name: str = 'tynan') -> Host:
+    return Host(name=name, address='10.0.0.102', protocol='ssh', port=22, hypervisor='qemu', user='root')
+
+
+def test_evicts_idle_connections(monkeypatch) -> None:
+    monkeypatch.setattr(_pool, 'build_hypervisor_connection', Connection)
+    pool = ConnectionPool(keepalive=0, idle_timeout=1)
+
+    with pool.connection(host()):
+        connection = Connection.opened[-1]
+
+    assert pool.evict_idle() == 0
+
+    monkeypatch.setattr(_pool, 'monotonic', lambda: 1e12)
+
+    assert pool.evict_idle() == 1
+    assert connection.closed
+    assert len(pool) == 0
+
+
+def test_keeps_checked_out_connections(monkeypatch) -> None:
+    monkeypatch.setattr(_pool, 'build_hypervisor_connection', Connection)
+    pool = ConnectionPool(keepalive=0, idle_timeout=1)
+
+    with pool.connection(host()) as first, pool.connection(host()) as second:
+        connection = Connection.opened[-1]
+
+        assert first is second
+
+        # Both visits outlast the idle timeout.
+        monkeypatch.setattr(_pool, 'monotonic', lambda: 1e12)
+
+        assert pool.evict_idle() == 0
+        assert not connection.closed
+
+    # Returned to the pool, the connection is idle once it goes unused for the idle timeout.
+    monkeypatch.setattr(_pool, 'monotonic', lambda: 2e12)
+
+    assert pool.evict_idle() == 1
+    assert connection.closed
+
+
+def test_idle_timeout_disabled(monkeypatch) -> None:
+    monkeypatch.setattr(_pool, 'build_hypervisor_connection', Connection)
+    pool = ConnectionPool(keepalive=0, idle_timeout=0)
+
+    with pool.connection(host()):
+        pass
+
+    sleep(0.01)
+
+    assert pool.evict_idle() == 0
+    assert len(pool) == 1
@@ -0,0 +1,165 @@
+"""
+Check that DomainStatsParser parses getAllDomainStats records exactly like the cattrs-based parser it replaced.
+"""
+
+
+from __future__ import annotations
+
+import json
+import re
+
+from typing import Any, Dict, List, Tuple
+from pathlib import Path
+from datetime import datetime, timezone
+from attrs import fields
+from cattrs import structure
+from premiscale.hypervisor.qemu_data import DomainStats
+from premiscale.hypervisor.qemu_parser import DomainStatsParser
+
+
+# getAllDomainStats records of two domains, reconstructed from the stats recorded in _-getHostVMStats.dict.
+RECORDS = Path(__file__).parents[1] / 'data' / 'metrics' / 'getAllDomainStats.json'
+
+HOST = 'tynan'
+ADDRESS = '10.0.0.102'
+
+
+def load_records() -> List[Tuple[str, Dict[str, Any]]]:
+    """
+    Load the recorded getAllDomainStats records.
+
+    Returns:
+        List[Tuple[str, Dict[str, Any]]]: Each domain's name and record.
+    """
+    with open(RECORDS, 'r', encoding='utf-8') as f:
+        return [(domain['name'], domain['stats']) for domain in json.load(f)]
+
+
+def cattrs_parse(name: str, host: str, address: str, stats: Dict[str, Any]) -> DomainStats:
+    """
+    Parse a record the way Qemu._getVMStats did before DomainStatsParser.
+
+    Args:
+        name (str): The domain's name.
+        host (str): The name of the host the domain runs on.
+        address (str): The address of the host the domain runs on.
+        stats (Dict[str, Any]): The domain's getAllDomainStats record.
+
+    Returns:
+        DomainStats: The domain's stats.
+    """
+    middle_number = re.compile(r'^(vcpu|block|net)_[0-9]+_')
+
+    stat = dict(stats)
+    stat['name'] = name
+
+    domain_stats_filtered: Dict[str, Any] = {}
+    vcpus: List[Dict[str, int]] = []
+    blocks: List[Dict[str, int]] = []
+    nets: List[Dict[str, int]] = []
+
+    for key in list(stat.keys()):
+        value = stat.pop(key)
+        key = key.replace('-', '_').replace('.', '_')
+        stat[key] = value
+
+        if key.startswith('vcpu_') and key not in ('vcpu_current', 'vcpu_maximum'):
+            index = int(key.split('_')[1])
+            vcpus.extend([{}] * (index - len(vcpus) + 1))
+            vcpus[index][re.sub(middle_number, '', key)] = value
+        elif key.startswith('block_') and key != 'block_count':
+            index = int(key.split('_')[1])
+            blocks.extend([{}] * (index - len(blocks) + 1))
+            blocks[index][re.sub(middle_number, '', key)] = value
+        elif key.startswith('net_') and key != 'net_count':
+            index = int(key.split('_')[1])
+            nets.extend([{}] * (index - len(nets) + 1))
+            nets[index][re.sub(middle_number, '', key)] = value
+        else:
+            domain_stats_filtered[key] = value
+
+    domain_stats_filtered['vcpu'] = vcpus
+    domain_stats_filtered['block'] = blocks
+    domain_stats_filtered['net'] = nets
+    domain_stats_filtered['host'] = host
+    domain_stats_filtered['address'] = address
+
+    return structure(domain_stats_filtered, DomainStats)
+
+
+def without_time(stats: DomainStats) -> Dict[str, Any]:
+    """
+    Get a DomainStats' fields, except for the collection time, which is set when a DomainStats is built.
+
+    Args:
+        stats (DomainStats): The stats.
+
+    Returns:
+        Dict[str, Any]: The stats' fields by name.
+    """
+    return {field.name: getattr(stats, field.name) for field in fields(DomainStats) if field.name != 'time'}
+
+
+def test_parse_matches_cattrs() -> None:
+    parser = DomainStatsParser()
+
+    for name, stats in load_records():
+        expected = without_time(cattrs_parse(name, HOST, ADDRESS, stats))
+        parsed = without_time(parser.parse(name, HOST, ADDRESS, stats))
+
+        assert parsed.keys() == expected.keys()
+
+        for field, value in expected.items():
+            assert parsed[field] == value, field
+
+            # An int/float change would conflict with a field's type in InfluxDB.
+            assert type(parsed[field]) is type(value), field
+
+
+def test_parse_reuses_compiled_keys() -> None:
+    parser = DomainStatsParser()
+    (first, first_stats), (second, second_stats) = load_records()
+
+    parser.parse(first, HOST, ADDRESS, first_stats)
+    compiled = len(parser)
+
+    # Domains report the same keys, so parsing another domain doesn't compile any new ones.
+    parser.parse(second, HOST, ADDRESS, second_stats)
+
+    assert len(parser) == compiled
+
+
+def test_parse_drops_unknown_keys() -> None:
+    parser = DomainStatsParser()
+    name, stats = load_records()[0]
+
+    parsed = parser.parse(name, HOST, ADDRESS, {**stats, 'cpu.unknown': 1, 'net.0.unknown': 1, 'vcpu.0.unknown': 1})
+
+    assert without_time(parsed) == without_time(parser.parse(name, HOST, ADDRESS, stats))
+
+
+def test_parse_skips_incomplete_devices() -> None:
+    name, stats = load_records()[0]
+    parsed = DomainStatsParser().parse(name, HOST, ADDRESS, {key: value for key, value in stats.items() if key != 'block.0.capacity'})
+
+    assert parsed.block == []
+    assert len(parsed.net) == 1
+    assert len(parsed.vcpu) == 12
+
+
+def test_table_is_bounded() -> None:
+    parser = DomainStatsParser(max_keys=10)
+    name, stats = load_records()[0]
+
+    parser.parse(name, HOST, ADDRESS, stats)
+
+    assert len(parser) <= 10
+
+
+def test_records_are_stamped_with_their_collection_time() -> None:
+    parser = DomainStatsParser()
+    records = load_records()
+
+    # Records served from a connection's stats cache were collected before they're parsed.
+    assert all(parser.parse(name, HOST, ADDRESS, stats, 1_700_000_000).time == datetime(2023, 11, 14, 22, 13, 20, tzinfo=timezone.utc) for name, stats in records)
+    assert set(parser.parse_batch(HOST, records, timestamp=1_700_000_000).time) == {1_700_000_000}
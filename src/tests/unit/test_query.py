@@ -0,0 +1,293 @@
+"""
+Check the aggregates the in-memory and on-disk backends compute for Queries against hand-computed ones, and the Flux
+and parameters InfluxDB.query pushes down to the server.
+"""
+
+
+from __future__ import annotations
+
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Tuple, cast
+from datetime import datetime, timedelta, timezone
+from time import time
+from pytest import approx, fixture, raises
+from influxdb_client.client.flux_table import FluxRecord, FluxTable
+from premiscale.config.v1alpha1 import Connection, DatabaseCredentials, TimeSeries as TimeSeriesConfig
+from premiscale.metrics.timeseries._base import Aggregate, Query, TimeSeries
+from premiscale.metrics.timeseries.influxdb import InfluxDB
+from premiscale.metrics.timeseries.local import Local
+from premiscale.metrics.timeseries.ringbuffer import RingBuffer
+from premiscale.metrics.timeseries.segments import Segments
+
+if TYPE_CHECKING:
+    from influxdb_client import QueryApi as QueryApiType
+
+
+# Start of the points, aligned to their windows and recent enough to be within every backend's retention.
+START = int(time()) // 300 * 300 - 3600
+
+# (offset from START, domain, host, utilization) of each cpu point.
+CPU = (
+    (0, 'vm0', 'tynan', 10),
+    (10, 'vm1', 'tynan', 50),
+    (20, 'vm2', 'other', 100),
+    (30, 'vm0', 'tynan', 20),
+    (60, 'vm0', 'tynan', 30),
+    (70, 'vm1', 'tynan', 70),
+    (90, 'vm0', 'tynan', 40),
+)
+
+
+def at(offset: float) -> datetime:
+    return datetime.fromtimestamp(START + offset, tz=timezone.utc)
+
+
+def points() -> Tuple[Dict, ...]:
+    return tuple(
+        {
+            'measurement': 'cpu',
+            'time': at(offset),
+            'tags': {'name': name, 'host': host},
+            'fields': {'utilization': utilization, 'vcpu_current': 2}
+        } for offset, name, host, utilization in CPU
+    ) + (
+        {
+            'measurement': 'memory',
+            'time': at(0),
+            'tags': {'name': 'vm0', 'host': 'tynan'},
+            'fields': {'utilization': 55.5}
+        },
+    )
+
+
+@fixture(params=['memory', 'ringbuffer', 'segments'])
+def timeseries(request, tmp_path) -> Iterator[TimeSeries]:
+    backends = {
+        'memory': lambda: Local(timedelta(days=1)),
+        'ringbuffer': lambda: RingBuffer(timedelta(days=1)),
+        'segments': lambda: Segments(timedelta(days=1), str(tmp_path)),
+    }
+    _timeseries: TimeSeries = backends[request.param]()
+
+    with _timeseries:
+        _timeseries.insert_batch(points())
+        yield _timeseries
+
+
+def values(aggregates: List[Aggregate]) -> List[Tuple[Dict[str, str], datetime, int | float]]:
+    return [(_aggregate.tags, _aggregate.time, _aggregate.value) for _aggregate in aggregates]
+
+
+def test_mean_over_range(timeseries: TimeSeries) -> None:
+    aggregates = timeseries.query(Query(start=at(0), stop=at(300), measurement='cpu', fields=('utilization',)))
+
+    assert [(_aggregate.measurement, _aggregate.field) for _aggregate in aggregates] == [('cpu', 'utilization')]
+    assert values(aggregates) == [({}, at(0), approx(320 / 7))]
+
+
+def test_every_measurement_and_field(timeseries: TimeSeries) -> None:
+    aggregates = timeseries.query(Query(start=at(0), stop=at(300), aggregate='count'))
+
+    assert [(_aggregate.measurement, _aggregate.field, _aggregate.value) for _aggregate in aggregates] == [
+        ('cpu', 'utilization', 7),
+        ('cpu', 'vcpu_current', 7),
+        ('memory', 'utilization', 1),
+    ]
+
+
+def test_windows_grouped_by_tag(timeseries: TimeSeries) -> None:
+    aggregates = timeseries.query(Query(
+        start=at(0),
+        stop=at(300),
+        measurement='cpu',
+        fields=('utilization',),
+        group_by=('host',),
+        window=60
+    ))
+
+    # Sorted by group, then window.
+    assert values(aggregates) == [
+        ({'host': 'other'}, at(0), 100),
+        ({'host': 'tynan'}, at(0), approx(80 / 3)),
+        ({'host': 'tynan'}, at(60), approx(140 / 3)),
+    ]
+
+
+def test_windows_are_clipped_to_range(timeseries: TimeSeries) -> None:
+    aggregates = timeseries.query(Query(
+        start=at(15),
+        stop=at(70),
+        measurement='cpu',
+        fields=('utilization',),
+        window=60,
+        aggregate='sum'
+    ))
+
+    # The first window starts at the start of the range rather than the window's, and stop is exclusive.
+    assert values(aggregates) == [({}, at(15), 120), ({}, at(60), 30)]
+
+
+def test_any_of_tags(timeseries: TimeSeries) -> None:
+    aggregates = timeseries.query(Query(
+        start=at(0),
+        stop=at(300),
+        measurement='cpu',
+        fields=('utilization',),
+        tags={'name': ('vm0', 'vm2'), 'host': ('tynan', 'other')},
+        aggregate='sum'
+    ))
+
+    assert values(aggregates) == [({}, at(0), 200)]
+
+
+def test_tags_with_no_match(timeseries: TimeSeries) -> None:
+    assert timeseries.query(Query(start=at(0), stop=at(300), measurement='cpu', tags={'name': ()})) == []
+    assert timeseries.query(Query(start=at(0), stop=at(300), measurement='cpu', tags={'name': 'vm9'})) == []
+
+
+def test_percentile_interpolates(timeseries: TimeSeries) -> None:
+    query = Query(start=at(0), stop=at(300), measurement='cpu', fields=('utilization',), aggregate='percentile', percentile=95)
+
+    # Sorted, the values are 10, 20, 30, 40, 50, 70, 100; the 95th percentile is 70% of the way from 70 to 100.
+    assert values(timeseries.query(query)) == [({}, at(0), approx(91))]
+
+    query.tags = {'name': 'vm0'}
+    query.percentile = 50
+
+    assert values(timeseries.query(query)) == [({}, at(0), approx(25))]
+
+
+def test_last_is_latest_per_group(timeseries: TimeSeries) -> None:
+    aggregates = timeseries.query(Query(
+        start=at(0),
+        stop=at(300),
+        measurement='cpu',
+        fields=('utilization',),
+        group_by=('name',),
+        aggregate='last'
+    ))
+
+    assert values(aggregates) == [({'name': 'vm0'}, at(0), 40), ({'name': 'vm1'}, at(0), 70), ({'name': 'vm2'}, at(0), 100)]
+
+
+def test_missing_group_by_tag_is_left_out(timeseries: TimeSeries) -> None:
+    aggregates = timeseries.query(Query(start=at(0), stop=at(300), measurement='memory', group_by=('asg',), aggregate='max'))
+
+    assert values(aggregates) == [({}, at(0), 55.5)]
+
+
+def test_unknown_aggregate() -> None:
+    with raises(ValueError):
+        Query(start=at(0), aggregate='median')
+
+    with raises(ValueError):
+        Query(start=at(0), aggregate='percentile', percentile=101)
+
+
+class QueryApi:
+    """
+    A stand-in for InfluxDB's query API that records the queries it's sent and answers them with given tables.
+    """
+    def __init__(self, tables: List[FluxTable] | None = None) -> None:
+        self.tables = tables or []
+        self.queries: List[Tuple[str, str, Dict[str, Any]]] = []
+
+    def query(self, query: str, org: str, params: Dict[str, Any]) -> List[FluxTable]:
+        self.queries.append((query, org, params))
+        return self.tables
+
+
+def influxdb(query_api: QueryApi) -> InfluxDB:
+    _influxdb = InfluxDB(
+        TimeSeriesConfig(
+            type='influxdb',
+            retention=86400,
+            connection=Connection(
+                url='http://localhost:8086',
+                database='premiscale',
+                credentials=DatabaseCredentials(username='premiscale', password='token'),
+                organization='premiscale'
+            )
+        )
+    )
+    _influxdb._query_api = cast('QueryApiType', query_api)
+
+    return _influxdb
+
+
+def test_influxdb_windowed_percentile_flux() -> None:
+    query_api = QueryApi()
+    influxdb(query_api).query(Query(
+        start=at(0),
+        stop=at(300),
+        measurement='cpu',
+        fields=('utilization',),
+        tags={'name': ('vm0', 'vm2'), 'host': 'tynan'},
+        group_by=('host',),
+        window=60,
+        aggregate='percentile',
+        percentile=95
+    ))
+
+    (flux, org, params), = query_api.queries
+
+    assert flux == (
+        'from(bucket: "premiscale")'
+        ' |> range(start: params.start, stop: params.stop)'
+        ' |> filter(fn: (r) => r._measurement == params.measurement'
+        ' and (r["name"] == params.tag0_0 or r["name"] == params.tag0_1)'
+        ' and (r["host"] == params.tag1_0)'
+        ' and (r._field == params.field0))'
+        ' |> group(columns: ["host", "_measurement", "_field"])'
+        ' |> aggregateWindow(every: 60s,'
+        ' fn: (column, tables=<-) => tables |> quantile(q: params.q, column: column, method: "exact_mean"),'
+        ' createEmpty: false, timeSrc: "_start")'
+    )
+    assert org == 'premiscale'
+    assert params == {
+        'start': at(0),
+        'stop': at(300),
+        'measurement': 'cpu',
+        'tag0_0': 'vm0',
+        'tag0_1': 'vm2',
+        'tag1_0': 'tynan',
+        'field0': 'utilization',
+        'q': 0.95
+    }
+
+
+def test_influxdb_range_aggregate_flux() -> None:
+    query_api = QueryApi()
+    influxdb(query_api).query(Query(start=at(0), tags={'name': ()}, aggregate='last'))
+
+    (flux, _, params), = query_api.queries
+
+    assert flux == (
+        'from(bucket: "premiscale")'
+        ' |> range(start: params.start)'
+        ' |> filter(fn: (r) => (false))'
+        ' |> group(columns: ["_measurement", "_field"])'
+        ' |> last()'
+    )
+    assert params == {'start': at(0)}
+
+
+def test_influxdb_results_become_aggregates() -> None:
+    table = FluxTable()
+
+    for host, field, value in (('tynan', 'utilization', 30.0), ('other', 'utilization', 100.0), ('other', 'vcpu_current', None)):
+        record = FluxRecord(table=0, values={
+            '_measurement': 'cpu',
+            '_field': field,
+            '_time': at(60),
+            '_value': value,
+            'host': host
+        })
+        table.records.append(record)
+
+    aggregates = influxdb(QueryApi([table])).query(Query(start=at(0), measurement='cpu', group_by=('host',), window=60))
+
+    # Empty aggregates are left out, and the rest sorted like the other backends' aggregates.
+    assert aggregates == [
+        Aggregate(measurement='cpu', field='utilization', tags={'host': 'other'}, time=at(60), value=100.0),
+        Aggregate(measurement='cpu', field='utilization', tags={'host': 'tynan'}, time=at(60), value=30.0),
+    ]
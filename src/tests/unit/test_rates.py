@@ -0,0 +1,156 @@
+"""
+Check that the RateCache derives per-second rates from consecutive records of a domain, skips counters that reset,
+and evicts domains that vanished.
+"""
+
+
+from __future__ import annotations
+
+from typing import List
+from premiscale.hypervisor.qemu_data import DomainRecord
+from premiscale.metrics.rates import RateCache
+
+
+class Clock:
+    """
+    A monotonic clock that only moves when told to.
+    """
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def record(time: float,
+           cpu_time: int = 0,
+           net: int = 0,
+           read: int = 0,
+           write: int = 0,
+           name: str = 'vm0',
+           vcpus: int = 2) -> DomainRecord:
+    return DomainRecord(
+        name=name,
+        host='tynan',
+        time=time,
+        cpu_time=cpu_time,
+        cpu_user=0,
+        cpu_system=0,
+        vcpu_current=vcpus,
+        vcpu_maximum=vcpus,
+        net_count=1,
+        block_count=1,
+        net=(('vnet0', net, 2 * net, 0),),
+        block=(('vda', '/var/lib/libvirt/images/vm0.qcow2', 1, 2, 1, read, write),)
+    )
+
+
+def apply(cache: RateCache, *records: DomainRecord) -> List[DomainRecord]:
+    return list(cache.apply(records))
+
+
+def test_first_record_has_no_rates() -> None:
+    cache = RateCache(clock=Clock())
+    first, = apply(cache, record(0, cpu_time=10**9, net=100))
+
+    assert first.cpu_utilization is None
+    assert first.net_rates == ()
+    assert first.block_rates == ()
+    assert len(cache) == 1
+
+
+def test_rates_from_consecutive_records() -> None:
+    cache = RateCache(clock=Clock())
+    apply(cache, record(0, cpu_time=0, net=1000, read=0, write=500))
+    second, = apply(cache, record(10, cpu_time=5 * 10**9, net=3000, read=4000, write=500))
+
+    # 5 s of CPU time over 10 s on 2 vCPUs.
+    assert second.cpu_utilization == 25.0
+    assert second.net_rates == (('vnet0', 200.0, 400.0, 0.0),)
+    assert second.block_rates == (('vda', 400.0, 0.0),)
+
+    fields = dict(second.measurements())
+
+    assert fields['cpu']['cpu_utilization_percent'] == 25.0
+    assert fields['net']['net_bytes_per_second'] == 200.0
+    assert fields['block']['vda_read_bytes_per_second'] == 400.0
+
+
+def test_cpu_utilization_is_capped() -> None:
+    cache = RateCache(clock=Clock())
+    apply(cache, record(0, cpu_time=0, vcpus=1))
+    second, = apply(cache, record(1, cpu_time=2 * 10**9, vcpus=1))
+
+    assert second.cpu_utilization == 100.0
+
+
+def test_counter_reset_skips_rate_and_rebaselines() -> None:
+    cache = RateCache(clock=Clock())
+    apply(cache, record(0, cpu_time=10 * 10**9, net=1000))
+    restarted, = apply(cache, record(10, cpu_time=10**9, net=10))
+
+    assert restarted.cpu_utilization is None
+    assert restarted.net_rates == ()
+    assert cache.resets == 2
+
+    # The restarted domain's counters are the next baseline.
+    third, = apply(cache, record(20, cpu_time=6 * 10**9, net=110))
+
+    assert third.cpu_utilization == 25.0
+    assert third.net_rates == (('vnet0', 10.0, 20.0, 0.0),)
+
+
+def test_stale_record_keeps_baseline() -> None:
+    cache = RateCache(clock=Clock())
+    apply(cache, record(10, cpu_time=10 * 10**9))
+
+    # The same stats queued twice don't yield a rate, or replace the baseline.
+    duplicate, = apply(cache, record(10, cpu_time=10 * 10**9))
+
+    assert duplicate.cpu_utilization is None
+
+    later, = apply(cache, record(20, cpu_time=15 * 10**9))
+
+    assert later.cpu_utilization == 25.0
+
+
+def test_domains_are_keyed_by_host_and_name() -> None:
+    cache = RateCache(clock=Clock())
+    apply(cache, record(0, cpu_time=0, name='vm0'), record(0, cpu_time=0, name='vm1'))
+    vm0, vm1 = apply(cache, record(10, cpu_time=2 * 10**9, name='vm0'), record(10, cpu_time=4 * 10**9, name='vm1'))
+
+    assert vm0.cpu_utilization == 10.0
+    assert vm1.cpu_utilization == 20.0
+    assert len(cache) == 2
+
+
+def test_vanished_domains_are_evicted() -> None:
+    clock = Clock()
+    cache = RateCache(max_age=100, clock=clock)
+    apply(cache, record(0, name='vm0'), record(0, name='vm1'))
+
+    clock.now = 60
+    apply(cache, record(60, name='vm1'))
+
+    # vm0 was last seen at 0, vm1 at 60.
+    assert cache.sweep(now=120) == 1
+    assert cache.evicted == 1
+    assert len(cache) == 1
+
+    # A domain that comes back after being evicted starts over without rates.
+    clock.now = 130
+    vm0, = apply(cache, record(130, cpu_time=10**9, name='vm0'))
+
+    assert vm0.cpu_utilization is None
+
+
+def test_apply_sweeps_periodically() -> None:
+    clock = Clock()
+    cache = RateCache(max_age=100, clock=clock)
+    apply(cache, record(0, name='vm0'))
+
+    clock.now = 101
+    apply(cache, record(101, name='vm1'))
+
+    assert len(cache) == 1
+    assert cache.evicted == 1
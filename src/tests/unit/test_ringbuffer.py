@@ -0,0 +1,127 @@
+"""
+Check that ring buffer Series keep their newest points in time order across the wrap, and that the RingBuffer store
+rejects out-of-order points and drops series that stopped receiving points.
+"""
+
+
+from __future__ import annotations
+
+from typing import Dict, List
+from datetime import datetime, timedelta, timezone
+from premiscale.metrics.timeseries import ringbuffer as _ringbuffer
+from premiscale.metrics.timeseries.ringbuffer import RingBuffer, Series
+
+
+def series(capacity: int = 4, times: range = range(0)) -> Series:
+    _series = Series('cpu', {'name': 'vm0'}, capacity)
+
+    for time in times:
+        assert _series.append(time, {'cpu_time': time})
+
+    return _series
+
+
+def times(_series: Series, start: float | None = None, stop: float | None = None) -> List[float]:
+    return [time for time, _ in _series.range(start, stop)]
+
+
+def point(time: float, name: str = 'vm0', **fields: int | float) -> Dict:
+    return {
+        'measurement': 'cpu',
+        'time': datetime.fromtimestamp(time, tz=timezone.utc),
+        'tags': {'name': name},
+        'fields': fields
+    }
+
+
+def test_full_series_overwrites_oldest_points() -> None:
+    _series = series(times=range(10, 70, 10))
+
+    assert len(_series) == 4
+    assert _series.head == 2
+    assert times(_series) == [30, 40, 50, 60]
+    assert [fields['cpu_time'] for _, fields in _series.range()] == [30, 40, 50, 60]
+    assert _series.latest() == 60
+
+
+def test_expire_drops_points_from_head() -> None:
+    _series = series(times=range(10, 70, 10))
+
+    assert _series.expire(45) == 2
+    assert times(_series) == [50, 60]
+
+    # Expiring every point leaves an empty series that can be appended to again.
+    assert _series.expire(100) == 2
+    assert _series.latest() is None
+    assert _series.append(100, {'cpu_time': 100})
+    assert times(_series) == [100]
+
+
+def test_bisect_across_wrap() -> None:
+    # Physically [50, 60, 30, 40], i.e. the newest points wrapped around to the start of the arrays.
+    _series = series(times=range(10, 70, 10))
+
+    assert [_series._bisect(time) for time in (0, 30, 35, 50, 60, 61)] == [0, 0, 1, 2, 3, 4]
+    assert times(_series, 35, 60) == [40, 50]
+    assert times(_series, start=50) == [50, 60]
+    assert times(_series, stop=45) == [30, 40]
+
+
+def test_out_of_order_points_are_rejected() -> None:
+    _series = series(times=range(10, 40, 10))
+
+    assert not _series.append(25, {'cpu_time': 25})
+
+    # A point at the same time as the newest one is kept.
+    assert _series.append(30, {'cpu_time': 31})
+    assert times(_series) == [10, 20, 30, 30]
+
+
+def test_field_types_round_trip() -> None:
+    _series = series()
+    _series.append(0, {'cpu_time': 10**12, 'utilization': 0.5, 'vcpu_current': None})
+    _series.append(1, {'cpu_time': 10**12 + 1, 'utilization': 1})
+
+    (_, first), (_, second) = _series.range()
+
+    assert first == {'cpu_time': 10**12, 'utilization': 0.5}
+    assert second == {'cpu_time': 10**12 + 1, 'utilization': 1.0}
+    assert type(first['cpu_time']) is int
+    assert type(second['utilization']) is float
+
+    # A field only ever written as an integer turns into a float once a float is written to it.
+    _series.append(2, {'cpu_time': 1.5})
+
+    assert [type(fields['cpu_time']) for _, fields in _series.range()] == [float, float, float]
+
+
+def test_store_counts_out_of_order_points(monkeypatch) -> None:
+    monkeypatch.setattr(_ringbuffer, 'now', lambda: 1000.0)
+    store = RingBuffer(timedelta(seconds=100))
+    store.open()
+    store.insert_batch((point(990, cpu_time=1), point(980, cpu_time=2)))
+
+    assert store.out_of_order == 1
+    assert [datum['fields'] for datum in store.range()] == [{'cpu_time': 1}]
+
+
+def test_retention_drops_stale_series(monkeypatch) -> None:
+    clock = {'now': 1000.0}
+    monkeypatch.setattr(_ringbuffer, 'now', lambda: clock['now'])
+    store = RingBuffer(timedelta(seconds=100), capacity=8)
+    store.open()
+    store.insert_batch((point(1000, 'vm0', cpu_time=1), point(1000, 'vm1', cpu_time=1)))
+
+    # vm1 is gone, and its series is swept once the retention period has passed.
+    clock['now'] = 1050.0
+    store.insert_batch((point(1050, 'vm0', cpu_time=2),))
+
+    assert len(store.range(start=datetime.fromtimestamp(0, tz=timezone.utc))) == 3
+
+    clock['now'] = 1150.0
+    store.insert_batch((point(1150, 'vm0', cpu_time=3),))
+
+    assert {datum['tags']['name'] for datum in store.range(start=datetime.fromtimestamp(0, tz=timezone.utc))} == {'vm0'}
+
+    # vm0's point at 1000 expired as vm0 was written to, and vm1's went with its series.
+    assert store.expired == 2
@@ -0,0 +1,125 @@
+"""
+Check that SlidingWindows summarize only the samples of their window, and that Rollups aggregate domain records per
+host and autoscaling group into points.
+"""
+
+
+from __future__ import annotations
+
+from typing import Dict, List
+from premiscale.hypervisor.qemu_data import DomainRecord
+from premiscale.metrics.rollup import Rollups, SlidingWindow
+
+
+def record(time: float,
+           utilization: float | None = None,
+           memory: int | None = None,
+           name: str = 'vm0',
+           host: str = 'tynan') -> DomainRecord:
+    return DomainRecord(
+        name=name,
+        host=host,
+        time=time,
+        balloon_current=memory,
+        balloon_maximum=100 if memory is not None else None,
+        cpu_utilization=utilization
+    )
+
+
+def fields(points: List[Dict], scope: str, name: str, metric: str, window: int) -> Dict:
+    tags = {scope: name, 'metric': metric, 'window': str(window)}
+    point, = [point for point in points if tags.items() <= point['tags'].items()]
+
+    return point['fields']
+
+
+def test_window_summary() -> None:
+    window = SlidingWindow(60)
+
+    for time, value in ((0, 1.0), (15, 2.0), (30, 6.0)):
+        window.add(time, value)
+
+    assert window.summary() == (3, 9.0, 1.0, 6.0, 41.0)
+
+
+def test_window_drops_buckets_that_slid_out() -> None:
+    # Buckets are 10s wide.
+    window = SlidingWindow(60, buckets=6)
+    window.add(5, 1.0)
+    window.add(25, 2.0)
+    window.add(65, 3.0)
+
+    # The bucket of the sample at 5s ended at 10s, before the window starting at 65 - 60 = 5s.
+    assert window.summary() == (2, 5.0, 2.0, 3.0, 13.0)
+
+    # Summarizing later empties the window.
+    assert window.summary(now=200) is None
+
+
+def test_window_ignores_samples_older_than_the_window() -> None:
+    window = SlidingWindow(60)
+    window.add(100, 1.0)
+
+    # A sample a whole window older than the latest one is dropped.
+    window.add(40, 5.0)
+    window.add(55, 2.0)
+
+    assert window.summary() == (2, 3.0, 1.0, 2.0, 5.0)
+
+
+def test_rollups_per_host_and_group() -> None:
+    rollups = Rollups({'tynan': ['web', 'db'], 'other': ['web']}, windows=[300, 60], collector='replica-0')
+    records = [
+        record(0, utilization=10.0, memory=50, name='vm0'),
+        record(0, utilization=30.0, name='vm1'),
+        record(5, utilization=50.0, name='vm2', host='other'),
+    ]
+
+    assert list(rollups.apply(records)) == records
+
+    points = rollups.points(int)
+
+    # tynan has cpu and memory, other only cpu; web, db and the hosts each get a point per metric and window.
+    assert len(points) == 2 * (2 + 2 + 1 + 2)
+    assert len(rollups) == 4
+    assert {point['measurement'] for point in points} == {'asg_rollup', 'host_rollup'}
+    assert all(point['time'] == 5 and point['tags']['collector'] == 'replica-0' for point in points)
+
+    assert fields(points, 'host', 'tynan', 'cpu', 60) == {
+        'count': 2, 'sum': 40.0, 'min': 10.0, 'max': 30.0, 'sumsq': 1000.0, 'mean': 20.0
+    }
+    assert fields(points, 'asg', 'web', 'cpu', 300)['mean'] == 30.0
+    assert fields(points, 'asg', 'db', 'cpu', 300)['count'] == 2
+    assert fields(points, 'asg', 'web', 'memory', 60)['sum'] == 50.0
+
+
+def test_only_changed_rollups_are_written() -> None:
+    rollups = Rollups({'tynan': ['web'], 'other': ['db']}, windows=[60], collector='replica-0')
+    list(rollups.apply([record(0, utilization=10.0), record(0, utilization=10.0, host='other')]))
+    rollups.points(int)
+
+    assert rollups.points(int) == []
+
+    list(rollups.apply([record(10, utilization=20.0)]))
+
+    assert {tuple(point['tags'].items())[0] for point in rollups.points(int)} == {('host', 'tynan'), ('asg', 'web')}
+
+
+def test_records_without_metrics_are_skipped() -> None:
+    rollups = Rollups({'tynan': ['web']}, windows=[60], collector='replica-0')
+    list(rollups.apply([record(0)]))
+
+    assert len(rollups) == 0
+    assert rollups.points(int) == []
+
+
+def test_rollups_whose_windows_emptied_are_forgotten() -> None:
+    rollups = Rollups({'tynan': ['web'], 'other': ['db']}, windows=[60], collector='replica-0')
+    list(rollups.apply([record(0, utilization=10.0), record(0, utilization=10.0, host='other')]))
+    rollups.points(int)
+
+    # other (and so db) stopped reporting.
+    list(rollups.apply([record(100, utilization=10.0)]))
+    rollups.points(int)
+
+    assert len(rollups) == 2
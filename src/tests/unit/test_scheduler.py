@@ -0,0 +1,109 @@
+"""
+Check that the Scheduler spreads hosts over their intervals, never hands a host out twice, and reschedules hosts on
+their own phase.
+"""
+
+
+from __future__ import annotations
+
+from pytest import approx
+from premiscale.config.v1alpha1 import Host
+from premiscale.metrics.scheduler import Scheduler
+
+
+def host(name: str) -> Host:
+    return Host(name=name, address='10.0.0.102', protocol='ssh', port=22, hypervisor='qemu', user='root')
+
+
+def test_offset_is_deterministic_and_within_interval() -> None:
+    offsets = [Scheduler.offset(f'host-{index}', 60) for index in range(100)]
+
+    assert all(0 <= offset < 60 for offset in offsets)
+    assert offsets == [Scheduler.offset(f'host-{index}', 60) for index in range(100)]
+
+    # Hosts are spread over the interval rather than bunched at its start.
+    assert len({int(offset // 10) for offset in offsets}) == 6
+
+
+def test_first_visit_is_on_phase() -> None:
+    scheduler = Scheduler()
+    _host = host('tynan')
+    scheduler.add(_host, 60, now=1000)
+    phase = Scheduler.offset('tynan', 60)
+
+    assert scheduler.pop_due(now=1000 + phase - 0.001) == []
+    assert scheduler.next_wait(now=1000) == approx(phase)
+    assert scheduler.pop_due(now=1000 + phase + 1) == [(_host, approx(1))]
+
+
+def test_in_flight_host_is_not_handed_out_twice() -> None:
+    scheduler = Scheduler()
+    _host = host('tynan')
+    scheduler.add(_host, 10, now=0)
+
+    assert len(scheduler.pop_due(now=100)) == 1
+    assert scheduler.pop_due(now=200) == []
+    assert scheduler.next_wait(now=200) is None
+
+
+def test_done_reschedules_on_phase() -> None:
+    scheduler = Scheduler()
+    _host = host('tynan')
+    scheduler.add(_host, 10, now=0)
+    due = Scheduler.offset('tynan', 10)
+
+    scheduler.pop_due(now=due)
+    scheduler.done(_host, now=due + 3)
+
+    assert scheduler.next_wait(now=due + 3) == approx(7)
+    assert scheduler.pop_due(now=due + 10) == [(_host, approx(0))]
+
+
+def test_overrun_skips_missed_visits() -> None:
+    scheduler = Scheduler()
+    _host = host('tynan')
+    scheduler.add(_host, 10, now=0)
+    due = Scheduler.offset('tynan', 10)
+
+    scheduler.pop_due(now=due)
+
+    # The visit took 3.5 intervals, so the next visit is on the 4th slot after the one it started on, not right away.
+    scheduler.done(_host, now=due + 35)
+
+    assert scheduler.pop_due(now=due + 39.9) == []
+    assert scheduler.pop_due(now=due + 40) == [(_host, approx(0))]
+
+
+def test_update_adds_removes_and_changes_intervals() -> None:
+    scheduler = Scheduler()
+    first, second, third = host('first'), host('second'), host('third')
+    scheduler.update([(first, 10), (second, 10)], now=0)
+
+    assert len(scheduler) == 2
+
+    scheduler.update([(second, 20), (third, 10)], now=0)
+
+    assert first not in scheduler
+    assert scheduler.interval(second) == 20
+    assert len(scheduler) == 2
+
+    # The removed host's heap entry is discarded lazily, and never handed out.
+    assert {_host.name for _host, _ in scheduler.pop_due(now=100)} == {'second', 'third'}
+
+    # A changed interval takes effect from the host's next visit.
+    due = Scheduler.offset('second', 10)
+    scheduler.done(second, now=due + 1)
+
+    assert scheduler.next_wait(now=due + 1) == approx(19)
+
+
+def test_done_for_removed_host_is_ignored() -> None:
+    scheduler = Scheduler()
+    _host = host('tynan')
+    scheduler.add(_host, 10, now=0)
+    scheduler.pop_due(now=100)
+    scheduler.remove(_host)
+    scheduler.done(_host, now=100)
+
+    assert len(scheduler) == 0
+    assert scheduler.next_wait(now=100) is None
@@ -0,0 +1,226 @@
+"""
+Check the on-disk layout of the Segments time series store: block encoding, recovery from partial writes, retention
+and reopening.
+"""
+
+
+from __future__ import annotations
+
+import os
+
+from typing import Dict, List, Tuple
+from datetime import timedelta
+from math import inf
+from time import time
+from pytest import mark
+from premiscale.metrics.timeseries.segments import FLOAT, GORILLA, INDEX, INT, RAW, SPARSE_INT, Segment, Segments, _parse_fields
+
+
+DURATION = 300
+
+
+def points(start: float, count: int = 10) -> List[Dict]:
+    """
+    Build a series of points a collection interval apart.
+
+    Args:
+        start (float): Time of the first point, as a POSIX timestamp.
+        count (int): Number of points. Defaults to 10.
+
+    Returns:
+        List[Dict]: The points, in the schema documented on DomainStats.to_tinyflux.
+    """
+    return [
+        {
+            'measurement': 'cpu',
+            'time': start + 10 * index,
+            'tags': {'name': 'vm0', 'host': 'tynan'},
+            'fields': {'cpu_time': 1000 * index, 'cpu_utilization_percent': index / 3}
+        } for index in range(count)
+    ]
+
+
+def store(path: str, **kwargs) -> Segments:
+    segments = Segments(timedelta(days=1), path, duration=DURATION, **kwargs)
+    segments.open()
+
+    return segments
+
+
+def partition(timestamp: float) -> int:
+    return int(timestamp // DURATION) * DURATION
+
+
+@mark.parametrize('codec', [RAW, GORILLA])
+def test_block_round_trip(codec: int) -> None:
+    series: Dict[bytes, List[Tuple[float, Dict[str, int | float]]]] = {
+        b'cpu': [
+            (1.0, {'count': 1, 'sparse': 5, 'ratio': 0.5}),
+            (2.0, {'count': -2, 'ratio': 1}),
+            (3.0, {'count': 2**40, 'sparse': -7, 'ratio': -0.25}),
+        ],
+        b'memory': [(2.5, {'total_memory_utilization': 100.0})],
+    }
+    expected = {
+        b'cpu': [
+            (1.0, {'count': 1, 'sparse': 5, 'ratio': 0.5}),
+            (2.0, {'count': -2, 'ratio': 1.0}),
+            (3.0, {'count': 2**40, 'sparse': -7, 'ratio': -0.25}),
+        ],
+        b'memory': [(2.5, {'total_memory_utilization': 100.0})],
+    }
+
+    decoded = {
+        key: (list(Segment.points(body, count, header, -inf, inf, codec)), _parse_fields(header))
+        for key, count, header, body in Segment.decode(Segment.encode(series, codec), codec)
+    }
+
+    assert decoded[b'cpu'][1] == (('count', INT), ('sparse', SPARSE_INT), ('ratio', FLOAT))
+
+    for key, _points in expected.items():
+        assert decoded[key][0] == _points
+
+        # Missing values of sparse integer fields are left out and present ones read back as integers, while fields
+        # mixing integers and floats read back as floats.
+        for (_, fields), (_, _fields) in zip(decoded[key][0], _points):
+            assert {name: type(value) for name, value in fields.items()} == {name: type(value) for name, value in _fields.items()}
+
+
+@mark.parametrize('codec', [RAW, GORILLA])
+def test_integers_outside_int64_are_stored_as_doubles(codec: int) -> None:
+    series: Dict[bytes, List[Tuple[float, Dict[str, int | float | None]]]] = {
+        b'cpu': [
+            (1.0, {'edge': 2**63 - 1, 'huge': 2**64, 'sparse': None}),
+            (2.0, {'edge': -2**63, 'huge': 1, 'sparse': -2**63 - 1}),
+        ]
+    }
+
+    (key, count, header, body), = Segment.decode(Segment.encode(series, codec), codec)
+
+    assert _parse_fields(header) == (('edge', INT), ('huge', FLOAT), ('sparse', FLOAT))
+    assert list(Segment.points(body, count, header, -inf, inf, codec)) == [
+        (1.0, {'edge': 2**63 - 1, 'huge': float(2**64)}),
+        (2.0, {'edge': -2**63, 'huge': 1.0, 'sparse': float(-2**63 - 1)}),
+    ]
+
+
+def test_partial_index_entry_is_truncated(tmp_path) -> None:
+    start = partition(time()) - DURATION
+    segments = store(str(tmp_path), compression=False)
+    segments.insert_batch(points(start))
+
+    segment = Segment(str(tmp_path), partition(start))
+
+    # A crash halfway through writing the next entry.
+    with open(segment.index, 'ab') as f:
+        f.write(b'\x01' * (INDEX.size // 2))
+
+    segments = store(str(tmp_path), compression=False)
+
+    assert len(segments.range()) == 10
+
+    segments.insert_batch(points(start + 100, 5))
+
+    assert os.path.getsize(segment.index) == 2 * INDEX.size
+    assert len(store(str(tmp_path), compression=False).range()) == 15
+
+
+def test_unindexed_block_is_ignored(tmp_path) -> None:
+    start = partition(time()) - DURATION
+    segments = store(str(tmp_path), compression=False)
+    segments.insert_batch(points(start))
+
+    # A crash after writing a block, but before writing its index entry.
+    with open(Segment(str(tmp_path), partition(start)).data, 'ab') as f:
+        f.write(b'\x00' * 64)
+
+    segments = store(str(tmp_path), compression=False)
+    segments.insert_batch(points(start + 100, 5))
+
+    assert len(segments.range()) == 15
+
+
+def test_retention_deletes_whole_partitions(tmp_path) -> None:
+    now = time()
+    segments = Segments(timedelta(seconds=2 * DURATION), str(tmp_path), duration=DURATION, compression=False)
+    segments.open()
+
+    expired = partition(now - 4 * DURATION)
+    segments.insert_batch(points(expired))
+    segments.insert_batch(points(now - 60, 1))
+
+    assert not os.path.exists(Segment(str(tmp_path), expired).data)
+    assert not os.path.exists(Segment(str(tmp_path), expired).index)
+    assert os.path.exists(Segment(str(tmp_path), partition(now - 60)).data)
+
+    # Partitions overlapping the retention period are kept whole, even their points older than the cutoff.
+    kept = partition(now - 2 * DURATION)
+    segments.insert_batch(points(kept, 30))
+
+    assert os.path.exists(Segment(str(tmp_path), kept).data)
+
+
+@mark.parametrize('compression', [False, True])
+def test_reopen_keeps_history(tmp_path, compression: bool) -> None:
+    start = partition(time()) - 3 * DURATION
+    segments = store(str(tmp_path), compression=compression)
+
+    for offset in range(0, 3 * DURATION, 100):
+        segments.insert_batch(points(start + offset, 10))
+
+    expected = segments.range()
+    segments.close()
+
+    reopened = store(str(tmp_path), compression=compression)
+
+    assert len(expected) == 90
+    assert reopened.range() == expected
+
+
+@mark.parametrize('compression', [False, True])
+def test_incomplete_generation_does_not_supersede(tmp_path, compression: bool) -> None:
+    start = partition(time()) - 3 * DURATION
+    store(str(tmp_path), compression=False).insert_batch(points(start))
+
+    # What a crash may leave of a compaction: the next generation's files, with an index that has no complete entry.
+    compacted = Segment(str(tmp_path), start, 1)
+    open(compacted.data, 'wb').close()
+    open(compacted.index, 'wb').close()
+
+    segments = store(str(tmp_path), compression=compression)
+
+    assert len(segments.range()) == 10
+
+    # With compression, a point past the partition's grace period gets it compacted.
+    segments.insert_batch(points(start + 2 * DURATION, 1))
+
+    assert len(segments.range()) == 11
+    assert len(store(str(tmp_path), compression=compression).range()) == 11
+    assert os.path.exists(Segment(str(tmp_path), start, int(compression)).index)
+    assert not os.path.exists(Segment(str(tmp_path), start, 1 - int(compression)).index)
+
+
+def test_compaction_replaces_generation(tmp_path) -> None:
+    start = partition(time()) - 3 * DURATION
+    segments = store(str(tmp_path), compression=False)
+    segments.insert_batch(points(start, 5))
+    segments.insert_batch(points(start + 50, 5))
+
+    # A crash while writing the next generation's temporary files.
+    compacted = Segment(str(tmp_path), start, 1)
+
+    with open(f'{compacted.data}.tmp', 'wb') as f:
+        f.write(b'\x00' * 64)
+
+    latest = Segment(str(tmp_path), start + 2 * DURATION)
+    segments = store(str(tmp_path))
+    segments.insert_batch(points(latest.start, 1))
+
+    assert sorted(os.listdir(tmp_path)) == sorted(
+        os.path.basename(path) for path in (compacted.data, compacted.index, latest.data, latest.index)
+    )
+
+    compacted.load()
+
+    assert [block[5] for block in compacted.blocks] == [GORILLA]
+    assert len(store(str(tmp_path)).range()) == 11